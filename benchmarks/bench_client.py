@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    End-to-end benchmarks of the ECAS B2SHARE client.
+
+    The create-draft, upload, list and submit flows are run against the
+    local stand-in server (:class:`~ecasb2share.fakeserver.FakeB2Share`)
+    under varying concurrency and file sizes. For each flow the latency
+    percentiles (p50/p95/p99), the number of operations per second and,
+    for uploads, the throughput in MB/s are reported.
+
+    Usage::
+
+        python benchmarks/bench_client.py --concurrency 1 4 16 \\
+            --file-sizes 1 16 --operations 50 --latency 0.005
+
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ecasb2share.ecasb2shareclient import EcasShare  # noqa: E402
+from ecasb2share.fakeserver import FakeB2Share  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def percentile(values, fraction):
+    """ Nearest-rank percentile of a list of values """
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(max(int(math.ceil(fraction * len(ordered))), 1), len(ordered))
+    return ordered[rank - 1]
+
+
+def run_flow(operation, arguments, concurrency):
+    """
+    Run an operation once per argument with a given concurrency.
+
+    :return: (latencies in seconds, wall-clock time in seconds)
+    """
+
+    def timed(argument):
+        start = time.perf_counter()
+        operation(argument)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, arguments))
+    return latencies, time.perf_counter() - start
+
+
+def summarize(flow, concurrency, latencies, wall_time, file_size=None):
+
+    result = {'flow': flow, 'concurrency': concurrency,
+              'operations': len(latencies),
+              'p50_ms': percentile(latencies, 0.50) * 1000,
+              'p95_ms': percentile(latencies, 0.95) * 1000,
+              'p99_ms': percentile(latencies, 0.99) * 1000,
+              'ops_per_s': len(latencies) / wall_time if wall_time else 0.0}
+    if file_size is not None:
+        result['file_size_mb'] = file_size / float(MB)
+        result['mb_per_s'] = len(latencies) * file_size / float(MB) / wall_time
+    return result
+
+
+def benchmark(server, token_file, concurrency, operations, file_sizes, work_dir):
+
+    results = []
+    community_id = FakeB2Share.ECAS_COMMUNITY_ID
+
+    with EcasShare(url=server.url, token_file=token_file,
+                   pool_maxsize=concurrency) as client:
+
+        latencies, wall_time = run_flow(
+            lambda i: client.create_draft_record(community_id, 'bench {}'.format(i)),
+            range(operations), concurrency)
+        results.append(summarize('create-draft', concurrency, latencies, wall_time))
+
+        record_id, filebucket_id = client.create_draft_record(community_id, 'bench upload')
+
+        for file_size in file_sizes:
+            file_path = os.path.join(work_dir, 'cube_{}.nc'.format(file_size))
+            if not os.path.exists(file_path):
+                with open(file_path, 'wb') as data_file:
+                    data_file.truncate(file_size)
+
+            latencies, wall_time = run_flow(
+                lambda i: client.add_file_to_draft_record(file_path, filebucket_id, stream=True),
+                range(operations), concurrency)
+            results.append(summarize('upload', concurrency, latencies, wall_time, file_size))
+
+        latencies, wall_time = run_flow(
+            lambda i: client.list_all_records(size=10, page=1),
+            range(operations), concurrency)
+        results.append(summarize('list', concurrency, latencies, wall_time))
+
+        drafts = [client.create_draft_record(community_id, 'bench submit {}'.format(i))[0]
+                  for i in range(operations)]
+        latencies, wall_time = run_flow(client.submit_draft_for_publication,
+                                        drafts, concurrency)
+        results.append(summarize('submit', concurrency, latencies, wall_time))
+
+    return results
+
+
+def print_results(results):
+
+    header = '{:<13} {:>5} {:>7} {:>9} {:>9} {:>9} {:>9} {:>9}'
+    row = '{:<13} {:>5} {:>7} {:>9.2f} {:>9.2f} {:>9.2f} {:>9.1f} {:>9}'
+    print(header.format('flow', 'conc', 'size_mb', 'p50_ms', 'p95_ms', 'p99_ms',
+                        'ops/s', 'MB/s'))
+    for result in results:
+        print(row.format(result['flow'], result['concurrency'],
+                         '{:g}'.format(result['file_size_mb']) if 'file_size_mb' in result else '-',
+                         result['p50_ms'], result['p95_ms'], result['p99_ms'],
+                         result['ops_per_s'],
+                         '{:.1f}'.format(result['mb_per_s']) if 'mb_per_s' in result else '-'))
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--file-sizes', type=float, nargs='+', default=[1, 16],
+                        help='upload sizes in MB')
+    parser.add_argument('--operations', type=int, default=50,
+                        help='operations per flow and concurrency level')
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='latency injected by the server, in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of requests failed by the server')
+    parser.add_argument('--output', help='write the results to a JSON file')
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    work_dir = tempfile.mkdtemp()
+    token_file = os.path.join(work_dir, 'token.txt')
+    with open(token_file, 'w') as token:
+        token.write('benchmark-token')
+
+    results = []
+    try:
+        with FakeB2Share(latency=args.latency, error_rate=args.error_rate,
+                         store_content=False) as server:
+            for concurrency in args.concurrency:
+                results.extend(benchmark(server, token_file, concurrency,
+                                         args.operations,
+                                         [int(size * MB) for size in args.file_sizes],
+                                         work_dir))
+    finally:
+        shutil.rmtree(work_dir)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+""" Asyncio interface to the ECAS B2SHARE client.
+
+:class:`AsyncEcasShare` exposes coroutine versions of the record, community,
+file and draft methods of :class:`~ecasb2share.ecasb2shareclient.EcasShare`.
+Requests are run in a thread pool over the pooled connections of a wrapped
+:class:`~ecasb2share.ecasb2shareclient.EcasShare`, so they do not block the
+event loop and metadata validation and exceptions are the same as with the
+blocking client.
+
+Example::
+
+    async with AsyncEcasShare(url, token_file, max_workers=50) as client:
+        records = await asyncio.gather(
+            *[client.get_specific_record(record_id) for record_id in ids])
+
+"""
+
+import asyncio
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import exceptions
+from .ecasb2shareclient import EcasShare
+from .upload import UploadResult
+
+
+def _async_method(name):
+    """ Build a coroutine running the EcasShare method `name` in the pool """
+
+    method = getattr(EcasShare, name)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        return await self._run(getattr(self.client, name), *args, **kwargs)
+
+    return wrapper
+
+
+class _AsyncIterator(object):
+
+    """ Asynchronous iterator over a blocking EcasShare generator """
+
+    def __init__(self, async_client, iterator):
+
+        self.async_client = async_client
+        self.iterator = iterator
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+
+        item = await self.async_client._run(next, self.iterator, StopIteration)
+        if item is StopIteration:
+            raise StopAsyncIteration
+        return item
+
+
+class AsyncEcasShare(object):
+
+    """ ECAS B2SHARE asyncio client """
+
+    def __init__(self, url=None, token_file=None, max_workers=None,
+                 client=None, **kwargs):
+        """
+        Initialize the client.
+
+        :param url: URL of the B2SHARE instance.
+        :param token_file: B2SHARE API ACCESS token
+        :param max_workers: Optional: maximum number of requests run at the
+               same time. Default: the size of the connection pool.
+        :param client: Optional: existing
+               :class:`~ecasb2share.ecasb2shareclient.EcasShare` to wrap.
+        :param kwargs: Optional: connection pool settings passed to
+               :class:`~ecasb2share.ecasb2shareclient.EcasShare`.
+        """
+
+        if client is None:
+            if max_workers is not None:
+                kwargs.setdefault('pool_maxsize', max_workers)
+            client = EcasShare(url=url, token_file=token_file, **kwargs)
+        self.client = client
+
+        if max_workers is None:
+            max_workers = client.transport.pool_maxsize
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    async def _run(self, func, *args, **kwargs):
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(func, *args, **kwargs))
+
+    # Connections
+
+    async def close(self):
+        """ Wait for the running requests and close the connections """
+
+        def shutdown():
+            self.executor.shutdown(wait=True)
+            self.client.close()
+
+        # Waiting in the default executor keeps the event loop running
+        await asyncio.get_running_loop().run_in_executor(None, shutdown)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    # Token
+
+    retrieve_access_token = _async_method('retrieve_access_token')
+
+    # communities
+
+    list_communities = _async_method('list_communities')
+    retrieve_community_specific_records = _async_method('retrieve_community_specific_records')
+    get_community_schema = _async_method('get_community_schema')
+
+    # records
+
+    list_all_records = _async_method('list_all_records')
+    get_specific_record = _async_method('get_specific_record')
+    get_record_pid = _async_method('get_record_pid')
+    create_draft_record = _async_method('create_draft_record')
+    create_draft_record_with_pid = _async_method('create_draft_record_with_pid')
+    submit_draft_for_publication = _async_method('submit_draft_for_publication')
+    delete_draft_record = _async_method('delete_draft_record')
+    delete_published_record = _async_method('delete_published_record')
+    search_records = _async_method('search_records')
+    get_filebucketid_from_record = _async_method('get_filebucketid_from_record')
+    search_drafts = _async_method('search_drafts')
+    search_specific_record = _async_method('search_specific_record')
+    export_records = _async_method('export_records')
+    build_record_index = _async_method('build_record_index')
+    harvest_records = _async_method('harvest_records')
+
+    # paginated iterators
+
+    def iter_records(self, *args, **kwargs):
+        """ Asynchronous version of EcasShare.iter_records """
+
+        return _AsyncIterator(self, self.client.iter_records(*args, **kwargs))
+
+    def iter_community_records(self, *args, **kwargs):
+        """ Asynchronous version of EcasShare.iter_community_records """
+
+        return _AsyncIterator(self, self.client.iter_community_records(*args, **kwargs))
+
+    def iter_drafts(self, *args, **kwargs):
+        """ Asynchronous version of EcasShare.iter_drafts """
+
+        return _AsyncIterator(self, self.client.iter_drafts(*args, **kwargs))
+
+    def iter_search(self, *args, **kwargs):
+        """ Asynchronous version of EcasShare.iter_search """
+
+        return _AsyncIterator(self, self.client.iter_search(*args, **kwargs))
+
+    # files
+
+    add_file_to_draft_record = _async_method('add_file_to_draft_record')
+    add_file_to_draft_record_resumable = _async_method('add_file_to_draft_record_resumable')
+    list_files_in_bucket = _async_method('list_files_in_bucket')
+    delete_file_from_draft_record = _async_method('delete_file_from_draft_record')
+    sync_directory_to_bucket = _async_method('sync_directory_to_bucket')
+    download_record_files = _async_method('download_record_files')
+
+    async def add_files_to_draft_record(self, file_paths, filebucket_id,
+                                        **kwargs):
+        """
+        Upload several files concurrently into the same file bucket.
+
+        :param file_paths: paths to the files to be uploaded.
+        :param filebucket_id: identifier for a set of files.
+        :param kwargs: Optional: arguments of
+               :exc:`~ecasb2share.ecasb2shareclient.EcasShare.add_file_to_draft_record`.
+        :return: list of :class:`~ecasb2share.upload.UploadResult`
+                 (file_path, response, error), in the order of file_paths.
+        """
+
+        async def upload(file_path):
+            try:
+                response = await self.add_file_to_draft_record(
+                    file_path, filebucket_id, **kwargs)
+            except Exception as err:
+                return UploadResult(file_path, None, exceptions.without_token(err))
+            return UploadResult(file_path, response, None)
+
+        return list(await asyncio.gather(*[upload(path) for path in file_paths]))
+
+    # metadata
+
+    load_metadata_from_json = staticmethod(EcasShare.load_metadata_from_json)
+    check_pid_syntax = staticmethod(EcasShare.check_pid_syntax)
+
+    validate_metadata = _async_method('validate_metadata')
+    validate_many = _async_method('validate_many')
@@ -0,0 +1,155 @@
+""" Bulk creation of draft records from a manifest of datasets.
+
+A manifest is either a directory of metadata JSON files, one record per file,
+or a JSON Lines file, one record per line. All the entries are validated
+before any request is sent, then the drafts are created concurrently and the
+outcome of each entry is written to a JSON Lines results file::
+
+    {"source": "cube_1.json", "record_id": "...", "filebucket_id": "...", "error": null}
+
+"""
+
+import json
+import logging
+import os
+import threading
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import exceptions
+
+
+# Metadata of one record of the manifest, and where it was read from
+ManifestEntry = namedtuple('ManifestEntry', ['source', 'metadata', 'error'])
+
+
+def load_manifest(manifest_path):
+    """
+    Read the entries of a manifest.
+
+    :param manifest_path: directory of metadata JSON files, or JSON Lines file.
+    :return: list of :class:`ManifestEntry`. Entries that cannot be parsed
+             have their error set.
+    """
+
+    entries = []
+
+    if os.path.isdir(manifest_path):
+        for file_name in sorted(os.listdir(manifest_path)):
+            if not file_name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(manifest_path, file_name), 'r') as metadata_file:
+                    entries.append(ManifestEntry(file_name, json.load(metadata_file), None))
+            except ValueError as err:
+                entries.append(ManifestEntry(file_name, None, 'invalid JSON: {}'.format(err)))
+        return entries
+
+    base_name = os.path.basename(manifest_path)
+    with open(manifest_path, 'r') as manifest:
+        for line_number, line in enumerate(manifest, 1):
+            if not line.strip():
+                continue
+            source = '{}:{}'.format(base_name, line_number)
+            try:
+                entries.append(ManifestEntry(source, json.loads(line), None))
+            except ValueError as err:
+                entries.append(ManifestEntry(source, None, 'invalid JSON: {}'.format(err)))
+
+    return entries
+
+
+def validate_entries(client, entries):
+    """
+    Validate the metadata and related PIDs of all the entries.
+
+    :param client: :class:`~ecasb2share.ecasb2shareclient.EcasShare`
+    :param entries: list of :class:`ManifestEntry`.
+    :return: list of :class:`ManifestEntry`, with the error of invalid
+             entries set.
+    """
+
+    validated = []
+
+    for entry in entries:
+        if entry.error is not None:
+            validated.append(entry)
+            continue
+        try:
+            client.validate_metadata(entry.metadata)
+            for related_identifier in entry.metadata['related_identifiers']:
+                client.check_pid_syntax(related_identifier['related_identifier'])
+        except (exceptions.MetadataException,
+                exceptions.MetadataSchemaException,
+                exceptions.PidSyntaxException) as err:
+            entry = entry._replace(error=str(err))
+        except (KeyError, TypeError) as err:
+            entry = entry._replace(error='malformed metadata: {!r}'.format(err))
+        except (IOError, ValueError) as err:
+            # The schema of the entry could not be looked up: the other
+            # entries are still validated
+            entry = entry._replace(
+                error='validation failed: ' + exceptions.error_message(err))
+        validated.append(entry)
+
+    return validated
+
+
+def bulk_create_drafts(client, manifest_path, results_path, max_workers=8,
+                       strict=False):
+    """
+    Validate a manifest, then create its drafts concurrently.
+
+    :param client: :class:`~ecasb2share.ecasb2shareclient.EcasShare`
+    :param manifest_path: directory of metadata JSON files, or JSON Lines file.
+    :param results_path: JSON Lines file receiving one result per entry, as
+           soon as it is known.
+    :param max_workers: Optional: number of drafts created at the same time.
+    :param strict: Optional: if True, create nothing when an entry is invalid.
+    :raise: :exc:`~ecasb2share.exceptions.MetadataException` in strict mode
+            when some entries are invalid.
+    :return: list of results (source, record_id, filebucket_id, error), in
+             the order of the manifest.
+    """
+
+    entries = validate_entries(client, load_manifest(manifest_path))
+    invalid = [entry for entry in entries if entry.error is not None]
+
+    if strict and invalid:
+        msg = ' {} invalid entries: '.format(len(invalid)) + '; '.join(
+            '{} ({})'.format(entry.source, entry.error) for entry in invalid)
+        raise exceptions.MetadataException(msg=msg)
+
+    lock = threading.Lock()
+
+    with open(results_path, 'w') as results_file:
+
+        def write_result(result):
+            with lock:
+                results_file.write(json.dumps(result) + '\n')
+                results_file.flush()
+            return result
+
+        def create(entry):
+            result = {'source': entry.source, 'record_id': None,
+                      'filebucket_id': None, 'error': entry.error}
+            if entry.error is None:
+                try:
+                    draft = client.create_draft_record_with_pid(metadata=entry.metadata)
+                    result['record_id'] = draft.record_id
+                    result['filebucket_id'] = draft.filebucket_id
+                except Exception as err:
+                    # Never write the access token of the request URL
+                    result['error'] = exceptions.error_message(err)
+                    logging.error('Draft creation failed for %s: %s', entry.source,
+                                  result['error'])
+            return write_result(result)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(create, entries))
+
+    failed = sum(1 for result in results if result['error'] is not None)
+    logging.info('%d drafts created, %d failed', len(results) - failed, failed)
+
+    return results
@@ -0,0 +1,114 @@
+""" In-process cache of record metadata.
+
+:class:`RecordCache` is a bounded LRU cache of the record JSON returned by
+B2SHARE. Entries younger than the time-to-live are served from memory;
+older entries are revalidated with an ``If-None-Match`` request carrying the
+``ETag`` of the cached version, and kept when the server answers
+``304 Not Modified``.
+
+"""
+
+import threading
+import time
+
+from collections import OrderedDict
+
+
+class CacheEntry(object):
+
+    """ Cached response body and its validator """
+
+    __slots__ = ('text', 'etag', 'stored_at')
+
+    def __init__(self, text, etag, stored_at):
+
+        self.text = text
+        self.etag = etag
+        self.stored_at = stored_at
+
+
+class RecordCache(object):
+
+    """ Thread-safe LRU cache with time-to-live and ETag revalidation """
+
+    def __init__(self, maxsize=128, ttl=30):
+        """
+        Initialize the cache.
+
+        :param maxsize: Optional: maximum number of entries. 0 disables the
+               cache.
+        :param ttl: Optional: seconds during which an entry is served without
+               contacting the server. 0 revalidates on every access.
+        """
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Look up an entry, fresh or stale.
+
+        :param key: cache key.
+        :return: the :class:`CacheEntry`, or None.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry):
+        """ True if the entry can be used without revalidation """
+
+        return time.monotonic() - entry.stored_at < self.ttl
+
+    def put(self, key, text, etag=None):
+        """
+        Store a response body, evicting the least recently used entries.
+
+        :param key: cache key.
+        :param text: response body.
+        :param etag: Optional: ETag header of the response.
+        """
+
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = CacheEntry(text, etag, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def touch(self, key):
+        """ Mark an entry as revalidated (the server answered 304) """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.stored_at = time.monotonic()
+
+    def invalidate(self, predicate=None, containing=None):
+        """
+        Drop entries, all of them when no selection is given.
+
+        :param predicate: Optional: callable predicate(key) selecting the
+               entries to drop.
+        :param containing: Optional: only drop the entries whose response
+               body contains this string, e.g. a file bucket id.
+        """
+
+        with self._lock:
+            if predicate is None and containing is None:
+                self._entries.clear()
+                return
+            for key in [key for key, entry in self._entries.items()
+                        if (predicate is None or predicate(key)) and
+                        (containing is None or containing in entry.text)]:
+                del self._entries[key]
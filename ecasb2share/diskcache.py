@@ -0,0 +1,163 @@
+""" Persistent cache of rarely changing B2SHARE responses.
+
+:class:`DiskCache` keeps JSON documents, such as the list of communities and
+the community schemas, in a directory shared by all the processes of the
+user on the host (notebook kernels, CLI invocations). Each entry is a small
+JSON file written atomically, so concurrent readers never see partial
+entries. Entries expire after a time-to-live, and the oldest entries are
+evicted when the cache grows beyond its size bounds. Entries are created
+readable by the user only; the client stores only the responses of anonymous
+requests, which are the same for every user.
+
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+
+def default_cache_dir():
+    """
+    Directory of the cache: $ECASB2SHARE_CACHE_DIR, or ecasb2share in the
+    user cache directory ($XDG_CACHE_HOME or ~/.cache).
+    """
+
+    if os.environ.get('ECASB2SHARE_CACHE_DIR'):
+        return os.environ['ECASB2SHARE_CACHE_DIR']
+
+    cache_home = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'ecasb2share')
+
+
+class DiskCache(object):
+
+    """ Directory of JSON entries with time-to-live and size bounds """
+
+    def __init__(self, directory=None, ttl=3600, max_entries=256,
+                 max_bytes=50 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        :param directory: Optional: cache directory. Default:
+               :func:`default_cache_dir`.
+        :param ttl: Optional: lifetime of the entries in seconds. 0 disables
+               the cache.
+        :param max_entries: Optional: maximum number of entries.
+        :param max_bytes: Optional: maximum total size of the entries.
+        """
+
+        self.directory = directory or default_cache_dir()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.json')
+
+    def get(self, key):
+        """
+        Return a cached value.
+
+        :param key: cache key.
+        :return: the value, or None when missing or expired.
+        """
+
+        if self.ttl <= 0:
+            return None
+
+        path = self._path(key)
+        try:
+            with open(path, 'r') as entry_file:
+                entry = json.load(entry_file)
+        except (IOError, OSError):
+            return None
+        except ValueError:
+            self._remove(path)
+            return None
+
+        if entry.get('key') != key or time.time() - entry['stored_at'] > self.ttl:
+            return None
+        return entry['value']
+
+    def put(self, key, value):
+        """
+        Store a value, then enforce the size bounds.
+
+        :param key: cache key.
+        :param value: JSON serializable value.
+        """
+
+        if self.ttl <= 0:
+            return
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as entry_file:
+                json.dump({'key': key, 'stored_at': time.time(),
+                           'value': value}, entry_file)
+            os.replace(tmp_path, self._path(key))
+        except (IOError, OSError) as err:
+            # The cache is an optimization: never fail the request because of it
+            logging.warning('Cannot write to cache %s: %s', self.directory, err)
+            return
+
+        self._evict()
+
+    def invalidate(self, key=None):
+        """
+        Drop an entry, or all of them.
+
+        :param key: Optional: cache key.
+        """
+
+        if key is not None:
+            self._remove(self._path(key))
+            return
+
+        for path, _, _ in self._entries():
+            self._remove(path)
+
+    def _entries(self):
+
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+
+        entries = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def _evict(self):
+
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total_bytes = sum(entry[2] for entry in entries)
+
+        while entries and (len(entries) > self.max_entries or
+                           total_bytes > self.max_bytes):
+            path, _, size = entries.pop(0)
+            self._remove(path)
+            total_bytes -= size
+
+    @staticmethod
+    def _remove(path):
+
+        try:
+            os.remove(path)
+        except OSError:
+            pass
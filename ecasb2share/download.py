@@ -0,0 +1,327 @@
+""" Parallel, resumable download of record files.
+
+:class:`FileDownload` fetches one object of a file bucket into a local file.
+Data is written to ``<file>.part`` and the file only appears under its final
+name once complete and verified against the checksum reported by B2SHARE.
+
+Small files are fetched in a single request; an interrupted download resumes
+from the end of the ``.part`` file with an HTTP Range request, and the MD5
+checksum is computed while the bytes are received. Files larger than the
+segment size are split into segments fetched in parallel with Range
+requests; the completed segments are recorded in a checkpoint file
+(``<file>.part.json``), so an interrupted download only fetches the
+missing segments.
+
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import exceptions
+from .upload import verify_checksum, DEFAULT_CHUNK_SIZE
+
+
+# Files larger than this are fetched in parallel segments of this size
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+# Outcome of the download of one file: the local path or the error raised
+DownloadResult = namedtuple('DownloadResult', ['key', 'file_path', 'error'])
+
+
+def _body_errors():
+    """
+    Errors raised while reading a response body, after which the request is
+    resent from the first missing byte.
+    """
+
+    from requests.exceptions import ChunkedEncodingError, ConnectionError, Timeout
+
+    return ChunkedEncodingError, ConnectionError, Timeout
+
+
+class RangeNotSupported(Exception):
+    """ The server ignored a Range request """
+
+
+def _hash_file(file_path, md5=None, chunk_size=DEFAULT_CHUNK_SIZE):
+
+    md5 = md5 or hashlib.md5()
+    with open(file_path, 'rb') as local_file:
+        for chunk in iter(lambda: local_file.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5
+
+
+class FileDownload(object):
+
+    """ Download of one object, resumed from a partial file """
+
+    def __init__(self, send, file_url, file_path, size=None, checksum=None,
+                 segment_size=DEFAULT_SEGMENT_SIZE, max_segments=4,
+                 chunk_size=DEFAULT_CHUNK_SIZE, attempts=3):
+        """
+        Initialize the download.
+
+        :param send: callable send(method, url, **kwargs) returning a response.
+        :param file_url: URL of the object in the file bucket
+               (/api/files/<filebucket_id>/<key>).
+        :param file_path: path to the local file.
+        :param size: Optional: size of the object, as listed by B2SHARE.
+               Needed for segmented downloads.
+        :param checksum: Optional: checksum of the object, as listed by
+               B2SHARE ('md5:<hex digest>').
+        :param segment_size: Optional: files larger than this are fetched
+               in parallel segments of this size.
+        :param max_segments: Optional: number of segments fetched at the
+               same time.
+        :param chunk_size: Optional: size of the chunks written to disk.
+        :param attempts: Optional: number of times a request interrupted
+               while reading the body is resent.
+        """
+
+        self.send = send
+        self.file_url = file_url
+        self.file_path = file_path
+        self.size = size
+        self.checksum = checksum
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.chunk_size = chunk_size
+        self.attempts = attempts
+
+        self.part_path = file_path + '.part'
+        self.checkpoint_path = self.part_path + '.json'
+        self._lock = threading.Lock()
+
+    def run(self):
+        """
+        Download the file, unless it is already complete.
+
+        :raise: :exc:`~ecasb2share.exceptions.ChecksumMismatchException` when
+                the downloaded file does not match the stored object.
+        :return: path to the local file.
+        """
+
+        if self.is_complete():
+            logging.info('%s already downloaded', self.file_path)
+            return self.file_path
+
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if self.size is not None and self.size > self.segment_size:
+            try:
+                md5 = self._download_segmented()
+            except RangeNotSupported:
+                logging.warning('Range requests not supported for %s, '
+                                'downloading in a single request', self.file_url)
+                self._remove(self.checkpoint_path)
+                self._remove(self.part_path)
+                md5 = self._download_single()
+        else:
+            md5 = self._download_single()
+
+        try:
+            verify_checksum(self.file_path, 'md5:' + md5.hexdigest(), self.checksum)
+        except exceptions.ChecksumMismatchException:
+            # Resuming a corrupted file would fail again
+            self._remove(self.part_path)
+            raise
+
+        os.replace(self.part_path, self.file_path)
+        self._remove(self.checkpoint_path)
+        return self.file_path
+
+    def is_complete(self):
+        """ True if the local file exists and matches the stored object """
+
+        if not os.path.exists(self.file_path):
+            return False
+        if self.size is not None and os.path.getsize(self.file_path) != self.size:
+            return False
+        if self.checksum is None or not self.checksum.lower().startswith('md5:'):
+            return self.size is not None
+        return 'md5:' + _hash_file(self.file_path).hexdigest() == self.checksum.lower()
+
+    # single request
+
+    def _download_single(self):
+
+        offset = os.path.getsize(self.part_path) if os.path.exists(self.part_path) else 0
+        if self.size is not None and offset > self.size:
+            offset = 0
+
+        # Bytes already on disk are hashed once, the rest as they arrive
+        md5 = _hash_file(self.part_path) if offset else hashlib.md5()
+        body_errors = _body_errors()
+
+        with open(self.part_path, 'ab' if offset else 'wb') as part_file:
+            for attempt in range(1, self.attempts + 1):
+                if self.size is not None and offset == self.size:
+                    break
+
+                headers = {'Range': 'bytes={}-'.format(offset)} if offset else None
+                response = self.send('GET', self.file_url, headers=headers, stream=True)
+                try:
+                    if offset and response.status_code == 416:
+                        # Nothing left to fetch, the checksum tells if complete
+                        break
+                    if offset and response.status_code == 200:
+                        # Range ignored: start again from the first byte
+                        part_file.seek(0)
+                        part_file.truncate()
+                        offset = 0
+                        md5 = hashlib.md5()
+                    response.raise_for_status()
+
+                    for chunk in response.iter_content(self.chunk_size):
+                        part_file.write(chunk)
+                        md5.update(chunk)
+                        offset += len(chunk)
+                    break
+                except body_errors as err:
+                    if attempt == self.attempts:
+                        raise
+                    logging.warning('Download of %s interrupted at byte %d (%s), '
+                                    'resuming', self.file_url, offset, err)
+                finally:
+                    response.close()
+
+        return md5
+
+    # segments
+
+    def _segment_range(self, index):
+
+        start = index * self.segment_size
+        return start, min(start + self.segment_size, self.size) - 1
+
+    def _load_checkpoint(self):
+
+        try:
+            with open(self.checkpoint_path, 'r') as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (IOError, ValueError):
+            return None
+
+        if checkpoint.get('file_url') != self.file_url or \
+                checkpoint.get('size') != self.size or \
+                checkpoint.get('segment_size') != self.segment_size or \
+                not os.path.exists(self.part_path):
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint):
+
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _download_segment(self, index):
+
+        start, end = self._segment_range(index)
+        position = start
+        body_errors = _body_errors()
+
+        with open(self.part_path, 'r+b') as part_file:
+            for attempt in range(1, self.attempts + 1):
+                part_file.seek(position)
+                headers = {'Range': 'bytes={}-{}'.format(position, end)}
+                response = self.send('GET', self.file_url, headers=headers, stream=True)
+                try:
+                    if response.status_code == 200:
+                        raise RangeNotSupported()
+                    response.raise_for_status()
+
+                    for chunk in response.iter_content(self.chunk_size):
+                        part_file.write(chunk[:end + 1 - position])
+                        position += len(chunk)
+                    break
+                except body_errors as err:
+                    if attempt == self.attempts:
+                        raise
+                    logging.warning('Segment %d of %s interrupted (%s), resuming',
+                                    index, self.file_url, err)
+                finally:
+                    response.close()
+
+    def _download_segmented(self):
+
+        number_of_segments = int(math.ceil(self.size / float(self.segment_size)))
+
+        checkpoint = self._load_checkpoint()
+        if checkpoint is None:
+            checkpoint = {'file_url': self.file_url, 'size': self.size,
+                          'segment_size': self.segment_size,
+                          'completed_segments': []}
+            with open(self.part_path, 'wb') as part_file:
+                part_file.truncate(self.size)
+            self._save_checkpoint(checkpoint)
+
+        missing = [index for index in range(number_of_segments)
+                   if index not in checkpoint['completed_segments']]
+
+        def download(index):
+            self._download_segment(index)
+            with self._lock:
+                checkpoint['completed_segments'].append(index)
+                self._save_checkpoint(checkpoint)
+
+        with ThreadPoolExecutor(max_workers=self.max_segments) as executor:
+            # list() re-raises the first error of the segments
+            list(executor.map(download, missing))
+
+        # Segments arrive out of order: hash the file once complete
+        return _hash_file(self.part_path)
+
+    @staticmethod
+    def _remove(path):
+
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def download_files(send, objects, local_dir, max_workers=4,
+                   segment_size=DEFAULT_SEGMENT_SIZE, max_segments=4):
+    """
+    Download several objects concurrently into a directory.
+
+    :param send: callable send(method, url, **kwargs) returning a response.
+    :param objects: list of dicts with the key, url, size and checksum of
+           each object.
+    :param local_dir: directory receiving the files, named after their keys.
+    :param max_workers: Optional: number of files downloaded at the same time.
+    :param segment_size: Optional: see :class:`FileDownload`.
+    :param max_segments: Optional: segments of a large file fetched at the
+           same time.
+    :return: list of :class:`DownloadResult` (key, file_path, error), in the
+             order of objects.
+    """
+
+    def download(obj):
+        parts = obj['key'].split('/')
+        if any(part in ('', '.', '..') for part in parts):
+            return DownloadResult(obj['key'], None,
+                                  ValueError('unsafe file key ' + obj['key']))
+        file_path = os.path.join(local_dir, *parts)
+        try:
+            FileDownload(send, obj['url'], file_path, size=obj.get('size'),
+                         checksum=obj.get('checksum'), segment_size=segment_size,
+                         max_segments=max_segments).run()
+        except Exception as err:
+            err = exceptions.without_token(err)
+            logging.error('Download of %s failed: %s', obj['key'], err)
+            return DownloadResult(obj['key'], None, err)
+        return DownloadResult(obj['key'], file_path, None)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(download, objects))
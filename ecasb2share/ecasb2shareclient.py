@@ -10,19 +10,62 @@ Author: Sofiane Bendoukha (DKRZ), 2019
 
 """
 
-import requests
+import fnmatch
 import json
 import os
 import logging
+import sys
 
-from requests import Request, Session
+from concurrent.futures import ThreadPoolExecutor
+from . import bulk
+from . import download
+from . import export
+from . import harvest
 from . import exceptions
+from . import pagination
+from . import sync
+from . import tracing
+from .cache import RecordCache
+from .diskcache import DiskCache
+from .metrics import Metrics
+from .records import DraftRecord, filebucket_id_of, record_id_of
+from .token_cache import TOKEN_CACHE
+from .tracing import traced
+from .transport import Transport, DEFAULT_TIMEOUT
+from .upload import FileStream, ResumableUpload, UploadResult, \
+    verify_checksum, DEFAULT_CHUNK_SIZE, DEFAULT_PART_SIZE
+from .validation import SchemaValidators
 
 
-from urllib.parse import urljoin
-from requests.exceptions import HTTPError
+from urllib.parse import parse_qs, urljoin, urlsplit
 
-logging.basicConfig(level=logging.INFO)
+
+# `requests` is imported by the first request sent by a client (see
+# _import_requests). Until then no HTTP error can be raised, and the error
+# handlers match this placeholder.
+class HTTPError(Exception):
+    """ Placeholder for requests.exceptions.HTTPError """
+
+
+def _import_requests():
+    """ Import requests and bind it, and its HTTPError, in this module """
+
+    import requests
+
+    globals().update(requests=requests, HTTPError=requests.exceptions.HTTPError)
+    return requests
+
+
+def __getattr__(name):
+    # ecasb2shareclient.requests, e.g. patch('...ecasb2shareclient.requests.get')
+    if name == 'requests':
+        return _import_requests()
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # No module __getattr__ (PEP 562)
+    _import_requests()
 
 
 class EcasShare (object):
@@ -31,7 +74,13 @@ class EcasShare (object):
 
     # Initialize
 
-    def __init__(self, url=None, token_file=None):
+    def __init__(self, url=None, token_file=None, pool_connections=10,
+                 pool_maxsize=10, pool_block=False, keep_alive=True,
+                 timeout=DEFAULT_TIMEOUT, record_cache_size=128,
+                 record_cache_ttl=30, cache_dir=None,
+                 community_cache_ttl=3600, schema_validation=False,
+                 retry_policy=None, circuit_breaker=None, rate_limiter=None,
+                 metrics=None, request_hooks=None, trace=None):
         """
         Initialize the client.
 
@@ -43,6 +92,57 @@ class EcasShare (object):
                      site. Use this URL for testing.
 
         :param token_file: B2SHARE API ACCESS token
+        :param pool_connections: Optional: number of per-host connection
+               pools kept by the client.
+        :param pool_maxsize: Optional: maximum number of connections kept
+               open to the B2SHARE host.
+        :param pool_block: Optional: wait for a free connection instead of
+               opening a new one when the pool is exhausted.
+        :param keep_alive: Optional: reuse connections between requests.
+               Default: True.
+        :param timeout: Optional: request timeout in seconds, either a single
+               value or a (connect, read) tuple.
+        :param record_cache_size: Optional: number of records kept in memory
+               by :exc:`~ecasb2share.ecasb2shareclient.EcasShare.get_specific_record`.
+               0 disables the cache.
+        :param record_cache_ttl: Optional: seconds during which a cached
+               record is used without asking the server. Older records are
+               revalidated with their ETag.
+        :param cache_dir: Optional: directory of the on-disk cache of
+               communities and community schemas, shared by all the clients
+               of the user on the host. Only the responses of anonymous
+               requests are cached, in files readable by the user only.
+               Default: $ECASB2SHARE_CACHE_DIR or ~/.cache/ecasb2share.
+        :param community_cache_ttl: Optional: seconds during which the
+               communities and schemas are read from the on-disk cache.
+               The cache is on by default; 0 disables it.
+        :param schema_validation: Optional: also validate metadata against
+               the JSON schema of their community before creating records.
+               Default: False.
+        :param retry_policy: Optional: :class:`~ecasb2share.retry.RetryPolicy`
+               of all the requests. Default: 3 retries of idempotent
+               requests with jittered exponential backoff, honoring
+               Retry-After. RetryPolicy(total=0) disables retries.
+        :param circuit_breaker: Optional:
+               :class:`~ecasb2share.retry.CircuitBreaker` failing fast when
+               the B2SHARE instance is down. CircuitBreaker(failure_threshold=0)
+               disables it.
+        :param rate_limiter: Optional:
+               :class:`~ecasb2share.ratelimit.RateLimiter` limiting the
+               requests and upload bytes per second, optionally shared by
+               all the processes of the host. Default: no limit.
+        :param metrics: Optional: True, or a
+               :class:`~ecasb2share.metrics.Metrics`, to record the latency,
+               traffic and status codes of the requests per endpoint in
+               self.metrics. Default: no metrics.
+        :param request_hooks: Optional: list of callables receiving a
+               :class:`~ecasb2share.metrics.RequestEvent` after each attempt
+               of a request.
+        :param trace: Optional: path to a Chrome trace-event file recording
+               the calls of the client methods and the phases of their
+               requests, True for ecasb2share-<pid>.trace.json, or a
+               :class:`~ecasb2share.tracing.Tracer`. Default: the path in
+               the ECASB2SHARE_TRACE environment variable, if set.
         """
 
         # Default path in container
@@ -59,44 +159,92 @@ class EcasShare (object):
         else:
             self.token_path = token_file
 
+        self.tracer = tracing.tracer_from(trace)
+        self.transport = Transport(pool_connections=pool_connections,
+                                   pool_maxsize=pool_maxsize,
+                                   pool_block=pool_block,
+                                   keep_alive=keep_alive,
+                                   timeout=timeout,
+                                   retry_policy=retry_policy,
+                                   circuit_breaker=circuit_breaker,
+                                   rate_limiter=rate_limiter,
+                                   hooks=request_hooks,
+                                   tracer=self.tracer)
+        if metrics is True:
+            metrics = Metrics()
+        self.metrics = metrics or None
+        if self.metrics is not None:
+            self.transport.add_hook(self.metrics)
+        self.record_cache = RecordCache(maxsize=record_cache_size,
+                                        ttl=record_cache_ttl)
+        self.community_cache = DiskCache(directory=cache_dir,
+                                         ttl=community_cache_ttl)
+        self.schema_validation = schema_validation
+        self.schema_validators = SchemaValidators(
+            self.get_community_schema, retrieve=self.__retrieve_schema_document)
+
+    # Connections
+
+    def close(self):
+        """ Close the pooled connections and write the trace file, if any """
+
+        self.transport.close()
+        if self.tracer is not None:
+            self.tracer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     # Token
 
+    @traced
     def retrieve_access_token(self):
-        """ Read the token from a given file named 'token' """
+        """
+        Read the token from a given file named 'token'.
 
-        token_file = open(self.token_path, 'r')
-        return token_file.read().strip()
+        The token is kept in memory and the file is read again only when it
+        changes on disk.
+        """
+
+        return TOKEN_CACHE.get(self.token_path)
 
     # communities
 
+    @traced
     def list_communities(self, token=None):
         """
         List all the communities, without any filtering.
 
-        :param token: Optional: B2SHARE API ACCESS token
+        :param token: Optional: B2SHARE API ACCESS token. The communities
+               listed with a token are not cached, since they may depend on
+               the user.
         :return: list of communities in json
         """
 
         url = urljoin(self.B2SHARE_URL, 'api/communities')
 
-        if token is None:
-            try:
-                req = self.__send_get_request(url)
-                req.raise_for_status()
-            except requests.exceptions.HTTPError as err:
-                print(err)
-
-        else:
+        if token is not None:
             payload = {'access_token': token}
-            try:
-                req = self.__send_get_request(url, params=payload)
-                req.raise_for_status()
-            except requests.exceptions.HTTPError as err:
-                print(err)
+            req = self.__send_get_request(url, params=payload)
+            if req.status_code == 200:
+                return req.json()
+            return
+
+        cached = self.community_cache.get(url)
+        if cached is not None:
+            return cached
+
+        req = self.__send_get_request(url)
 
         if req.status_code == 200:
-            return req.json()
+            communities = req.json()
+            self.community_cache.put(url, communities)
+            return communities
 
+    @traced
     def retrieve_community_specific_records(self, community_id):
         """
         List all records of a specific community.
@@ -114,15 +262,17 @@ class EcasShare (object):
             req = self.__send_get_request(url,
                                           params=payload)
             req.raise_for_status()
-            number_of_records = req.json()['hits']['total']
+            records = req.json()
+            number_of_records = records['hits']['total']
             print("Total number of records in this community: {}".format(number_of_records))
             if number_of_records > 0:
-                return req.json()
+                return records
             else:
                 print("No records in this community")
-        except requests.exceptions.HTTPError as err:
+        except HTTPError as err:
             print(err)
 
+    @traced
     def get_community_schema(self, community_id):
         """
         Retrieves the JSON schema of records approved by a specific community.
@@ -134,40 +284,63 @@ class EcasShare (object):
         """
 
         base = self.B2SHARE_URL
-        url = '/api/communities/' + community_id + '/schemas/last'
+        url = urljoin(base, '/api/communities/' + community_id + '/schemas/last')
 
-        try:
-            req = self.__send_get_request(urljoin(base, url))
-            req.raise_for_status()
-        except requests.exceptions.HTTPError as err:
-            print(err)
+        cached = self.community_cache.get(url)
+        if cached is not None:
+            return cached
+
+        req = self.__send_get_request(url)
 
         if req.status_code == 200:
-            return req.json()
+            schema = req.json()
+            self.community_cache.put(url, schema)
+            return schema
+
+    def invalidate_community_cache(self, community_id=None):
+        """
+        Forget the cached list of communities and community schemas.
+
+        :param community_id: Optional: only forget the schema of this
+               community and the list of communities.
+        """
+
+        if community_id is None:
+            self.community_cache.invalidate()
+            return
+
+        self.community_cache.invalidate(urljoin(self.B2SHARE_URL, 'api/communities'))
+        self.community_cache.invalidate(urljoin(
+            self.B2SHARE_URL, '/api/communities/' + community_id + '/schemas/last'))
 
     # records
 
-    def list_all_records(self, size=None):
+    @traced
+    def list_all_records(self, size=None, page=1):
         """
-        List all the records, without any filtering
-        TODO add pagination
-        :param size: Optional
+        List all the records, without any filtering.
+        Use :exc:`~ecasb2share.ecasb2shareclient.EcasShare.iter_records`
+        to go through all the pages.
+
+        :param size: Optional: number of records per page. Default: 10.
+        :param page: Optional: page number. Default: 1.
         :return: list of records in json format.
         """
 
         url = urljoin(self.B2SHARE_URL, 'api/records')
         if size:
-            payload = {'size': size, 'page': 1}
+            payload = {'size': size, 'page': page}
         else:
-            payload = {'size': 10, 'page': 1}
+            payload = {'size': 10, 'page': page}
 
         try:
             req = self.__send_get_request(url, params=payload)
             req.raise_for_status()
             return req.json()
-        except requests.exceptions.HTTPError as err:
+        except HTTPError as err:
             print(err)
 
+    @traced
     def get_specific_record(self, record_id, draft=True):
         """ List the metadata of the record specified by RECORD_ID.
 
@@ -188,14 +361,44 @@ class EcasShare (object):
         else:
             url = urljoin(self.B2SHARE_URL, 'api/records/' + record_id)
 
+        cache_key = (record_id, draft)
+        cached = self.record_cache.get(cache_key)
+        if cached is not None:
+            if self.record_cache.is_fresh(cached):
+                return json.loads(cached.text)
+            if cached.etag:
+                header['If-None-Match'] = cached.etag
+
         try:
             req = self.__send_get_request(url, params=payload, headers=header)
             if req is not None:
                 req.raise_for_status()
+                if req.status_code == 304 and cached is not None:
+                    self.record_cache.touch(cache_key)
+                    return json.loads(cached.text)
+                self.record_cache.put(cache_key, req.text, req.headers.get('ETag'))
                 return json.loads(req.text)
-        except requests.exceptions.HTTPError as err:
+        except HTTPError as err:
             print(err)
 
+    def __invalidate_bucket_records(self, filebucket_id):
+        """ Forget the cached records whose files are in a bucket """
+
+        self.record_cache.invalidate(containing=filebucket_id)
+
+    def invalidate_record_cache(self, record_id=None):
+        """
+        Forget the cached metadata of a record, or of all the records.
+
+        :param record_id: Optional: record id.
+        """
+
+        if record_id is None:
+            self.record_cache.invalidate()
+        else:
+            self.record_cache.invalidate(lambda key: key[0] == record_id)
+
+    @traced
     def get_record_pid(self, record_id):
         """
         Get the pid from the record metadata (published).
@@ -213,13 +416,15 @@ class EcasShare (object):
             msg = " missing {} key".format(e)
             raise exceptions.MetadataKeyMissingException(msg=msg)
 
+    @traced
     def create_draft_record(self, community_id, title):
         """
         Create a new record with minimal metadata, in the draft state.
 
         :param community_id:
         :param title: title for the record
-        :return: record_id, filebucket_id
+        :return: :class:`~ecasb2share.records.DraftRecord`, which also
+                 unpacks as record_id, filebucket_id
         """
 
         token = self.retrieve_access_token().rstrip()
@@ -229,27 +434,19 @@ class EcasShare (object):
                     "community": community_id,
                     "open_access": True}
         url = urljoin(self.B2SHARE_URL, '/api/records/')
-        try:
-            req = self.__send_post_request(url,
-                                           data=json.dumps(metadata),
-                                           params=payload,
-                                           headers=header)
-
-            req.raise_for_status()
-            record_id = req.json()
-            filebucket_id = self.get_filebucketid_from_record(record_id['id'])
-            print("Draft record created:\n" + record_id['id'])
-            print('filebucketid:\n' + filebucket_id)
-
-        except requests.exceptions.HTTPError as err:
-            print(err)
+        req = self.__send_post_request(url,
+                                       data=json.dumps(metadata),
+                                       params=payload,
+                                       headers=header)
+        draft = self.__draft_from_response(req)
 
         if req.status_code == 201:
             logging.info("Draft record successfully created!")
-            return record_id['id'], filebucket_id
+            return draft
 
+    @traced
     def create_draft_record_with_pid(self, title=None, original_pid=None,
-                                     metadata_json=None):
+                                     metadata_json=None, metadata=None):
         """
 
         Create a draft record and specifying the original pid.
@@ -259,7 +456,12 @@ class EcasShare (object):
 
         :param title: title for the record.
         :param original_pid: PID (prefix/suffix) of the input Dataset.
-        :return: record_id and filebucket_id
+        :param metadata_json: Optional: json file with the complete metadata
+               of the record, used instead of title and original_pid.
+        :param metadata: Optional: complete metadata of the record as dict,
+               used instead of title and original_pid.
+        :return: :class:`~ecasb2share.records.DraftRecord`, which also
+                 unpacks as record_id, filebucket_id
         """
 
         ECAS_COMMUNITY_ID = 'd2c6e694-0c0a-4884-ad15-ddf498008320'
@@ -270,6 +472,8 @@ class EcasShare (object):
 
         if metadata_json:
             metadata = self.load_metadata_from_json(metadata_json)
+
+        if metadata:
             self.validate_metadata(metadata)
 
             related_identifiers = metadata['related_identifiers']
@@ -278,15 +482,10 @@ class EcasShare (object):
                 self.check_pid_syntax(
                     related_identifiers[pid]['related_identifier'])
 
-            try:
-                req = self.__send_post_request(url,
-                                               data=json.dumps(metadata),
-                                               params=payload,
-                                               headers=header)
-
-                req.raise_for_status()
-            except requests.exceptions.HTTPError as err:
-                print(err)
+            req = self.__send_post_request(url,
+                                           data=json.dumps(metadata),
+                                           params=payload,
+                                           headers=header)
 
         else:
             metadata = {"titles": [{"title": title}],
@@ -300,63 +499,100 @@ class EcasShare (object):
             ],
                 "open_access": True
             }
-            try:
-                req = self.__send_post_request(url,
-                                               data=json.dumps(metadata),
-                                               params=payload,
-                                               headers=header)
-
-                req.raise_for_status()
-            except requests.exceptions.HTTPError as err:
-                print(err)
+            req = self.__send_post_request(url,
+                                           data=json.dumps(metadata),
+                                           params=payload,
+                                           headers=header)
 
-        record_id = req.json()
-        filebucket_id = self.get_filebucketid_from_record(record_id['id'])
-        print("Draft record created:\n" + record_id['id'])
-        print('filebucketid:\n' + filebucket_id)
+        draft = self.__draft_from_response(req)
 
         if req.status_code == 201:
             logging.info("Draft record successfully created!")
-            return record_id['id'], filebucket_id
+            return draft
 
+    def __draft_from_response(self, response):
+        """
+        Build the draft handle from the creation response, without fetching
+        the record again, and keep the record in the record cache.
+        """
+
+        draft = DraftRecord.from_response(response)
+        self.record_cache.put((draft.record_id, True), response.text,
+                              response.headers.get('ETag'))
+
+        logging.info('Draft record created: %s, filebucket id: %s',
+                     draft.record_id, draft.filebucket_id)
+        return draft
+
+    @traced
+    def bulk_create_drafts(self, manifest_path, results_path, max_workers=None,
+                           strict=False):
+        """
+        Create the drafts of a manifest of datasets concurrently.
+
+        All the entries are validated before any draft is created.
+
+        :param manifest_path: directory of metadata JSON files, or JSON Lines
+               file with one record metadata per line.
+        :param results_path: JSON Lines file mapping each entry to its
+               record id, filebucket id or error.
+        :param max_workers: Optional: number of drafts created at the same
+               time. Default: the size of the connection pool.
+        :param strict: Optional: create nothing if an entry is invalid.
+        :return: list of results, in the order of the manifest.
+        """
+
+        if max_workers is None:
+            max_workers = self.transport.pool_maxsize
+
+        return bulk.bulk_create_drafts(self, manifest_path, results_path,
+                                       max_workers=max_workers, strict=strict)
+
+    @traced
     def submit_draft_for_publication(self, record_id):
         """
 
-        :param record_id: record id
+        :param record_id: record id or :class:`~ecasb2share.records.DraftRecord`
         :return: request status (HTTP response)
         """
 
+        record_id = record_id_of(record_id)
+
         header = {'Content-Type': 'application/json-patch+json'}
         commit = '[{"op": "add", "path": "/publication_state", "value": "submitted"}]'
         token = self.retrieve_access_token().rstrip()
-        url = self.B2SHARE_URL + record_id + "/draft"
+        url = urljoin(self.B2SHARE_URL, '/api/records/' + record_id + '/draft')
         payload = {"access_token": token}
 
-        try:
-            req = requests.patch(
-                url, data=commit, params=payload, headers=header)
-            req.raise_for_status()
-        except requests.exceptions.HTTPError as err:
-            print(err)
+        req = self.__send_request('PATCH', url, data=commit,
+                                  params=payload, headers=header)
+        req.raise_for_status()
 
+        self.invalidate_record_cache(record_id)
         return req.status_code
 
+    @traced
     def delete_draft_record(self, record_id):
         """
 
-        :param record_id: record id
+        :param record_id: record id or :class:`~ecasb2share.records.DraftRecord`
         :return: request status
         """
 
+        record_id = record_id_of(record_id)
+
         url = urljoin(self.B2SHARE_URL, '/api/records/' + record_id + '/draft')
         token = self.retrieve_access_token().rstrip()
         payload = {'access_token': token}
         header = {"Content-Type": "application/json"}
 
-        req = requests.delete(url, params=payload, headers=header)
+        req = self.__send_request('DELETE', url, params=payload,
+                                  headers=header)
         logging.info(req.status_code)
+        self.invalidate_record_cache(record_id)
         return req.status_code
 
+    @traced
     def delete_published_record(self, record_id):
         """
         Notes: only a site administrator can delete a published record.
@@ -370,10 +606,13 @@ class EcasShare (object):
         payload = {'access_token': token}
         header = {"Content-Type": "application/json"}
 
-        req = requests.delete(url, params=payload, headers=header)
+        req = self.__send_request('DELETE', url, params=payload,
+                                  headers=header)
 
+        self.invalidate_record_cache(record_id)
         return req.status_code
 
+    @traced
     def search_records(self):
         """
         List all the records, without any filtering
@@ -389,21 +628,27 @@ class EcasShare (object):
                                       params=payload, headers=header)
         return req.json()
 
+    @traced
     def get_filebucketid_from_record(self, record_id):
         """
         TODO add exception when record not found
 
         :param record_id:  identifier for a specific record, which
-         can be in draft or published state
+         can be in draft or published state, or a
+         :class:`~ecasb2share.records.DraftRecord`
         :return: filebucket id.
         """
 
+        if isinstance(record_id, DraftRecord):
+            return record_id.filebucket_id
+
         record = self.get_specific_record(record_id)
 
         if record is not None:
             filebucket = record["links"]["files"].split('/')[-1]
             return filebucket
 
+    @traced
     def search_drafts(self):
         """
         Search for all drafts (unpublished records) that are accessible
@@ -426,6 +671,7 @@ class EcasShare (object):
         print(result["hits"]["total"])
         return result
 
+    @traced
     def search_specific_record(self, search_value):
 
         payload = {'q': search_value}
@@ -435,34 +681,460 @@ class EcasShare (object):
                                       params=payload)
         return req.json()
 
+    # paginated iterators
+
+    def __fetch_page(self, url, params=None):
+        """ Fetch one page of search results, authenticated with the token """
+
+        params = dict(params or {})
+        if 'access_token' not in parse_qs(urlsplit(url).query):
+            params['access_token'] = self.retrieve_access_token()
+
+        req = self.__send_request('GET', url, params=params)
+        req.raise_for_status()
+        return req.json()
+
+    def __iter_hits(self, params, prefetch):
+
+        url = urljoin(self.B2SHARE_URL, '/api/records/')
+        return pagination.iter_hits(self.__fetch_page, url, params=params,
+                                    prefetch=prefetch)
+
+    def iter_records(self, size=10, prefetch=True):
+        """
+        Iterate lazily over all the published records.
+
+        :param size: Optional: number of records fetched per page.
+        :param prefetch: Optional: fetch the next page in the background
+               while the current one is consumed. Default: True.
+        :return: generator of records (in JSON format).
+        """
+
+        return self.__iter_hits({'size': size}, prefetch)
+
+    def iter_community_records(self, community_id, size=10, prefetch=True):
+        """
+        Iterate lazily over all the records of a specific community.
+
+        :param community_id: community id. Can be retrieved from the list of
+        communities
+        :exc:`~ecasb2share.ecasb2shareclient.EcasShare.list_communities`
+        :param size: Optional: number of records fetched per page.
+        :param prefetch: Optional: fetch the next page in the background.
+        :return: generator of records (in JSON format).
+        """
+
+        return self.__iter_hits({'q': 'community:' + community_id,
+                                 'size': size}, prefetch)
+
+    def iter_drafts(self, size=10, prefetch=True, search_value=None):
+        """
+        Iterate lazily over all the drafts accessible by the requestor.
+
+        :param size: Optional: number of drafts fetched per page.
+        :param prefetch: Optional: fetch the next page in the background.
+        :param search_value: Optional: only the drafts matching this query,
+               e.g. 'community:<community_id>'.
+        :return: generator of drafts (in JSON format).
+        """
+
+        params = {'drafts': 1, 'size': size}
+        if search_value is not None:
+            params['q'] = search_value
+        return self.__iter_hits(params, prefetch)
+
+    def iter_search(self, search_value, size=10, prefetch=True, sort=None):
+        """
+        Iterate lazily over all the records matching a query.
+
+        :param search_value: query, e.g. 'community:<community_id>'.
+        :param size: Optional: number of records fetched per page.
+        :param prefetch: Optional: fetch the next page in the background.
+        :param sort: Optional: sort order, e.g. 'mostrecent'. Default: the
+               order of the server.
+        :return: generator of records (in JSON format).
+        """
+
+        params = {'q': search_value, 'size': size}
+        if sort is not None:
+            params['sort'] = sort
+        return self.__iter_hits(params, prefetch)
+
+    @traced
+    def export_records(self, output_path, community_id=None, query=None,
+                       size=100, compress=None):
+        """
+        Export all the records of a community or query to a JSON Lines file.
+
+        Pages are written as they are received, so memory use does not
+        depend on the number of records.
+
+        :param output_path: path to the output file, or '-' for the
+               standard output.
+        :param community_id: Optional: export the records of this community.
+        :param query: Optional: export the records matching this query.
+               Default: all the published records.
+        :param size: Optional: number of records fetched per page.
+        :param compress: Optional: gzip the output. Default: True when
+               output_path ends with .gz.
+        :return: number of records exported.
+        """
+
+        if community_id is not None:
+            records = self.iter_community_records(community_id, size=size)
+        elif query is not None:
+            records = self.iter_search(query, size=size)
+        else:
+            records = self.iter_records(size=size)
+
+        return export.export_jsonl(records, output_path, compress=compress)
+
+    @traced
+    def build_record_index(self, index_path=None, community_id=None,
+                           query=None, size=100):
+        """
+        Fill a local search index with the metadata of records.
+
+        The index answers full-text, PID and related identifier queries
+        offline, see :class:`~ecasb2share.index.RecordIndex`.
+
+        :param index_path: Optional: SQLite database of the index. Default:
+               records.sqlite in the user cache directory.
+        :param community_id: Optional: index the records of this community.
+        :param query: Optional: index the records matching this query.
+               Default: all the published records.
+        :param size: Optional: number of records fetched per page.
+        :return: :class:`~ecasb2share.index.RecordIndex`
+        """
+
+        if community_id is not None:
+            records = self.iter_community_records(community_id, size=size)
+        elif query is not None:
+            records = self.iter_search(query, size=size)
+        else:
+            records = self.iter_records(size=size)
+
+        from .index import RecordIndex
+
+        index = RecordIndex(index_path)
+        count = index.add_many(records)
+        logging.info('%d records indexed in %s', count, index.path)
+        return index
+
+    @traced
+    def harvest_records(self, index=None, community_id=None, full=False,
+                        overlap=60, size=100):
+        """
+        Update a local index with the records changed since the last harvest.
+
+        Only the records updated since the high-water mark stored in the
+        index are fetched. The first harvest of a scope, or a full one, also
+        removes the records that no longer exist.
+
+        :param index: Optional: :class:`~ecasb2share.index.RecordIndex`, or
+               path to its database. Default: records.sqlite in the user
+               cache directory.
+        :param community_id: Optional: only harvest the records of this
+               community.
+        :param full: Optional: fetch all the records again. Default: False.
+        :param overlap: Optional: seconds of updates before the high-water
+               mark fetched again, against late indexing by B2SHARE.
+        :param size: Optional: number of records fetched per page.
+        :return: :class:`~ecasb2share.harvest.HarvestReport` (fetched,
+                 removed, high_water_mark)
+        """
+
+        from .index import RecordIndex
+
+        if isinstance(index, RecordIndex):
+            return harvest.harvest(self, index, community_id=community_id,
+                                   full=full, overlap=overlap, size=size)
+
+        with RecordIndex(index) as record_index:
+            return harvest.harvest(self, record_index, community_id=community_id,
+                                   full=full, overlap=overlap, size=size)
+
     # files
 
-    def add_file_to_draft_record(self, file_path, filebucket_id):
+    @traced
+    def add_file_to_draft_record(self, file_path, filebucket_id, stream=False,
+                                 chunk_size=DEFAULT_CHUNK_SIZE,
+                                 progress_callback=None, verify_checksum=True):
         """
 
         :param file_path: path to the file to be uploaded.
-        :param filebucket_id: identifier for a set of files.
+        :param filebucket_id: identifier for a set of files, or the
+               :class:`~ecasb2share.records.DraftRecord` owning it.
                Each record has its own file set, usually found
                in the links -> files section
-
-
+        :param stream: Optional: send the file as a raw request body read in
+               chunks of chunk_size bytes, so memory use does not depend on
+               the file size. Default: False.
+        :param chunk_size: Optional: size of the chunks sent in stream mode.
+        :param progress_callback: Optional: in stream mode, called after each
+               chunk as progress_callback(bytes_sent, total_bytes, throughput),
+               with the throughput in bytes per second.
+        :param verify_checksum: Optional: in stream mode, compare the MD5
+               checksum computed while sending the file with the checksum
+               of the object stored by B2SHARE. Default: True.
+
+        :raise: :exc:`~ecasb2share.exceptions.ChecksumMismatchException`
+                when the stored object differs from the file.
         :return: request status
         """
 
-        header = {'Accept': 'application/json', 'Content-Type': 'octet-stream'}
+        filebucket_id = filebucket_id_of(filebucket_id)
+
         token = self.retrieve_access_token().rstrip()
         payload = {'access_token': token}
-        upload_file = {"file": open(file_path, 'rb')}
         file_name = os.path.basename(file_path)
         url = urljoin(self.B2SHARE_URL, '/api/files/' + filebucket_id)
 
-        req = self.__send_put_request(url + '/' + file_name,
-                                      files=upload_file,
-                                      params=payload,
-                                      headers=header)
+        if stream:
+            header = {'Accept': 'application/json',
+                      'Content-Type': 'application/octet-stream'}
+            file_stream = FileStream(file_path, chunk_size=chunk_size,
+                                     progress_callback=progress_callback)
+
+            try:
+                req = self.__send_put_request(url + '/' + file_name,
+                                              data=file_stream,
+                                              params=payload,
+                                              headers=header)
+            finally:
+                self.__invalidate_bucket_records(filebucket_id)
+            file_stream.log_summary()
+
+            result = req.json()
+            if verify_checksum:
+                self.__verify_upload(file_stream, result, filebucket_id, file_name)
+            return result
+
+        header = {'Accept': 'application/json', 'Content-Type': 'octet-stream'}
+
+        try:
+            with open(file_path, 'rb') as upload_file:
+                req = self.__send_put_request(url + '/' + file_name,
+                                              files={"file": upload_file},
+                                              params=payload,
+                                              headers=header)
+        finally:
+            self.__invalidate_bucket_records(filebucket_id)
 
         return req.json()
 
+    def __verify_upload(self, file_stream, result, filebucket_id, key):
+
+        # The object in the upload response, else its entry in the bucket
+        stored = result.get('checksum')
+        if stored is None:
+            bucket = self.list_files_in_bucket(filebucket_id) or {}
+            for obj in bucket.get('contents', []):
+                if obj.get('key') == key:
+                    stored = obj.get('checksum')
+
+        verify_checksum(file_stream.file_path, file_stream.checksum, stored)
+
+    @traced
+    def add_file_to_draft_record_resumable(self, file_path, filebucket_id,
+                                           part_size=DEFAULT_PART_SIZE,
+                                           checkpoint_path=None,
+                                           progress_callback=None):
+        """
+        Upload a file in parts, resuming an interrupted upload.
+
+        Completed parts are recorded in a checkpoint file. Calling this method
+        again after a failure only sends the parts that are missing; the
+        checkpoint is removed once the upload is complete.
+
+        :param file_path: path to the file to be uploaded.
+        :param filebucket_id: identifier for a set of files, or the
+               :class:`~ecasb2share.records.DraftRecord` owning it.
+               Each record has its own file set, usually found
+               in the links -> files section
+        :param part_size: Optional: size of each part in bytes.
+        :param checkpoint_path: Optional: path to the checkpoint file.
+               Default: file_path + '.upload.json'.
+        :param progress_callback: Optional: called as
+               progress_callback(bytes_sent, total_bytes, throughput).
+
+        :return: information about the uploaded file.
+        """
+
+        filebucket_id = filebucket_id_of(filebucket_id)
+
+        token = self.retrieve_access_token().rstrip()
+        file_name = os.path.basename(file_path)
+        url = urljoin(self.B2SHARE_URL, '/api/files/' + filebucket_id + '/' + file_name)
+
+        def send(method, url, params=None, **kwargs):
+            params = dict(params or {}, access_token=token)
+            return self.__send_request(method, url, params=params, **kwargs)
+
+        upload = ResumableUpload(send, url, file_path, part_size=part_size,
+                                 checkpoint_path=checkpoint_path,
+                                 progress_callback=progress_callback)
+        try:
+            return upload.run()
+        finally:
+            self.__invalidate_bucket_records(filebucket_id)
+
+    @traced
+    def add_files_to_draft_record(self, file_paths, filebucket_id,
+                                  max_workers=None, stream=False,
+                                  chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Upload several files concurrently into the same file bucket.
+
+        :param file_paths: paths to the files to be uploaded.
+        :param filebucket_id: identifier for a set of files, or the
+               :class:`~ecasb2share.records.DraftRecord` owning it.
+               Each record has its own file set, usually found
+               in the links -> files section
+        :param max_workers: Optional: number of parallel uploads. Default:
+               the size of the connection pool of the client, larger values
+               open connections that are not kept in the pool.
+        :param stream: Optional: use the streaming upload mode of
+               :exc:`~ecasb2share.ecasb2shareclient.EcasShare.add_file_to_draft_record`.
+        :param chunk_size: Optional: size of the chunks sent in stream mode.
+
+        :return: list of :class:`~ecasb2share.upload.UploadResult`
+                 (file_path, response, error), in the order of file_paths.
+        """
+
+        if max_workers is None:
+            max_workers = self.transport.pool_maxsize
+
+        def upload(file_path):
+            try:
+                response = self.add_file_to_draft_record(
+                    file_path, filebucket_id, stream=stream,
+                    chunk_size=chunk_size)
+            except Exception as err:
+                err = exceptions.without_token(err)
+                logging.error('Upload of %s failed: %s', file_path, err)
+                return UploadResult(file_path, None, err)
+            return UploadResult(file_path, response, None)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(upload, file_paths))
+
+    @traced
+    def delete_file_from_draft_record(self, filebucket_id, key):
+        """
+        Delete a file from the bucket of a draft record.
+
+        :param filebucket_id: identifier for a set of files, or the
+               :class:`~ecasb2share.records.DraftRecord` owning it.
+        :param key: name of the file in the bucket.
+        :return: request status
+        """
+
+        filebucket_id = filebucket_id_of(filebucket_id)
+
+        url = urljoin(self.B2SHARE_URL, '/api/files/' + filebucket_id + '/' + key)
+        token = self.retrieve_access_token().rstrip()
+        payload = {'access_token': token}
+
+        req = self.__send_request('DELETE', url, params=payload)
+        self.__invalidate_bucket_records(filebucket_id)
+        logging.info(req.status_code)
+        return req.status_code
+
+    @traced
+    def sync_directory_to_bucket(self, local_dir, filebucket_id, delete=False,
+                                 max_workers=None, state_path=None,
+                                 dry_run=False):
+        """
+        Upload only the new and changed files of a directory into a file bucket.
+
+        Files are compared with the objects of the bucket by size, then by
+        checksum. Checksums of local files are cached in a state file of the
+        directory, so unchanged files are not read again on the next run.
+
+        :param local_dir: directory whose top-level files are synchronized.
+        :param filebucket_id: identifier for a set of files, or the
+               :class:`~ecasb2share.records.DraftRecord` owning it.
+        :param delete: Optional: delete the files of the bucket that do not
+               exist in the directory. Default: False.
+        :param max_workers: Optional: number of parallel uploads. Default:
+               the size of the connection pool.
+        :param state_path: Optional: path to the state file. Default:
+               .ecasb2share_sync.json in local_dir.
+        :param dry_run: Optional: only report what would be uploaded and
+               deleted.
+
+        :return: :class:`~ecasb2share.sync.SyncReport` (uploaded, unchanged,
+                 deleted, errors)
+        """
+
+        if max_workers is None:
+            max_workers = self.transport.pool_maxsize
+
+        return sync.sync_directory(self, local_dir, filebucket_id_of(filebucket_id),
+                                   delete=delete, max_workers=max_workers,
+                                   state_path=state_path, dry_run=dry_run)
+
+    @traced
+    def download_record_files(self, record_id, local_dir, pattern=None,
+                              draft=False, max_workers=None,
+                              segment_size=download.DEFAULT_SEGMENT_SIZE,
+                              max_segments=4):
+        """
+        Download the files of a record into a local directory.
+
+        Files are written as <name>.part and renamed once their checksum
+        matches the one reported by B2SHARE. Calling this method again after
+        a failure resumes the partial files with HTTP Range requests and skips
+        the files already downloaded. Files larger than segment_size are
+        fetched in parallel segments.
+
+        :param record_id: record id or :class:`~ecasb2share.records.DraftRecord`
+        :param local_dir: directory receiving the files.
+        :param pattern: Optional: shell-style pattern selecting the files to
+               download by name, e.g. '*.nc'. Default: all the files.
+        :param draft: Optional: download the files of a draft rather than of
+               a published record. Default: False.
+        :param max_workers: Optional: number of files downloaded at the same
+               time. Default: the size of the connection pool.
+        :param segment_size: Optional: size of the segments of large files.
+        :param max_segments: Optional: number of segments of a file fetched
+               at the same time.
+
+        :return: list of :class:`~ecasb2share.download.DownloadResult`
+                 (key, file_path, error).
+        """
+
+        if draft:
+            filebucket_id = self.get_filebucketid_from_record(record_id)
+            bucket = self.list_files_in_bucket(filebucket_id) or {}
+            files = [dict(obj, bucket=filebucket_id) for obj in bucket.get('contents', [])]
+        else:
+            record = self.get_specific_record(record_id_of(record_id), draft=False) or {}
+            files = record.get('files', [])
+
+        objects = [{'key': obj['key'], 'size': obj.get('size'),
+                    'checksum': obj.get('checksum'),
+                    'url': urljoin(self.B2SHARE_URL,
+                                   '/api/files/' + obj['bucket'] + '/' + obj['key'])}
+                   for obj in files
+                   if pattern is None or fnmatch.fnmatch(obj['key'], pattern)]
+
+        if max_workers is None:
+            max_workers = self.transport.pool_maxsize
+
+        token = self.retrieve_access_token().rstrip()
+
+        def send(method, url, params=None, **kwargs):
+            params = dict(params or {}, access_token=token)
+            return self.__send_request(method, url, params=params, **kwargs)
+
+        return download.download_files(send, objects, local_dir,
+                                       max_workers=max_workers,
+                                       segment_size=segment_size,
+                                       max_segments=max_segments)
+
+    @traced
     def list_files_in_bucket(self, filebucket_id):
         """
         List the files uploaded into a record object.
@@ -474,88 +1146,73 @@ class EcasShare (object):
         :return: information about all the files in the record object
         """
 
+        filebucket_id = filebucket_id_of(filebucket_id)
+
         token = self.retrieve_access_token()
         payload = {'access_token': token}
 
         if filebucket_id:
             url = urljoin(self.B2SHARE_URL, '/api/files/' + filebucket_id)
-            try:
-                req = self.__send_get_request(url, params=payload)
-                return req.json()
-            except HTTPError as err:
-                msg = '{empty request}'.format(err)
-                raise exceptions.MetadataKeyMissingException(msg=msg)
+            req = self.__send_get_request(url, params=payload)
+            return req.json()
         else:
             print("Filebucket ID is None!")
     # requests
 
-    @staticmethod
-    def __send_get_request(url, params=None, headers=None):
+    def __send_request(self, method, url, **kwargs):
+        """ Send a request over the pooled connections of the client """
 
-        s = Session()
-        REQUEST_METHOD = 'GET'
+        if 'requests' not in globals():
+            _import_requests()
+        return self.transport.send(method, url, **kwargs)
+
+    def __send_get_request(self, url, params=None, headers=None):
 
-        # Build the request
-        _request = Request(REQUEST_METHOD, url, params=params, headers=headers)
-        prepared_request = _request.prepare()
+        REQUEST_METHOD = 'GET'
 
         try:
-            response = s.send(prepared_request)
+            response = self.__send_request(REQUEST_METHOD, url,
+                                           params=params, headers=headers)
 
             # If the response was successful, no Exception will be raised
             response.raise_for_status()
         except HTTPError as http_err:
-            print('HTTP error occurred:' + str(http_err))
-        except Exception as err:
-            print('Other error occurred: ' + err)
+            logging.error('HTTP error occurred: %s', exceptions.error_message(http_err))
+            raise
         else:
             return response
 
-    @staticmethod
-    def __send_put_request(url, files, params, headers):
-
-        s = Session()
+    def __send_put_request(self, url, files=None, params=None, headers=None,
+                           data=None):
 
         REQUEST_METHOD = 'PUT'
 
-        # Build the request
-        _request = Request(REQUEST_METHOD, url, files=files,
-                           params=params, headers=headers)
-        prepared_request = _request.prepare()
-
         try:
-            response = s.send(prepared_request)
+            response = self.__send_request(REQUEST_METHOD, url, files=files,
+                                           data=data, params=params,
+                                           headers=headers)
 
         # If the response was successful, no Exception will be raised
             response.raise_for_status()
         except HTTPError as http_err:
-            print('HTTP error occurred:' + http_err)
-        except Exception as err:
-            print('Other error occurred: ' + err)
+            logging.error('HTTP error occurred: %s', exceptions.error_message(http_err))
+            raise
         else:
             logging.info('Success!')
             return response
 
-    @staticmethod
-    def __send_post_request(url, data, params, headers):
-
-        s = Session()
+    def __send_post_request(self, url, data, params, headers):
 
         REQUEST_MEHOD = 'POST'
 
-        # Build he request
-        _request = Request(REQUEST_MEHOD, url, data=data,
-                           params=params, headers=headers)
-        prepared_request = _request.prepare()
-
         try:
-            response = s.send(prepared_request)
+            response = self.__send_request(REQUEST_MEHOD, url, data=data,
+                                           params=params, headers=headers)
         # If the response was successful, no Exception will be raised
             response.raise_for_status()
         except HTTPError as http_err:
-            print('HTTP error occurred:' + http_err)
-        except Exception as err:
-            print('Other error occurred: ' + err)
+            logging.error('HTTP error occurred: %s', exceptions.error_message(http_err))
+            raise
         else:
             logging.info('Record created!')
             return response
@@ -576,6 +1233,7 @@ class EcasShare (object):
             with open(metadata_json, 'r') as metadata_json:
                 return json.load(metadata_json)
 
+    @traced
     def validate_metadata(self, metadata=None, metadata_file=None):
         """
         Check if mandatory metadata are passed.
@@ -594,8 +1252,43 @@ class EcasShare (object):
             msg = "missing {} key".format(e)
             raise exceptions.MetadataException(msg=msg)
 
+        if self.schema_validation:
+            errors = self.schema_validators.errors(metadata)
+            if errors:
+                raise exceptions.MetadataSchemaException(
+                    msg=' ' + '; '.join(errors), errors=errors)
+
         return metadata
 
+    @traced
+    def validate_many(self, documents, community_id=None):
+        """
+        Validate a batch of metadata documents against their community
+        schema. Each schema is downloaded and compiled once, then reused.
+
+        :param documents: iterable of metadata dicts.
+        :param community_id: Optional: community whose schema is used for
+               all the documents. Default: the community of each document.
+        :return: list with all the errors of each document, in order. The
+                 list of a valid document is empty.
+        """
+
+        return self.schema_validators.validate_many(documents,
+                                                    community_id=community_id)
+
+    def __retrieve_schema_document(self, uri):
+        """ Fetch a document referenced by a community schema """
+
+        cached = self.community_cache.get(uri)
+        if cached is not None:
+            return cached
+
+        req = self.__send_request('GET', uri)
+        req.raise_for_status()
+        document = req.json()
+        self.community_cache.put(uri, document)
+        return document
+
     @staticmethod
     def check_pid_syntax(pid):
         """
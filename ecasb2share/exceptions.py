@@ -1,3 +1,36 @@
+import re
+
+# Query string of a request URL carrying the API access token
+_TOKEN_QUERY = re.compile(r'\?[^\s\'"]*access_token=[^\s\'"]*')
+
+
+def error_message(err):
+    """
+    Message of an error, without the query strings of the request URLs,
+    which carry the API access token.
+
+    :param err: exception or message.
+    :return: str
+    """
+
+    return _TOKEN_QUERY.sub('', str(err))
+
+
+def without_token(err):
+    """
+    Remove the access token from the message of an exception, in place,
+    before the exception is stored or reported.
+
+    :param err: exception.
+    :return: err
+    """
+
+    if any(_TOKEN_QUERY.search(str(arg)) for arg in err.args):
+        err.args = tuple(error_message(arg) if isinstance(arg, (str, Exception)) else arg
+                         for arg in err.args)
+    return err
+
+
 class PidSyntaxException(Exception):
     """
     Raises when Handle syntax not correct.
@@ -55,4 +88,68 @@ class MetadataKeyMissingException(Exception):
             self.msg += ':'+self.concrete_msg
         self.msg += '.'
 
-        super(self.__class__, self).__init__(self.msg)
\ No newline at end of file
+        super(self.__class__, self).__init__(self.msg)
+
+class MetadataSchemaException(Exception):
+    """
+    Raises when metadata do not match the community schema.
+    """
+
+    def __init__(self, **args):
+
+        self.msg = "Metadata not valid against the community schema"
+
+        self.concrete_msg = args['msg']
+        self.errors = args.get('errors', [])
+
+        if self.concrete_msg is not None:
+            self.msg += ':'+self.concrete_msg
+        self.msg += '.'
+
+        super(self.__class__, self).__init__(self.msg)
+
+class CircuitOpenException(Exception):
+    """
+    Raises when requests are not sent because the B2SHARE instance is failing.
+    """
+
+    def __init__(self, **args):
+
+        self.msg = "B2SHARE instance unavailable, request not sent"
+
+        self.concrete_msg = args['msg']
+        self.url = args.get('url')
+
+        if self.url is not None:
+            self.msg += ' ('+self.url+')'
+
+        if self.concrete_msg is not None:
+            self.msg += ':'+self.concrete_msg
+        self.msg += '.'
+
+        super(self.__class__, self).__init__(self.msg)
+
+class ChecksumMismatchException(Exception):
+    """
+    Raises when a local file does not match the object stored by B2SHARE.
+    """
+
+    def __init__(self, **args):
+
+        self.msg = "Checksum mismatch"
+
+        self.concrete_msg = args['msg']
+        self.file_path = args['file_path']
+        self.local = args['local']
+        self.stored = args['stored']
+
+        if self.file_path is not None:
+            self.msg += ' for '+self.file_path
+
+        if self.concrete_msg is not None:
+            self.msg += ':'+self.concrete_msg
+
+        self.msg += '\n\tLocal: ' + self.local + ', stored: ' + self.stored
+        self.msg += '.'
+
+        super(self.__class__, self).__init__(self.msg)
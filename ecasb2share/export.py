@@ -0,0 +1,84 @@
+""" Streaming export of B2SHARE records to JSON Lines.
+
+Records are written one per line as the pages of the search are received,
+so the memory used by an export does not depend on the number of records.
+Exports to a file are written to a temporary file renamed at the end: an
+interrupted export never replaces the result of the previous one.
+
+"""
+
+import gzip
+import json
+import logging
+import os
+import sys
+import tempfile
+
+
+def _is_gzip(output_path, compress):
+
+    if compress is not None:
+        return compress
+    return output_path.endswith('.gz')
+
+
+def write_jsonl(records, stream):
+    """
+    Write records to a binary stream, one JSON document per line.
+
+    :param records: iterable of records (in JSON format).
+    :param stream: binary file object.
+    :return: number of records written.
+    """
+
+    count = 0
+    for record in records:
+        stream.write(json.dumps(record, separators=(',', ':')).encode('utf-8'))
+        stream.write(b'\n')
+        count += 1
+    return count
+
+
+def export_jsonl(records, output_path, compress=None):
+    """
+    Export records to a JSON Lines file.
+
+    :param records: iterable of records (in JSON format), e.g.
+           :exc:`~ecasb2share.ecasb2shareclient.EcasShare.iter_community_records`.
+    :param output_path: path to the output file, or '-' for the standard
+           output.
+    :param compress: Optional: gzip the output. Default: True when
+           output_path ends with .gz.
+    :return: number of records exported.
+    """
+
+    if output_path == '-':
+        stream = sys.stdout.buffer
+        if compress:
+            with gzip.GzipFile(fileobj=stream, mode='wb') as gzip_stream:
+                return write_jsonl(records, gzip_stream)
+        count = write_jsonl(records, stream)
+        stream.flush()
+        return count
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'wb') as output_file:
+            if _is_gzip(output_path, compress):
+                with gzip.GzipFile(fileobj=output_file, mode='wb') as gzip_stream:
+                    count = write_jsonl(records, gzip_stream)
+            else:
+                count = write_jsonl(records, output_file)
+        # Same mode as a file created with open(), not the 0600 of mkstemp
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    logging.info('%d records exported to %s', count, output_path)
+    return count
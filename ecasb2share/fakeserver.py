@@ -0,0 +1,800 @@
+""" Local stand-in for a B2SHARE instance.
+
+:class:`FakeB2Share` serves the subset of the B2SHARE REST API used by
+:class:`~ecasb2share.ecasb2shareclient.EcasShare` from memory: communities and
+their schemas, records and drafts (with search and pagination), JSON-patch
+publication, file buckets and the multipart upload endpoints of the Invenio
+files REST API. Latency and server errors can be injected to exercise the
+client under realistic conditions.
+
+It is meant for tests and benchmarks only::
+
+    with FakeB2Share(latency=0.01) as server:
+        client = EcasShare(url=server.url, token_file='token.txt')
+        record_id, filebucket_id = client.create_draft_record(
+            server.ECAS_COMMUNITY_ID, 'title')
+
+"""
+
+import copy
+import datetime
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+
+ECAS_COMMUNITY_ID = 'd2c6e694-0c0a-4884-ad15-ddf498008320'
+EUDAT_COMMUNITY_ID = 'e9b9792e-79fb-4b07-b6b4-b9c2bd06d095'
+
+# Records are valid if they have these metadata, as in the B2SHARE root schema
+ROOT_SCHEMA = {
+    '$schema': 'http://json-schema.org/draft-04/schema#',
+    'type': 'object',
+    'properties': {
+        'titles': {
+            'type': 'array',
+            'minItems': 1,
+            'items': {
+                'type': 'object',
+                'properties': {'title': {'type': 'string', 'minLength': 1}},
+                'required': ['title']
+            }
+        },
+        'community': {'type': 'string'},
+        'open_access': {'type': 'boolean'},
+        'related_identifiers': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'related_identifier': {'type': 'string'},
+                    'related_identifier_type': {'type': 'string'},
+                    'relation_type': {'type': 'string'}
+                },
+                'required': ['related_identifier']
+            }
+        },
+        'descriptions': {'type': 'array'},
+        'creators': {'type': 'array'},
+        'keywords': {'type': 'array'},
+        'publication_state': {'type': 'string'}
+    },
+    'required': ['titles', 'community', 'open_access']
+}
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _unescape(token):
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def apply_json_patch(document, operations):
+    """
+    Apply add, replace and remove JSON-patch operations to a document.
+
+    :param document: dict to modify in place.
+    :param operations: list of JSON-patch operations.
+    :raise: ValueError when an operation cannot be applied.
+    """
+
+    for operation in operations:
+        tokens = [_unescape(token) for token in operation['path'].split('/')[1:]]
+        if not tokens:
+            raise ValueError('Cannot patch the document root')
+
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token)] if isinstance(parent, list) else parent[token]
+
+        key = tokens[-1]
+        op = operation['op']
+
+        if isinstance(parent, list):
+            if op == 'add':
+                index = len(parent) if key == '-' else int(key)
+                parent.insert(index, operation['value'])
+            elif op == 'replace':
+                parent[int(key)] = operation['value']
+            elif op == 'remove':
+                del parent[int(key)]
+            else:
+                raise ValueError('Unsupported operation: ' + op)
+        else:
+            if op in ('add', 'replace'):
+                if op == 'replace' and key not in parent:
+                    raise ValueError('Path not found: ' + operation['path'])
+                parent[key] = operation['value']
+            elif op == 'remove':
+                del parent[key]
+            else:
+                raise ValueError('Unsupported operation: ' + op)
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing connections early, e.g. aborted downloads, are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            HTTPServer.handle_error(self, request, client_address)
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+
+    """ Routes the requests to the methods of the FakeB2Share instance """
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, avoid the delayed-ACK stall
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        ('GET', r'^/api/communities/?$', 'list_communities'),
+        ('GET', r'^/api/communities/(?P<community_id>[^/]+)/schemas/last$', 'get_schema'),
+        ('GET', r'^/api/records/?$', 'search_records'),
+        ('POST', r'^/api/records/?$', 'create_draft'),
+        ('GET', r'^/api/records/(?P<record_id>[^/]+)/draft$', 'get_draft'),
+        ('PATCH', r'^/api/records/(?P<record_id>[^/]+)/draft$', 'patch_draft'),
+        ('DELETE', r'^/api/records/(?P<record_id>[^/]+)/draft$', 'delete_draft'),
+        ('GET', r'^/api/records/(?P<record_id>[^/]+)$', 'get_record'),
+        ('DELETE', r'^/api/records/(?P<record_id>[^/]+)$', 'delete_record'),
+        ('GET', r'^/api/files/(?P<bucket_id>[^/]+)$', 'list_bucket'),
+        ('GET', r'^/api/files/(?P<bucket_id>[^/]+)/(?P<key>.+)$', 'get_object'),
+        ('PUT', r'^/api/files/(?P<bucket_id>[^/]+)/(?P<key>.+)$', 'put_object'),
+        ('POST', r'^/api/files/(?P<bucket_id>[^/]+)/(?P<key>.+)$', 'post_object'),
+        ('DELETE', r'^/api/files/(?P<bucket_id>[^/]+)/(?P<key>.+)$', 'delete_object'),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    # body
+
+    def iter_body(self, chunk_size=1024 * 1024):
+        """ Read the request body in chunks (Content-Length or chunked) """
+
+        if self.body_consumed:
+            return
+
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                remaining = size
+                while remaining:
+                    data = self.rfile.read(min(chunk_size, remaining))
+                    remaining -= len(data)
+                    yield data
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get('Content-Length', 0))
+            while remaining > 0:
+                data = self.rfile.read(min(chunk_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+        self.body_consumed = True
+
+    def read_body(self):
+        return b''.join(self.iter_body())
+
+    def read_json(self):
+        return json.loads(self.read_body().decode('utf-8'))
+
+    # responses
+
+    def send_json(self, status, body, headers=None):
+
+        # Drain the unread body so that the connection can be reused
+        for _ in self.iter_body():
+            pass
+
+        data = json.dumps(body).encode('utf-8') if status not in (204, 304) else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message, headers=None):
+        self.send_json(status, {'status': status, 'message': message}, headers)
+
+    def _dispatch(self, method):
+
+        fake = self.server.fake
+        self.body_consumed = False
+        split_url = urlsplit(self.path)
+        self.query = {key: values[-1] for key, values in
+                      parse_qs(split_url.query, keep_blank_values=True).items()}
+        fake.log_request(method, split_url.path, self.query)
+
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        if fake.inject_error():
+            self.send_error_json(503, 'Service unavailable (injected error)',
+                                 {'Retry-After': '0'})
+            return
+
+        for route_method, pattern, handler_name in self.ROUTES:
+            if route_method != method:
+                continue
+            match = re.match(pattern, split_url.path)
+            if match:
+                try:
+                    getattr(fake, 'handle_' + handler_name)(self, **match.groupdict())
+                except (KeyError, ValueError, IndexError, TypeError) as err:
+                    self.send_error_json(400, 'Bad request: {}'.format(err))
+                return
+
+        self.send_error_json(404, 'Not found')
+
+
+class FakeB2Share(object):
+
+    """ In-memory B2SHARE server listening on a local port """
+
+    ECAS_COMMUNITY_ID = ECAS_COMMUNITY_ID
+    EUDAT_COMMUNITY_ID = EUDAT_COMMUNITY_ID
+
+    # Sort options of the record search: record field and descending order
+    SORT_OPTIONS = {
+        'bestmatch': ('created', True), 'mostrecent': ('created', True),
+        '_created': ('created', False), '-_created': ('created', True),
+        '_updated': ('updated', False), '-_updated': ('updated', True)}
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0,
+                 seed=None, store_content=True, token=None):
+        """
+        Initialize the server.
+
+        :param host: Optional: interface to listen on.
+        :param port: Optional: port to listen on. Default: a free port.
+        :param latency: Optional: seconds added to every request.
+        :param error_rate: Optional: fraction of requests answered with an
+               injected 503 error.
+        :param seed: Optional: seed of the error injection.
+        :param store_content: Optional: keep uploaded file content in memory.
+               When False only sizes and checksums are kept, for benchmarks
+               with large files.
+        :param token: Optional: access token required by write requests.
+        """
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.store_content = store_content
+        self.token = token
+
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self.requests = []
+
+        self.communities = {}
+        self.schemas = {}
+        self.drafts = {}
+        self.records = {}
+        self.buckets = {}
+        self.multipart_uploads = {}
+
+        for community_id, name in ((ECAS_COMMUNITY_ID, 'ECAS'),
+                                   (EUDAT_COMMUNITY_ID, 'EUDAT')):
+            self.add_community(community_id, name)
+
+        self.httpd = _ThreadingHTTPServer((host, port), _RequestHandler)
+        self.httpd.fake = self
+        self.thread = None
+
+    @property
+    def url(self):
+        """ Base URL of the server """
+
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    # lifecycle
+
+    def start(self):
+        """ Serve requests in a background thread """
+
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       kwargs={'poll_interval': 0.05},
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """ Stop serving and close the listening socket """
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    # bookkeeping
+
+    def log_request(self, method, path, query):
+
+        with self._lock:
+            self.requests.append((method, path, query))
+
+    def count_requests(self, method=None, path=None):
+        """
+        Number of requests received, optionally filtered.
+
+        :param method: Optional: HTTP method.
+        :param path: Optional: regular expression matched against the path.
+        """
+
+        with self._lock:
+            return sum(1 for request in self.requests
+                       if (method is None or request[0] == method) and
+                       (path is None or re.search(path, request[1])))
+
+    def inject_error(self):
+
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def _check_token(self, handler):
+
+        if self.token is not None and handler.query.get('access_token') != self.token:
+            handler.send_error_json(401, 'Unauthorized')
+            return False
+        return True
+
+    def add_community(self, community_id, name, schema=None):
+        """
+        Add a community and its schema.
+
+        :param community_id: community id.
+        :param name: community name.
+        :param schema: Optional: JSON schema of the records of the community.
+        """
+
+        now = _now()
+        self.communities[community_id] = {
+            'id': community_id, 'name': name, 'description': name + ' community',
+            'created': now, 'updated': now, 'logo': '', 'publication_workflow':
+                'direct_publish', 'restricted_submission': False,
+            'links': {'self': '/api/communities/' + community_id,
+                      'schema': '/api/communities/' + community_id + '/schemas/last'}}
+        self.schemas[community_id] = schema if schema is not None else copy.deepcopy(ROOT_SCHEMA)
+
+    # communities
+
+    def handle_list_communities(self, handler):
+
+        hits = list(self.communities.values())
+        handler.send_json(200, {'hits': {'hits': hits, 'total': len(hits)},
+                                'links': {'self': self.url + '/api/communities/'}})
+
+    def handle_get_schema(self, handler, community_id):
+
+        if community_id not in self.communities:
+            handler.send_error_json(404, 'Community not found')
+            return
+
+        schema = self.schemas[community_id]
+        # As in B2SHARE, drafts may still miss required metadata
+        draft_schema = dict((key, value) for key, value in schema.items() if key != 'required')
+        handler.send_json(200, {
+            'community': community_id, 'version': 0,
+            'json_schema': schema, 'draft_json_schema': draft_schema,
+            'links': {'self': self.url + '/api/communities/' + community_id +
+                      '/schemas/0'}})
+
+    # records
+
+    def _new_bucket(self):
+
+        bucket_id = str(uuid.uuid4())
+        self.buckets[bucket_id] = {}
+        return bucket_id
+
+    def _record_links(self, record_id, bucket_id, draft):
+
+        base = self.url + '/api/records/' + record_id
+        links = {'files': self.url + '/api/files/' + bucket_id,
+                 'publication': base,
+                 'versions': base + '/versions'}
+        links['self'] = base + '/draft' if draft else base
+        return links
+
+    def _matches(self, record, query):
+
+        if not query:
+            return True
+        if ' AND ' in query:
+            return all(self._matches(record, term) for term in query.split(' AND '))
+        if query.startswith('community:'):
+            return record['metadata'].get('community') == query[len('community:'):]
+        match = re.match(r'(_created|_updated):\["?([^"]+)"? TO \*\]$', query)
+        if match:
+            return record[match.group(1)[1:]] >= match.group(2)
+        return query.lower() in json.dumps(record['metadata']).lower()
+
+    @staticmethod
+    def _check_query(query):
+
+        for term in query.split(' AND '):
+            field = re.match(r'([\w.]+):', term)
+            if field and field.group(1) not in ('community', '_created', '_updated'):
+                # Like Elasticsearch, a field missing from the mapping is an
+                # error rather than a term matching nothing
+                raise ValueError('unsupported search field ' + field.group(1))
+
+    def handle_search_records(self, handler):
+
+        query = handler.query
+        drafts = 'drafts' in query
+        source = self.drafts if drafts else self.records
+
+        self._check_query(query.get('q', ''))
+        with self._lock:
+            hits = [record for record in source.values()
+                    if self._matches(record, query.get('q', ''))]
+
+        sort = query.get('sort', 'mostrecent')
+        if sort not in self.SORT_OPTIONS:
+            raise ValueError('unsupported sort ' + sort)
+        field, reverse = self.SORT_OPTIONS[sort]
+        hits.sort(key=lambda record: record[field], reverse=reverse)
+
+        size = int(query.get('size', 10))
+        page = int(query.get('page', 1))
+        page_hits = hits[(page - 1) * size:page * size]
+
+        link_query = {key: value for key, value in query.items()
+                      if key != 'access_token'}
+
+        def page_link(number):
+            return self.url + '/api/records/?' + urlencode(dict(link_query, page=number, size=size))
+
+        links = {'self': page_link(page)}
+        if page * size < len(hits):
+            links['next'] = page_link(page + 1)
+        if page > 1:
+            links['prev'] = page_link(page - 1)
+
+        handler.send_json(200, {'hits': {'hits': [self._public(hit) for hit in page_hits],
+                                         'total': len(hits)},
+                                'links': links,
+                                'aggregations': {}})
+
+    def handle_create_draft(self, handler):
+
+        if not self._check_token(handler):
+            return
+
+        metadata = handler.read_json()
+        for key in ('titles', 'community', 'open_access'):
+            if key not in metadata:
+                handler.send_error_json(400, 'Validation error: missing ' + key)
+                return
+        if metadata['community'] not in self.communities:
+            handler.send_error_json(400, 'Validation error: unknown community')
+            return
+
+        record_id = uuid.uuid4().hex
+        now = _now()
+        metadata = dict(metadata, publication_state='draft')
+
+        with self._lock:
+            bucket_id = self._new_bucket()
+            draft = {'id': record_id, 'created': now, 'updated': now,
+                     'revision': 0, 'bucket_id': bucket_id,
+                     'metadata': metadata,
+                     'links': self._record_links(record_id, bucket_id, True)}
+            self.drafts[record_id] = draft
+
+        handler.send_json(201, self._public(draft), {'ETag': '"0"'})
+
+    @staticmethod
+    def _public(record):
+
+        record = copy.deepcopy(record)
+        record.pop('bucket_id', None)
+        record.pop('revision', None)
+        return record
+
+    def handle_get_draft(self, handler, record_id):
+
+        draft = self.drafts.get(record_id)
+        if draft is None:
+            handler.send_error_json(404, 'Draft not found')
+            return
+        # As in B2SHARE, file changes do not change the revision of the draft
+        with self._lock:
+            draft = dict(draft, files=self._files_of(draft['bucket_id']))
+        self._send_record(handler, draft)
+
+    def handle_get_record(self, handler, record_id):
+
+        record = self.records.get(record_id)
+        if record is None:
+            handler.send_error_json(404, 'Record not found')
+            return
+        self._send_record(handler, record)
+
+    def _send_record(self, handler, record):
+
+        etag = '"{}"'.format(record['revision'])
+        if handler.headers.get('If-None-Match') == etag:
+            handler.send_json(304, None, {'ETag': etag})
+            return
+        handler.send_json(200, self._public(record), {'ETag': etag})
+
+    def handle_patch_draft(self, handler, record_id):
+
+        if not self._check_token(handler):
+            return
+
+        operations = handler.read_json()
+
+        with self._lock:
+            draft = self.drafts.get(record_id)
+            if draft is None:
+                handler.send_error_json(404, 'Draft not found')
+                return
+
+            metadata = copy.deepcopy(draft['metadata'])
+            apply_json_patch(metadata, operations)
+
+            draft['metadata'] = metadata
+            draft['updated'] = _now()
+            draft['revision'] += 1
+
+            if metadata.get('publication_state') == 'submitted':
+                self._publish(draft)
+
+        handler.send_json(200, self._public(draft),
+                          {'ETag': '"{}"'.format(draft['revision'])})
+
+    def _publish(self, draft):
+
+        record_id = draft['id']
+        metadata = draft['metadata']
+        metadata['publication_state'] = 'published'
+        metadata['ePIC_PID'] = 'http://hdl.handle.net/0000/' + record_id
+        metadata['DOI'] = 'http://doi.org/00.0000/b2share.' + record_id
+
+        record = copy.deepcopy(draft)
+        record['links'] = self._record_links(record_id, draft['bucket_id'], False)
+        record['files'] = self._files_of(draft['bucket_id'])
+        self.records[record_id] = record
+
+    def _files_of(self, bucket_id):
+
+        return [{'bucket': bucket_id, 'key': key,
+                 'checksum': obj['checksum'], 'size': obj['size'],
+                 'version_id': obj['version_id'],
+                 'ePIC_PID': 'http://hdl.handle.net/0000/' + obj['version_id']}
+                for key, obj in sorted(self.buckets[bucket_id].items())]
+
+    def handle_delete_draft(self, handler, record_id):
+
+        if not self._check_token(handler):
+            return
+
+        with self._lock:
+            if self.drafts.pop(record_id, None) is None:
+                handler.send_error_json(404, 'Draft not found')
+                return
+        handler.send_json(204, None)
+
+    def handle_delete_record(self, handler, record_id):
+
+        if not self._check_token(handler):
+            return
+
+        with self._lock:
+            if self.records.pop(record_id, None) is None:
+                handler.send_error_json(404, 'Record not found')
+                return
+        handler.send_json(204, None)
+
+    # files
+
+    def _object_json(self, bucket_id, key, obj):
+
+        return {'key': key, 'size': obj['size'], 'checksum': obj['checksum'],
+                'version_id': obj['version_id'], 'updated': obj['updated'],
+                'mimetype': 'application/octet-stream',
+                'links': {'self': self.url + '/api/files/' + bucket_id + '/' + key}}
+
+    def handle_list_bucket(self, handler, bucket_id):
+
+        bucket = self.buckets.get(bucket_id)
+        if bucket is None:
+            handler.send_error_json(404, 'Bucket not found')
+            return
+
+        with self._lock:
+            contents = [self._object_json(bucket_id, key, obj)
+                        for key, obj in sorted(bucket.items())]
+
+        handler.send_json(200, {'id': bucket_id, 'contents': contents,
+                                'size': sum(obj['size'] for obj in contents),
+                                'links': {'self': self.url + '/api/files/' + bucket_id}})
+
+    def _store_object(self, bucket_id, key, chunks):
+
+        md5 = hashlib.md5()
+        size = 0
+        content = [] if self.store_content else None
+
+        for chunk in chunks:
+            md5.update(chunk)
+            size += len(chunk)
+            if content is not None:
+                content.append(chunk)
+
+        obj = {'size': size, 'checksum': 'md5:' + md5.hexdigest(),
+               'version_id': str(uuid.uuid4()), 'updated': _now(),
+               'content': b''.join(content) if content is not None else None}
+
+        with self._lock:
+            self.buckets[bucket_id][key] = obj
+        return obj
+
+    def handle_put_object(self, handler, bucket_id, key):
+
+        if not self._check_token(handler):
+            return
+        if bucket_id not in self.buckets:
+            handler.send_error_json(404, 'Bucket not found')
+            return
+
+        if 'uploadId' in handler.query:
+            self._upload_part(handler, bucket_id, key)
+            return
+
+        obj = self._store_object(bucket_id, key, handler.iter_body())
+        handler.send_json(200, self._object_json(bucket_id, key, obj))
+
+    def handle_get_object(self, handler, bucket_id, key):
+
+        if 'uploadId' in handler.query:
+            self._list_parts(handler)
+            return
+
+        obj = self.buckets.get(bucket_id, {}).get(key)
+        if obj is None:
+            handler.send_error_json(404, 'Object not found')
+            return
+        if obj['content'] is None:
+            handler.send_error_json(404, 'Object content not stored')
+            return
+
+        size = obj['size']
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d+)-(\d*)$', handler.headers.get('Range', ''))
+
+        if match:
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), size - 1)
+            if start >= size or start > end:
+                handler.send_error_json(416, 'Range not satisfiable')
+                return
+            handler.send_response(206)
+            handler.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, end, size))
+        else:
+            handler.send_response(200)
+
+        handler.send_header('Content-Type', 'application/octet-stream')
+        handler.send_header('Accept-Ranges', 'bytes')
+        handler.send_header('Content-Length', str(end - start + 1))
+        handler.end_headers()
+        handler.wfile.write(obj['content'][start:end + 1])
+
+    def handle_delete_object(self, handler, bucket_id, key):
+
+        if not self._check_token(handler):
+            return
+
+        with self._lock:
+            if 'uploadId' in handler.query:
+                self.multipart_uploads.pop(handler.query['uploadId'], None)
+            elif self.buckets.get(bucket_id, {}).pop(key, None) is None:
+                handler.send_error_json(404, 'Object not found')
+                return
+        handler.send_json(204, None)
+
+    # multipart uploads
+
+    def handle_post_object(self, handler, bucket_id, key):
+
+        if not self._check_token(handler):
+            return
+
+        if 'uploads' in handler.query:
+            upload_id = str(uuid.uuid4())
+            with self._lock:
+                self.multipart_uploads[upload_id] = {
+                    'bucket_id': bucket_id, 'key': key,
+                    'size': int(handler.query['size']),
+                    'part_size': int(handler.query['partSize']), 'parts': {}}
+            handler.send_json(200, {'id': upload_id, 'key': key,
+                                    'bucket': bucket_id,
+                                    'size': int(handler.query['size']),
+                                    'part_size': int(handler.query['partSize'])})
+        elif 'uploadId' in handler.query:
+            with self._lock:
+                upload = self.multipart_uploads.pop(handler.query['uploadId'], None)
+            if upload is None:
+                handler.send_error_json(404, 'Upload not found')
+                return
+            parts = [upload['parts'][number] for number in sorted(upload['parts'])]
+            obj = self._store_object(bucket_id, key, iter(parts))
+            if obj['size'] != upload['size']:
+                handler.send_error_json(400, 'Incomplete multipart upload')
+                return
+            handler.send_json(200, self._object_json(bucket_id, key, obj))
+        else:
+            handler.send_error_json(405, 'Method not allowed')
+
+    def _upload_part(self, handler, bucket_id, key):
+
+        upload = self.multipart_uploads.get(handler.query['uploadId'])
+        if upload is None:
+            handler.send_error_json(404, 'Upload not found')
+            return
+
+        part_number = int(handler.query['partNumber'])
+        upload['parts'][part_number] = handler.read_body()
+        handler.send_json(200, {'part_number': part_number,
+                                'size': len(upload['parts'][part_number])})
+
+    def _list_parts(self, handler):
+
+        upload = self.multipart_uploads.get(handler.query['uploadId'])
+        if upload is None:
+            handler.send_error_json(404, 'Upload not found')
+            return
+
+        parts = [{'part_number': number, 'size': len(data)}
+                 for number, data in sorted(upload['parts'].items())]
+        handler.send_json(200, {'id': handler.query['uploadId'], 'parts': parts})
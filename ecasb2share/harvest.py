@@ -0,0 +1,110 @@
+""" Incremental harvesting of record changes into a local index.
+
+The first harvest of a scope (all the records, or the records of one
+community) fetches every record. The greatest update time seen is then
+stored in the index as a high-water mark, and the next harvests only ask
+B2SHARE for the records updated since that mark, sorted by update time::
+
+    _updated:["2019-02-14T10:00:00+00:00" TO *]
+
+``_updated`` is the update time in the search index of B2SHARE, returned as
+``updated`` in the records.
+
+The window starts ``overlap`` seconds before the mark, so records indexed
+late by the search engine, or sharing the time of the mark, are fetched
+again rather than missed; adding them again is harmless.
+
+Deletions do not show in the listing of updated records: a full harvest
+also removes from the index the records of the scope it did not see.
+
+"""
+
+import datetime
+import logging
+import re
+
+from collections import namedtuple
+
+
+# Outcome of a harvest: number of records fetched and removed, and the new
+# high-water mark
+HarvestReport = namedtuple('HarvestReport', ['fetched', 'removed', 'high_water_mark'])
+
+_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def shift_timestamp(timestamp, seconds):
+    """
+    Move an ISO 8601 timestamp back in time.
+
+    :param timestamp: e.g. '2019-02-14T10:00:00.123456+00:00'.
+    :param seconds: number of seconds.
+    :return: the shifted timestamp, or the timestamp unchanged when it
+             cannot be parsed.
+    """
+
+    match = re.match(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d+)?(.*)$', timestamp)
+    if not match:
+        return timestamp
+
+    shifted = datetime.datetime.strptime(match.group(1), _TIMESTAMP_FORMAT) - \
+        datetime.timedelta(seconds=seconds)
+    return shifted.strftime(_TIMESTAMP_FORMAT) + (match.group(2) or '') + match.group(3)
+
+
+def harvest(client, index, community_id=None, full=False, overlap=60,
+            size=100):
+    """
+    Apply the records created or updated since the last harvest to an index.
+
+    :param client: :class:`~ecasb2share.ecasb2shareclient.EcasShare`
+    :param index: :class:`~ecasb2share.index.RecordIndex`
+    :param community_id: Optional: only harvest the records of this community.
+    :param full: Optional: fetch all the records and remove the records that
+           no longer exist. Default: only when the scope was never harvested.
+    :param overlap: Optional: seconds before the high-water mark at which
+           the window of an incremental harvest starts.
+    :param size: Optional: number of records fetched per page.
+    :return: :class:`HarvestReport`
+    """
+
+    mark_key = 'harvest:' + (community_id or '*')
+    mark = None if full else index.get_property(mark_key)
+
+    terms = []
+    if community_id is not None:
+        terms.append('community:' + community_id)
+    if mark is not None:
+        terms.append('_updated:["{}" TO *]'.format(shift_timestamp(mark, overlap)))
+
+    records = client.iter_search(' AND '.join(terms), size=size, sort='_updated')
+
+    seen = set() if mark is None else None
+    state = {'fetched': 0, 'mark': mark}
+
+    def track(records):
+        for record in records:
+            state['fetched'] += 1
+            if seen is not None:
+                seen.add(record['id'])
+            updated = record.get('updated')
+            if updated and (state['mark'] is None or updated > state['mark']):
+                state['mark'] = updated
+            yield record
+
+    index.add_many(track(records))
+
+    removed = 0
+    if seen is not None:
+        missing = index.ids(community=community_id) - seen
+        index.remove_many(missing)
+        removed = len(missing)
+
+    # Stored only once every record is applied: an interrupted harvest is
+    # simply started again from the previous mark
+    if state['mark'] is not None:
+        index.set_property(mark_key, state['mark'])
+
+    logging.info('%d records harvested, %d removed, high-water mark %s',
+                 state['fetched'], removed, state['mark'])
+    return HarvestReport(state['fetched'], removed, state['mark'])
@@ -0,0 +1,383 @@
+""" Local search index of B2SHARE record metadata.
+
+:class:`RecordIndex` mirrors the metadata of records into a SQLite database:
+titles, descriptions, keywords and creators are indexed for full-text search
+(FTS5), and PIDs and related identifiers are kept in indexed tables for exact
+lookups. Queries are answered locally in milliseconds, without network
+access, once the index has been filled from the paginated record listing::
+
+    index = RecordIndex('records.sqlite')
+    index.add_many(client.iter_community_records(community_id, size=100))
+    index.derived_from('http://hdl.handle.net/21.T12995/...')
+
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from .diskcache import default_cache_dir
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS records (
+    id TEXT PRIMARY KEY,
+    community TEXT,
+    title TEXT,
+    publication_state TEXT,
+    doi TEXT,
+    epic_pid TEXT,
+    created TEXT,
+    updated TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_community ON records (community);
+CREATE INDEX IF NOT EXISTS records_doi ON records (doi);
+CREATE INDEX IF NOT EXISTS records_epic_pid ON records (epic_pid);
+CREATE INDEX IF NOT EXISTS records_updated ON records (updated);
+
+CREATE TABLE IF NOT EXISTS related_identifiers (
+    record_id TEXT NOT NULL,
+    identifier TEXT NOT NULL,
+    identifier_type TEXT,
+    relation_type TEXT
+);
+CREATE INDEX IF NOT EXISTS related_identifier ON related_identifiers (identifier);
+CREATE INDEX IF NOT EXISTS related_record ON related_identifiers (record_id);
+
+CREATE TABLE IF NOT EXISTS properties (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+_FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5 (
+    title, description, keywords, creators
+);
+'''
+
+# Columns returned by the queries, the full record is read with get()
+_SUMMARY_COLUMNS = ('id', 'community', 'title', 'publication_state', 'doi',
+                    'epic_pid', 'created', 'updated')
+
+
+def default_index_path():
+    """ Path of the index in the user cache directory """
+
+    return os.path.join(default_cache_dir(), 'records.sqlite')
+
+
+def _texts(items, key):
+
+    texts = []
+    for item in items or []:
+        if isinstance(item, dict):
+            item = item.get(key)
+        if item:
+            texts.append(str(item))
+    return texts
+
+
+def _document(record):
+    """ Indexed fields of a record (in JSON format, as returned by B2SHARE) """
+
+    metadata = record.get('metadata', {})
+    titles = _texts(metadata.get('titles'), 'title')
+
+    return {
+        'id': record['id'],
+        'community': metadata.get('community'),
+        'title': titles[0] if titles else None,
+        'titles': ' '.join(titles),
+        'publication_state': metadata.get('publication_state'),
+        'doi': metadata.get('DOI'),
+        'epic_pid': metadata.get('ePIC_PID'),
+        'created': record.get('created'),
+        'updated': record.get('updated'),
+        'description': ' '.join(_texts(metadata.get('descriptions'), 'description')),
+        'keywords': ' '.join(_texts(metadata.get('keywords'), 'keyword')),
+        'creators': ' '.join(_texts(metadata.get('creators'), 'creator_name')),
+        'related_identifiers': metadata.get('related_identifiers') or [],
+    }
+
+
+class RecordIndex(object):
+
+    """ SQLite mirror of record metadata with full-text search """
+
+    def __init__(self, path=None):
+        """
+        Open or create the index.
+
+        :param path: Optional: SQLite database file, or ':memory:'.
+               Default: records.sqlite in the user cache directory.
+        """
+
+        self.path = path or default_index_path()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+
+        with self.connection:
+            self.connection.executescript(_SCHEMA)
+            try:
+                self.connection.executescript(_FTS_SCHEMA)
+                self.full_text = True
+            except sqlite3.OperationalError:
+                logging.warning('SQLite built without FTS5, full-text search '
+                                'falls back to substring matching on titles')
+                self.full_text = False
+
+    def close(self):
+
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # updates
+
+    def _delete(self, record_id):
+
+        # Full-text rows share the rowid of their record
+        if self.full_text:
+            self.connection.execute('DELETE FROM records_fts WHERE rowid IN '
+                                    '(SELECT rowid FROM records WHERE id = ?)',
+                                    (record_id,))
+        self.connection.execute('DELETE FROM records WHERE id = ?', (record_id,))
+        self.connection.execute('DELETE FROM related_identifiers WHERE record_id = ?',
+                                (record_id,))
+
+    def _insert(self, record):
+
+        document = _document(record)
+        self._delete(document['id'])
+
+        cursor = self.connection.execute(
+            'INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (document['id'], document['community'], document['title'],
+             document['publication_state'], document['doi'], document['epic_pid'],
+             document['created'], document['updated'], json.dumps(record)))
+
+        self.connection.executemany(
+            'INSERT INTO related_identifiers VALUES (?, ?, ?, ?)',
+            [(document['id'], related.get('related_identifier'),
+              related.get('related_identifier_type'), related.get('relation_type'))
+             for related in document['related_identifiers']
+             if isinstance(related, dict) and related.get('related_identifier')])
+
+        if self.full_text:
+            self.connection.execute(
+                'INSERT INTO records_fts (rowid, title, description, keywords, creators) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (cursor.lastrowid, document['titles'], document['description'],
+                 document['keywords'], document['creators']))
+
+    def add(self, record):
+        """
+        Add or replace a record.
+
+        :param record: record (in JSON format).
+        """
+
+        self.add_many([record])
+
+    def add_many(self, records, batch_size=500):
+        """
+        Add or replace records, committing them in batches.
+
+        :param records: iterable of records (in JSON format), e.g.
+               :exc:`~ecasb2share.ecasb2shareclient.EcasShare.iter_records`.
+        :param batch_size: Optional: number of records per transaction.
+        :return: number of records added.
+        """
+
+        count = 0
+        batch = []
+
+        def commit():
+            with self._lock, self.connection:
+                for record in batch:
+                    self._insert(record)
+            del batch[:]
+
+        for record in records:
+            batch.append(record)
+            count += 1
+            if len(batch) >= batch_size:
+                commit()
+        commit()
+
+        return count
+
+    def remove(self, record_id):
+        """ Remove a record from the index """
+
+        with self._lock, self.connection:
+            self._delete(record_id)
+
+    def remove_many(self, record_ids):
+        """ Remove records from the index """
+
+        with self._lock, self.connection:
+            for record_id in record_ids:
+                self._delete(record_id)
+
+    # properties
+
+    def get_property(self, key, default=None):
+        """
+        Return a value stored with the index, e.g. a harvesting state.
+        """
+
+        with self._lock:
+            row = self.connection.execute('SELECT value FROM properties WHERE key = ?',
+                                          (key,)).fetchone()
+        return row['value'] if row is not None else default
+
+    def set_property(self, key, value):
+
+        with self._lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO properties VALUES (?, ?)',
+                                    (key, value))
+
+    # queries
+
+    def ids(self, community=None):
+        """
+        Return the ids of the indexed records.
+
+        :param community: Optional: only the records of this community.
+        :return: set of record ids.
+        """
+
+        if community is None:
+            rows = self._rows('SELECT id FROM records')
+        else:
+            rows = self._rows('SELECT id FROM records WHERE community = ?', (community,))
+        return set(row['id'] for row in rows)
+
+    def _rows(self, query, parameters=()):
+
+        with self._lock:
+            rows = self.connection.execute(query, parameters).fetchall()
+        return [dict(row) for row in rows]
+
+    def __len__(self):
+
+        with self._lock:
+            return self.connection.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+    def get(self, record_id):
+        """
+        Return a record.
+
+        :param record_id: record id.
+        :return: the record (in JSON format), or None if not indexed.
+        """
+
+        with self._lock:
+            row = self.connection.execute('SELECT record FROM records WHERE id = ?',
+                                          (record_id,)).fetchone()
+        return json.loads(row['record']) if row is not None else None
+
+    def search(self, text, community=None, limit=20):
+        """
+        Full-text search in the titles, descriptions, keywords and creators.
+
+        :param text: FTS5 query, e.g. 'temperature AND cmip*'.
+        :param community: Optional: only records of this community.
+        :param limit: Optional: maximum number of results.
+        :return: list of record summaries (id, community, title,
+                 publication_state, doi, epic_pid, created, updated), best
+                 matches first.
+        """
+
+        columns = ', '.join('records.' + column for column in _SUMMARY_COLUMNS)
+        condition, parameters = '', [text]
+        if community is not None:
+            condition = ' AND records.community = ?'
+            parameters.append(community)
+        parameters.append(limit)
+
+        if self.full_text:
+            query = ('SELECT ' + columns + ' FROM records_fts '
+                     'JOIN records ON records.rowid = records_fts.rowid '
+                     'WHERE records_fts MATCH ?' + condition +
+                     ' ORDER BY bm25(records_fts) LIMIT ?')
+        else:
+            parameters[0] = '%' + text + '%'
+            query = ('SELECT ' + columns + ' FROM records WHERE title LIKE ?' +
+                     condition + ' ORDER BY updated DESC LIMIT ?')
+
+        return self._rows(query, parameters)
+
+    def find_by_pid(self, pid):
+        """
+        Return the records whose ePIC PID or DOI is pid.
+
+        :param pid: handle or DOI, as stored in the metadata.
+        :return: list of record summaries.
+        """
+
+        return self._rows('SELECT ' + ', '.join(_SUMMARY_COLUMNS) +
+                          ' FROM records WHERE epic_pid = ? OR doi = ?', (pid, pid))
+
+    def derived_from(self, pid):
+        """
+        Return the records derived from a PID, as created by
+        :exc:`~ecasb2share.ecasb2shareclient.EcasShare.create_draft_record_with_pid`.
+
+        :param pid: PID of the original resource.
+        :return: list of record summaries.
+        """
+
+        return self.related_to(pid, relation_type='IsDerivedFrom')
+
+    def related_to(self, identifier, relation_type=None):
+        """
+        Return the records listing an identifier among their related identifiers.
+
+        :param identifier: PID or URL of the related resource.
+        :param relation_type: Optional: only this relation, e.g.
+               'IsDerivedFrom'.
+        :return: list of record summaries.
+        """
+
+        columns = ', '.join('records.' + column for column in _SUMMARY_COLUMNS)
+        query = ('SELECT DISTINCT ' + columns + ' FROM related_identifiers '
+                 'JOIN records ON records.id = related_identifiers.record_id '
+                 'WHERE related_identifiers.identifier = ?')
+        parameters = [identifier]
+        if relation_type is not None:
+            query += ' AND related_identifiers.relation_type = ?'
+            parameters.append(relation_type)
+
+        return self._rows(query, parameters)
+
+    def in_community(self, community, limit=None):
+        """
+        Return the records of a community, most recently updated first.
+
+        :param community: community id.
+        :param limit: Optional: maximum number of results.
+        :return: list of record summaries.
+        """
+
+        query = ('SELECT ' + ', '.join(_SUMMARY_COLUMNS) + ' FROM records '
+                 'WHERE community = ? ORDER BY updated DESC')
+        parameters = [community]
+        if limit is not None:
+            query += ' LIMIT ?'
+            parameters.append(limit)
+
+        return self._rows(query, parameters)
@@ -0,0 +1,259 @@
+""" Per-request instrumentation of the transport layer.
+
+Every attempt made by :class:`~ecasb2share.transport.Transport` is reported
+to the request hooks of the transport as a :class:`RequestEvent`. A hook is
+any callable taking the event; it runs in the thread that sent the request
+and must be fast.
+
+:class:`Metrics` is a hook aggregating the events per endpoint: latency
+histograms, bytes sent and received, retries, status codes and errors. The
+aggregates can be read in-process with :meth:`Metrics.summary` or exported
+in the Prometheus text exposition format::
+
+    client = EcasShare(metrics=True)
+    ...
+    print(client.metrics.to_prometheus())
+
+"""
+
+import bisect
+import os
+import re
+import tempfile
+import threading
+
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+
+# One attempt of a request. status_code is None and error is set when no
+# response was received; attempt is 1 for the first attempt of a request.
+RequestEvent = namedtuple('RequestEvent', [
+    'method', 'url', 'endpoint', 'status_code', 'elapsed', 'bytes_sent',
+    'bytes_received', 'attempt', 'error'])
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_ID_PATTERN = re.compile(r'^([0-9a-f]{32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-'
+                         r'[0-9a-f]{4}-[0-9a-f]{12}|\d+)$', re.IGNORECASE)
+
+
+def endpoint_of(url):
+    """
+    Template of the API endpoint of a URL, so that metrics do not grow with
+    the number of records and files, e.g. /api/records/{id}/draft.
+
+    :param url: request URL.
+    :return: path with record, community and bucket ids and file keys
+             replaced by placeholders.
+    """
+
+    segments = urlsplit(url).path.rstrip('/').split('/')
+
+    # /api/files/<bucket_id>/<key>, where the key may contain slashes
+    if len(segments) > 4 and segments[1:3] == ['api', 'files']:
+        segments = segments[:4] + ['{key}']
+
+    return '/'.join('{id}' if _ID_PATTERN.match(segment) else segment
+                    for segment in segments) or '/'
+
+
+def _labels(*labels):
+    """ Prometheus label set of (name, value) pairs, in the given order """
+
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return '{' + ','.join('{}="{}"'.format(name, escape(value))
+                          for name, value in labels) + '}'
+
+
+class _Histogram(object):
+
+    def __init__(self, buckets):
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """ Estimate of a quantile, interpolated within its bucket """
+
+        if not self.count:
+            return None
+
+        rank = q * self.count
+        cumulated = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulated + count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulated) / count
+            cumulated += count
+        return self.buckets[-1]
+
+
+class Metrics(object):
+
+    """ Request hook aggregating latency, traffic and outcome per endpoint """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='ecasb2share'):
+        """
+        Initialize the metrics.
+
+        :param buckets: Optional: upper bounds in seconds of the latency
+               histogram buckets.
+        :param prefix: Optional: prefix of the exported metric names.
+        """
+
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Forget all the events """
+
+        with self._lock:
+            self.latency = {}
+            self.requests = {}
+            self.bytes_sent = {}
+            self.bytes_received = {}
+            self.retries = {}
+            self.errors = {}
+
+    def __call__(self, event):
+
+        key = (event.method, event.endpoint)
+
+        with self._lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = _Histogram(self.buckets)
+            histogram.observe(event.elapsed)
+
+            status = event.status_code if event.status_code is not None else 'error'
+            status_key = key + (str(status),)
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+
+            self.bytes_sent[key] = self.bytes_sent.get(key, 0) + event.bytes_sent
+            self.bytes_received[key] = self.bytes_received.get(key, 0) + event.bytes_received
+
+            if event.attempt > 1:
+                self.retries[key] = self.retries.get(key, 0) + 1
+            if event.error is not None:
+                error_key = key + (type(event.error).__name__,)
+                self.errors[error_key] = self.errors.get(error_key, 0) + 1
+
+    def summary(self):
+        """
+        Aggregates per endpoint, slowest total time first.
+
+        :return: list of dicts with method, endpoint, count, total_seconds,
+                 mean_seconds, p50_seconds, p95_seconds, p99_seconds,
+                 bytes_sent, bytes_received, retries, errors and
+                 status_codes (dict of status to count).
+        """
+
+        with self._lock:
+            rows = []
+            for (method, endpoint), histogram in self.latency.items():
+                key = (method, endpoint)
+                rows.append({
+                    'method': method, 'endpoint': endpoint,
+                    'count': histogram.count,
+                    'total_seconds': histogram.sum,
+                    'mean_seconds': histogram.sum / histogram.count,
+                    'p50_seconds': histogram.quantile(0.5),
+                    'p95_seconds': histogram.quantile(0.95),
+                    'p99_seconds': histogram.quantile(0.99),
+                    'bytes_sent': self.bytes_sent.get(key, 0),
+                    'bytes_received': self.bytes_received.get(key, 0),
+                    'retries': self.retries.get(key, 0),
+                    'errors': sum(count for error_key, count in self.errors.items()
+                                  if error_key[:2] == key),
+                    'status_codes': dict((status_key[2], count) for status_key, count
+                                         in self.requests.items() if status_key[:2] == key),
+                })
+
+        return sorted(rows, key=lambda row: row['total_seconds'], reverse=True)
+
+    def to_prometheus(self):
+        """
+        Export the metrics in the Prometheus text exposition format.
+
+        :return: str
+        """
+
+        name = self.prefix + '_'
+        lines = []
+
+        def header(metric, metric_type, help_text):
+            lines.append('# HELP {}{} {}'.format(name, metric, help_text))
+            lines.append('# TYPE {}{} {}'.format(name, metric, metric_type))
+
+        def counter(metric, help_text, values, label_names):
+            header(metric, 'counter', help_text)
+            for key, value in sorted(values.items()):
+                lines.append('{}{}{} {}'.format(name, metric,
+                                                _labels(*zip(label_names, key)), value))
+
+        with self._lock:
+            counter('requests_total', 'Requests sent, by response status.',
+                    self.requests, ('method', 'endpoint', 'status'))
+
+            header('request_duration_seconds', 'histogram',
+                   'Time until the response is received '
+                   '(headers only for streamed responses).')
+            metric = name + 'request_duration_seconds'
+            for (method, endpoint), histogram in sorted(self.latency.items()):
+                cumulated = 0
+                bounds = [repr(float(bound)) for bound in self.buckets] + ['+Inf']
+                for bound, count in zip(bounds, histogram.counts):
+                    cumulated += count
+                    lines.append('{}_bucket{} {}'.format(metric, _labels(
+                        ('method', method), ('endpoint', endpoint), ('le', bound)), cumulated))
+                labels = _labels(('method', method), ('endpoint', endpoint))
+                lines.append('{}_sum{} {!r}'.format(metric, labels, histogram.sum))
+                lines.append('{}_count{} {}'.format(metric, labels, histogram.count))
+
+            counter('request_bytes_sent_total', 'Request body bytes sent.',
+                    self.bytes_sent, ('method', 'endpoint'))
+            counter('response_bytes_received_total', 'Response body bytes received.',
+                    self.bytes_received, ('method', 'endpoint'))
+            counter('request_retries_total', 'Attempts that were retries.',
+                    self.retries, ('method', 'endpoint'))
+            counter('request_errors_total', 'Attempts without response, by error.',
+                    self.errors, ('method', 'endpoint', 'error'))
+
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """
+        Atomically write the Prometheus export to a file, e.g. for the
+        textfile collector of the node exporter.
+
+        :param path: output file.
+        """
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as output_file:
+            output_file.write(self.to_prometheus())
+
+        # mkstemp creates the file readable by the owner only, the exporter
+        # may run as another user
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, path)
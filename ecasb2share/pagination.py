@@ -0,0 +1,75 @@
+""" Lazy iteration over the paginated search results of B2SHARE.
+
+Search results are split into pages, each one carrying a ``links.next`` URL
+to the following page. :func:`iter_pages` follows these links on demand and,
+by default, fetches the next page in a background thread while the caller
+consumes the current one.
+
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+def next_page_url(page):
+    """
+    Return the URL of the page following a search result page.
+
+    :param page: search result page (in JSON format).
+    :return: the next URL, or None on the last page.
+    """
+
+    if not page.get('hits', {}).get('hits'):
+        return None
+    return page.get('links', {}).get('next')
+
+
+def iter_pages(fetch_page, url, params=None, prefetch=True):
+    """
+    Iterate over all the pages of a search, starting from a given URL.
+
+    :param fetch_page: callable fetch_page(url, params) returning a page
+           (in JSON format).
+    :param url: URL of the first page.
+    :param params: Optional: query parameters of the first page. The next
+           pages are requested with the URL found in links -> next.
+    :param prefetch: Optional: fetch the next page in the background while
+           the current one is consumed. Default: True.
+    :return: generator of pages.
+    """
+
+    if not prefetch:
+        while url:
+            page = fetch_page(url, params)
+            yield page
+            url, params = next_page_url(page), None
+        return
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(fetch_page, url, params)
+
+    try:
+        while future is not None:
+            page = future.result()
+
+            url = next_page_url(page)
+            future = executor.submit(fetch_page, url, None) if url else None
+
+            yield page
+    finally:
+        if future is not None:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def iter_hits(fetch_page, url, params=None, prefetch=True):
+    """
+    Iterate over the hits of all the pages of a search.
+
+    Same parameters as :func:`iter_pages`.
+
+    :return: generator of hits (records or drafts in JSON format).
+    """
+
+    for page in iter_pages(fetch_page, url, params=params, prefetch=prefetch):
+        for hit in page['hits']['hits']:
+            yield hit
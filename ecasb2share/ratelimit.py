@@ -0,0 +1,221 @@
+""" Client-side rate limiting of the requests sent to B2SHARE.
+
+:class:`RateLimiter` throttles the number of requests per second and the
+number of request body bytes per second with token buckets. Buckets are
+reservations: a caller takes its tokens at once, possibly leaving the bucket
+in debt, and sleeps until the debt would have been refilled. Waiters are thus
+served in order, without polling.
+
+By default the buckets live in memory and are shared by all the threads of
+the client. With a lock file, the bucket state is kept in that file and
+updated under an exclusive lock, so all the processes of the host using the
+same file share the same budget.
+
+"""
+
+import json
+import logging
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows
+    fcntl = None
+
+
+def _refill(tokens, updated, now, rate, capacity, amount):
+    """
+    Take tokens from a bucket.
+
+    :return: (tokens left, delay in seconds before the tokens are available)
+    """
+
+    tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+    tokens -= amount
+    delay = -tokens / rate if tokens < 0 else 0.0
+    return tokens, delay
+
+
+class TokenBucket(object):
+
+    """ Token bucket shared by the threads of a process """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic,
+                 sleep=time.sleep):
+        """
+        Initialize the bucket, full.
+
+        :param rate: tokens added per second.
+        :param capacity: Optional: maximum number of tokens, i.e. the largest
+               burst. Default: one second worth of tokens.
+        :param clock: Optional: monotonic clock.
+        :param sleep: Optional: function used to wait.
+        """
+
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(self.rate, 1.0)
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def reserve(self, amount=1):
+        """
+        Take tokens without waiting.
+
+        :param amount: Optional: number of tokens.
+        :return: delay in seconds before the tokens may be used.
+        """
+
+        with self._lock:
+            now = self.clock()
+            self._tokens, delay = _refill(self._tokens, self._updated, now,
+                                          self.rate, self.capacity, amount)
+            self._updated = now
+        return delay
+
+    def acquire(self, amount=1):
+        """
+        Take tokens, waiting until they are available.
+
+        :param amount: Optional: number of tokens.
+        :return: time waited in seconds.
+        """
+
+        delay = self.reserve(amount)
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+
+class SharedTokenBucket(TokenBucket):
+
+    """ Token bucket stored in a lock file, shared by the processes of a host """
+
+    def __init__(self, path, name, rate, capacity=None, sleep=time.sleep):
+        """
+        Initialize the bucket.
+
+        :param path: lock file holding the state of the buckets.
+        :param name: name of the bucket in the file.
+        :param rate: tokens added per second.
+        :param capacity: Optional: maximum number of tokens.
+        :param sleep: Optional: function used to wait.
+        """
+
+        # Wall clock time, the only clock shared by all the processes
+        super(SharedTokenBucket, self).__init__(rate, capacity, clock=time.time,
+                                                sleep=sleep)
+        self.path = path
+        self.name = name
+
+    def reserve(self, amount=1):
+
+        # The thread lock serializes the threads of this process, flock the processes
+        with self._lock, open(self.path, 'a+') as state_file:
+            fcntl.flock(state_file.fileno(), fcntl.LOCK_EX)
+            try:
+                state_file.seek(0)
+                try:
+                    state = json.loads(state_file.read() or '{}')
+                except ValueError:
+                    state = {}
+
+                now = self.clock()
+                tokens, updated = state.get(self.name, (self.capacity, now))
+                tokens, delay = _refill(tokens, updated, now, self.rate,
+                                        self.capacity, amount)
+                state[self.name] = (tokens, now)
+
+                state_file.seek(0)
+                state_file.truncate()
+                state_file.write(json.dumps(state))
+                state_file.flush()
+            finally:
+                fcntl.flock(state_file.fileno(), fcntl.LOCK_UN)
+        return delay
+
+
+class ThrottledBody(object):
+
+    """ Streamed request body whose chunks are taken from a byte bucket """
+
+    def __init__(self, body, bucket):
+
+        self.body = body
+        self.bucket = bucket
+
+    def __len__(self):
+        return len(self.body)
+
+    def __iter__(self):
+
+        for chunk in self.body:
+            self.bucket.acquire(len(chunk))
+            yield chunk
+
+
+class RateLimiter(object):
+
+    """ Requests per second and body bytes per second limits of a client """
+
+    def __init__(self, requests_per_second=None, bytes_per_second=None,
+                 burst=None, lock_file=None, sleep=time.sleep):
+        """
+        Initialize the limiter.
+
+        :param requests_per_second: Optional: maximum request rate.
+               None means unlimited.
+        :param bytes_per_second: Optional: maximum rate of request body
+               bytes (uploads). None means unlimited.
+        :param burst: Optional: number of requests that may be sent at once
+               after an idle period. Default: one second worth of requests.
+        :param lock_file: Optional: file shared by all the processes of the
+               host that must share the limits. Default: limits apply to
+               this process only.
+        :param sleep: Optional: function used to wait.
+        """
+
+        self.lock_file = lock_file
+
+        if lock_file is not None and fcntl is None:
+            logging.warning('File locks not supported, rate limits of %s '
+                            'apply to this process only', lock_file)
+            lock_file = None
+
+        def bucket(name, rate, capacity=None):
+            if rate is None:
+                return None
+            if lock_file is not None:
+                return SharedTokenBucket(lock_file, name, rate, capacity, sleep=sleep)
+            return TokenBucket(rate, capacity, sleep=sleep)
+
+        self.requests = bucket('requests', requests_per_second, burst)
+        self.bytes = bucket('bytes', bytes_per_second)
+
+    def acquire_request(self):
+        """ Wait until a request may be sent """
+
+        if self.requests is not None:
+            self.requests.acquire()
+
+    def throttle_body(self, body):
+        """
+        Apply the byte rate to a request body.
+
+        Bytes bodies are paid for at once, streamed bodies chunk by chunk as
+        they are sent.
+
+        :param body: prepared request body.
+        :return: the body to send.
+        """
+
+        if self.bytes is None or body is None:
+            return body
+        if isinstance(body, (bytes, str)):
+            self.bytes.acquire(len(body))
+            return body
+        return ThrottledBody(body, self.bytes)
@@ -0,0 +1,85 @@
+""" Handles on B2SHARE records.
+
+:class:`DraftRecord` is built from the response to the creation of a draft,
+which already carries the record id, metadata and links (including the file
+bucket), so no extra request is needed to start uploading files. It is the
+(record_id, filebucket_id) tuple returned by earlier versions, with the
+record as extra attributes.
+
+"""
+
+
+class DraftRecord(tuple):
+
+    """ Draft record returned by the draft creation methods """
+
+    def __new__(cls, record, revision=None):
+
+        files_link = record.get('links', {}).get('files')
+        filebucket_id = files_link.split('/')[-1] if files_link else None
+        return super(DraftRecord, cls).__new__(cls, (record['id'], filebucket_id))
+
+    def __init__(self, record, revision=None):
+        """
+        Initialize the handle.
+
+        :param record: record in JSON format, as returned by B2SHARE.
+        :param revision: Optional: revision of the record, taken from the
+               ETag of the response.
+        """
+
+        self.record = record
+        self.record_id, self.filebucket_id = self
+        self.links = record.get('links', {})
+        self.metadata = record.get('metadata', {})
+        self.created = record.get('created')
+        self.updated = record.get('updated')
+
+        if revision is None:
+            revision = record.get('revision')
+        self.revision = revision
+
+    @classmethod
+    def from_response(cls, response):
+        """
+        Build the handle from the HTTP response of a record creation.
+
+        :param response: HTTP response whose body is the record.
+        :return: :class:`DraftRecord`
+        """
+
+        etag = response.headers.get('ETag')
+        revision = None
+        if etag:
+            if etag.startswith('W/'):
+                etag = etag[2:]
+            revision = etag.strip('"')
+        return cls(response.json(), revision=revision)
+
+    def __getnewargs__(self):
+        # copy and pickle build the tuple from the record
+        return self.record, self.revision
+
+    def __repr__(self):
+        return 'DraftRecord(record_id={!r}, filebucket_id={!r})'.format(
+            self.record_id, self.filebucket_id)
+
+
+def record_id_of(record):
+    """
+    Return the id of a record given as an id or a :class:`DraftRecord`.
+    """
+
+    if isinstance(record, DraftRecord):
+        return record.record_id
+    return record
+
+
+def filebucket_id_of(filebucket):
+    """
+    Return the id of a file bucket given as an id or a :class:`DraftRecord`.
+    """
+
+    if isinstance(filebucket, DraftRecord):
+        return filebucket.filebucket_id
+    return filebucket
@@ -0,0 +1,205 @@
+""" Retry policy and circuit breaker of the transport layer.
+
+:class:`RetryPolicy` decides which failed requests are sent again and how
+long to wait before: jittered exponential backoff, or the delay asked by the
+server in a ``Retry-After`` header. Requests that are not idempotent (POST,
+PATCH) are only retried when the server explicitly did not process them.
+
+:class:`CircuitBreaker` stops sending requests for a while after repeated
+failures, so that a client facing a B2SHARE instance that is down fails
+fast instead of waiting for every request to time out.
+
+"""
+
+import datetime
+import random
+import threading
+import time
+
+from . import exceptions
+
+
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'])
+
+# Status codes meaning that the request was not processed and can be resent
+NOT_PROCESSED_STATUS = frozenset([429, 503])
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header.
+
+    :param value: number of seconds or HTTP date.
+    :return: delay in seconds, or None if the value cannot be parsed.
+    """
+
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    import email.utils
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return max((date - now).total_seconds(), 0.0)
+
+
+class RetryPolicy(object):
+
+    """ Which requests to retry, how many times and after which delay """
+
+    def __init__(self, total=3, backoff_factor=0.5, max_backoff=30,
+                 status_forcelist=(429, 500, 502, 503, 504),
+                 allowed_methods=IDEMPOTENT_METHODS, respect_retry_after=True,
+                 jitter=True, sleep=time.sleep):
+        """
+        Initialize the policy.
+
+        :param total: Optional: maximum number of retries of a request.
+               0 disables retries.
+        :param backoff_factor: Optional: base delay in seconds; the n-th
+               retry waits up to backoff_factor * 2 ** (n - 1).
+        :param max_backoff: Optional: maximum delay between two attempts.
+        :param status_forcelist: Optional: HTTP status codes to retry.
+        :param allowed_methods: Optional: methods retried on any transient
+               failure. Other methods are only retried on 429 and 503
+               responses and on connection timeouts.
+        :param respect_retry_after: Optional: wait as long as the
+               Retry-After header asks. Default: True.
+        :param jitter: Optional: randomize the delays to spread the retries
+               of concurrent clients. Default: True.
+        :param sleep: Optional: function used to wait.
+        """
+
+        self.total = total
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.status_forcelist = frozenset(status_forcelist)
+        self.allowed_methods = frozenset(method.upper() for method in allowed_methods)
+        self.respect_retry_after = respect_retry_after
+        self.jitter = jitter
+        self.sleep = sleep
+
+    def is_retryable_status(self, method, status_code):
+        """ True if a response with this status can be retried """
+
+        if status_code not in self.status_forcelist:
+            return False
+        return method.upper() in self.allowed_methods or \
+            status_code in NOT_PROCESSED_STATUS
+
+    def is_retryable_error(self, method, error):
+        """ True if a request that raised this connection error can be retried """
+
+        from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
+
+        if isinstance(error, ConnectTimeout):
+            # The request never reached the server
+            return True
+        if not isinstance(error, (ConnectionError, Timeout)):
+            return False
+        return method.upper() in self.allowed_methods
+
+    def backoff(self, retry_number, response=None):
+        """
+        Delay before a retry.
+
+        :param retry_number: 1 for the first retry.
+        :param response: Optional: failed response, for its Retry-After header.
+        :return: delay in seconds.
+        """
+
+        if self.respect_retry_after and response is not None:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff)
+
+        delay = min(self.backoff_factor * (2 ** (retry_number - 1)), self.max_backoff)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+
+class CircuitBreaker(object):
+
+    """ Fails fast after repeated failures, until a trial request succeeds """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30,
+                 clock=time.monotonic):
+        """
+        Initialize the breaker.
+
+        :param failure_threshold: Optional: consecutive failures opening the
+               circuit. 0 disables the breaker.
+        :param recovery_timeout: Optional: seconds before a trial request is
+               let through an open circuit.
+        :param clock: Optional: monotonic clock.
+        """
+
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def before_request(self, url=None):
+        """
+        Check if a request can be sent.
+
+        :raise: :exc:`~ecasb2share.exceptions.CircuitOpenException` when the
+                circuit is open.
+        """
+
+        if self.failure_threshold <= 0:
+            return
+
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+
+            elapsed = self.clock() - self.opened_at
+            if self.state == self.OPEN and elapsed >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+
+            if self.state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return
+
+            raise exceptions.CircuitOpenException(
+                msg=' {} consecutive failures, retry in {:.0f}s'.format(
+                    self.failures, max(self.recovery_timeout - elapsed, 0)),
+                url=url)
+
+    def record_success(self):
+
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+
+        if self.failure_threshold <= 0:
+            return
+
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
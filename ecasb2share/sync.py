@@ -0,0 +1,233 @@
+""" Incremental synchronization of a local directory into a file bucket.
+
+The files of the directory are compared with the objects of the bucket, and
+only the files that are new or changed are uploaded. A file whose size
+differs from the object is changed; when the sizes match, the MD5 checksum of
+the file is compared with the checksum of the object. Checksums are kept in a
+state file of the directory, keyed by size and modification time, so
+unchanged files are not read again on the next run::
+
+    {"cube.nc": {"size": 10000, "mtime_ns": 1550000000000000000, "checksum": "md5:..."}}
+
+Like :exc:`~ecasb2share.ecasb2shareclient.EcasShare.add_file_to_draft_record`,
+the object keys are the file names, so only the regular files at the top of
+the directory are synchronized. Hidden files, including the state file, and
+upload checkpoints are ignored.
+
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .upload import DEFAULT_CHUNK_SIZE
+
+
+# Name of the state file written in the synchronized directory
+STATE_FILE_NAME = '.ecasb2share_sync.json'
+
+# Outcome of a synchronization: keys of the objects uploaded, left unchanged
+# and deleted, and (key, error) of the failed operations
+SyncReport = namedtuple('SyncReport', ['uploaded', 'unchanged', 'deleted', 'errors'])
+
+
+def file_checksum(file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Compute the MD5 checksum of a file.
+
+    :return: checksum as 'md5:<hex digest>'.
+    """
+
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as local_file:
+        for chunk in iter(lambda: local_file.read(chunk_size), b''):
+            md5.update(chunk)
+    return 'md5:' + md5.hexdigest()
+
+
+def list_local_files(local_dir):
+    """
+    List the files of a directory to be synchronized.
+
+    :return: dict mapping each file name to its os.stat result.
+    """
+
+    files = {}
+    for entry in os.scandir(local_dir):
+        if entry.name.startswith('.') or entry.name.endswith('.upload.json'):
+            continue
+        if entry.is_file():
+            files[entry.name] = entry.stat()
+    return files
+
+
+class SyncState(object):
+
+    """ Checksums of the files of a directory, persisted between runs """
+
+    def __init__(self, path):
+
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r') as state_file:
+                self.files = json.load(state_file)
+        except (IOError, OSError, ValueError):
+            self.files = {}
+
+    def checksum(self, file_path, name, stat):
+        """
+        Return the checksum of a file, computed only if it changed since it was recorded.
+        """
+
+        with self._lock:
+            entry = self.files.get(name)
+        if entry is not None and entry['size'] == stat.st_size and \
+                entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['checksum']
+
+        checksum = file_checksum(file_path)
+        self.record(name, stat, checksum)
+        return checksum
+
+    def record(self, name, stat, checksum):
+
+        with self._lock:
+            self.files[name] = {'size': stat.st_size,
+                                'mtime_ns': stat.st_mtime_ns,
+                                'checksum': checksum}
+
+    def forget(self, names):
+
+        with self._lock:
+            for name in list(self.files):
+                if name not in names:
+                    del self.files[name]
+
+    def save(self):
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as state_file:
+                with self._lock:
+                    json.dump(self.files, state_file)
+            os.replace(tmp_path, self.path)
+        except (IOError, OSError) as err:
+            # Only costs the checksums to be computed again next time
+            logging.warning('Cannot write sync state %s: %s', self.path, err)
+
+
+def plan_sync(local_dir, local_files, remote_objects, state, delete=False):
+    """
+    Decide which files to upload and which objects to delete.
+
+    :param local_dir: synchronized directory.
+    :param local_files: dict of file name to os.stat result.
+    :param remote_objects: dict of object key to object, as listed by
+           :exc:`~ecasb2share.ecasb2shareclient.EcasShare.list_files_in_bucket`.
+    :param state: :class:`SyncState`
+    :param delete: Optional: delete the objects that have no local file.
+    :return: (names to upload, names unchanged, keys to delete)
+    """
+
+    to_upload = []
+    unchanged = []
+
+    for name, stat in sorted(local_files.items()):
+        remote = remote_objects.get(name)
+        if remote is None or remote.get('size') != stat.st_size:
+            to_upload.append(name)
+            continue
+
+        checksum = state.checksum(os.path.join(local_dir, name), name, stat)
+        if remote.get('checksum', '').lower() == checksum:
+            unchanged.append(name)
+        else:
+            to_upload.append(name)
+
+    to_delete = sorted(set(remote_objects) - set(local_files)) if delete else []
+
+    return to_upload, unchanged, to_delete
+
+
+def sync_directory(client, local_dir, filebucket_id, delete=False,
+                   max_workers=8, state_path=None, dry_run=False):
+    """
+    Upload the new and changed files of a directory into a file bucket.
+
+    :param client: :class:`~ecasb2share.ecasb2shareclient.EcasShare`
+    :param local_dir: directory to synchronize.
+    :param filebucket_id: identifier of the file bucket.
+    :param delete: Optional: delete the objects of the bucket that have no
+           local file. Default: False.
+    :param max_workers: Optional: number of parallel uploads and deletions.
+    :param state_path: Optional: state file. Default: .ecasb2share_sync.json
+           in the directory.
+    :param dry_run: Optional: only report what would be done.
+    :return: :class:`SyncReport`
+    """
+
+    if state_path is None:
+        state_path = os.path.join(local_dir, STATE_FILE_NAME)
+
+    state = SyncState(state_path)
+    local_files = list_local_files(local_dir)
+
+    bucket = client.list_files_in_bucket(filebucket_id) or {}
+    remote_objects = dict((obj['key'], obj) for obj in bucket.get('contents', []))
+
+    to_upload, unchanged, to_delete = plan_sync(local_dir, local_files,
+                                                remote_objects, state, delete)
+
+    if dry_run:
+        state.save()
+        return SyncReport(to_upload, unchanged, to_delete, [])
+
+    def upload(name):
+        stat = local_files[name]
+        result = client.add_file_to_draft_record(
+            os.path.join(local_dir, name), filebucket_id, stream=True)
+        if result.get('checksum'):
+            # Verified against the bytes sent, valid as long as the file is unchanged
+            state.record(name, stat, result['checksum'])
+
+    def remove(key):
+        status_code = client.delete_file_from_draft_record(filebucket_id, key)
+        if status_code not in (200, 204):
+            raise IOError('deletion failed with status {}'.format(status_code))
+
+    def run(operation, key):
+        try:
+            operation(key)
+        except Exception as err:
+            logging.error('Sync of %s failed: %s', key, err)
+            return key, err
+        return key, None
+
+    operations = [(upload, name) for name in to_upload] + \
+        [(remove, key) for key in to_delete]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        outcomes = list(executor.map(lambda operation: run(*operation), operations))
+
+    state.forget(local_files)
+    state.save()
+
+    errors = [(key, err) for key, err in outcomes if err is not None]
+    failed = set(key for key, _ in errors)
+
+    report = SyncReport([name for name in to_upload if name not in failed],
+                        unchanged,
+                        [key for key in to_delete if key not in failed],
+                        errors)
+    logging.info('%d files uploaded, %d unchanged, %d deleted, %d failed',
+                 len(report.uploaded), len(report.unchanged),
+                 len(report.deleted), len(report.errors))
+    return report
@@ -0,0 +1,90 @@
+import asyncio
+import json
+import time
+import unittest
+
+from ecasb2share.asyncclient import AsyncEcasShare
+from ecasb2share.exceptions import (MetadataException, MetadataKeyMissingException,
+                                    PidSyntaxException)
+from unittest.mock import Mock, patch
+
+RECORD = json.load(open('test_files/record.json'))
+
+
+class AsyncEcasShareTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.client = AsyncEcasShare(token_file='test_files/token.txt', max_workers=8)
+
+    def tearDown(self):
+
+        asyncio.run(self.client.close())
+
+    def concurrent_get_specific_record_unit_test(self):
+        """
+        Check if concurrent lookups are all answered, in order.
+        """
+
+        def send(prepared_request, **kwargs):
+            response = Mock(status_code=200)
+            record = dict(RECORD, id=prepared_request.path_url.split('?')[0].split('/')[3])
+            response.text = json.dumps(record)
+            return response
+
+        record_ids = ['record{}'.format(i) for i in range(50)]
+
+        async def lookup():
+            return await asyncio.gather(*[self.client.get_specific_record(record_id, draft=False)
+                                          for record_id in record_ids])
+
+        with patch.object(self.client.client.transport.session, 'send', side_effect=send):
+            records = asyncio.run(lookup())
+
+        self.assertEqual([record['id'] for record in records], record_ids)
+
+    def async_iterator_unit_test(self):
+
+        with patch.object(self.client.client, 'iter_records', return_value=iter([{'id': 1}, {'id': 2}])):
+
+            async def collect():
+                return [record['id'] async for record in self.client.iter_records()]
+
+            self.assertEqual(asyncio.run(collect()), [1, 2])
+
+    def shared_validation_unit_test(self):
+        """
+        Check if validation raises the same exceptions as the blocking client.
+        """
+
+        with self.assertRaises(MetadataException):
+            asyncio.run(self.client.validate_metadata(
+                metadata_file='test_files/metadata_missing_key.json'))
+
+        with self.assertRaises(PidSyntaxException):
+            self.client.check_pid_syntax('00.00000xxxx-yyyy-zzzz')
+
+    def close_does_not_block_loop_unit_test(self):
+        """
+        Check if the loop keeps running while close waits for the requests.
+        """
+
+        async def scenario():
+            running = asyncio.ensure_future(self.client._run(time.sleep, 0.2))
+            await asyncio.sleep(0)
+            closing = asyncio.ensure_future(self.client.close())
+            ticks = 0
+            while not closing.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+            await running
+            return ticks
+
+        self.assertGreater(asyncio.run(scenario()), 5)
+
+    def exception_propagated_unit_test(self):
+
+        with patch.object(self.client.client, 'get_specific_record',
+                          return_value={'metadata': {}}):
+            with self.assertRaises(MetadataKeyMissingException):
+                asyncio.run(self.client.get_record_pid('b4da58206da24b1aacf3b35c66024ea8'))
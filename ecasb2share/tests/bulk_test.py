@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+from ecasb2share.bulk import load_manifest, validate_entries
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.exceptions import MetadataException
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share_cli import main
+
+METADATA = json.load(open('test_files/fake_metadata.json'))
+METADATA_MISSING_KEY = json.load(open('test_files/metadata_missing_key.json'))
+
+
+class BulkCreationTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.manifest_path = os.path.join(self.tmp_dir, 'manifest.jsonl')
+        self.results_path = os.path.join(self.tmp_dir, 'results.jsonl')
+
+        bad_pid = json.loads(json.dumps(METADATA))
+        bad_pid['related_identifiers'][0]['related_identifier'] = 'no-slash'
+
+        with open(self.manifest_path, 'w') as manifest:
+            for i in range(5):
+                manifest.write(json.dumps(dict(METADATA, titles=[{'title': 'cube {}'.format(i)}])) + '\n')
+            manifest.write(json.dumps(METADATA_MISSING_KEY) + '\n')
+            manifest.write(json.dumps(bad_pid) + '\n')
+            manifest.write('{not json\n')
+
+        self.server = FakeB2Share().start()
+        self.ecasb2share = EcasShare(url=self.server.url, token_file='test_files/token.txt')
+
+    def tearDown(self):
+
+        self.ecasb2share.close()
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def load_manifest_directory_unit_test(self):
+
+        manifest_dir = os.path.join(self.tmp_dir, 'metadata')
+        os.mkdir(manifest_dir)
+        shutil.copy('test_files/fake_metadata.json', manifest_dir)
+        shutil.copy('test_files/metadata_missing_key.json', manifest_dir)
+
+        entries = validate_entries(self.ecasb2share, load_manifest(manifest_dir))
+
+        self.assertEqual([entry.source for entry in entries], ['fake_metadata.json', 'metadata_missing_key.json'])
+        self.assertIsNone(entries[0].error)
+        self.assertIn('community', entries[1].error)
+
+    def bulk_create_drafts_unit_test(self):
+        """
+        Check if valid entries are created and every entry gets a result.
+        """
+
+        results = self.ecasb2share.bulk_create_drafts(self.manifest_path, self.results_path, max_workers=4)
+
+        self.assertEqual([result['source'] for result in results],
+                         ['manifest.jsonl:{}'.format(i) for i in range(1, 9)])
+        self.assertTrue(all(result['record_id'] for result in results[:5]))
+        self.assertTrue(all(result['error'] for result in results[5:]))
+        self.assertEqual(len(self.server.drafts), 5)
+
+        with open(self.results_path) as results_file:
+            written = [json.loads(line) for line in results_file]
+        self.assertEqual(sorted(result['source'] for result in written),
+                         sorted(result['source'] for result in results))
+
+    def bulk_create_unknown_community_unit_test(self):
+        """
+        Check if an entry of an unknown community fails alone with schema validation.
+        """
+
+        with open(self.manifest_path, 'w') as manifest:
+            manifest.write(json.dumps(METADATA) + '\n')
+            manifest.write(json.dumps(dict(METADATA, community='nope')) + '\n')
+
+        with EcasShare(url=self.server.url, token_file='test_files/token.txt',
+                       cache_dir=os.path.join(self.tmp_dir, 'cache'), schema_validation=True) as client:
+            results = client.bulk_create_drafts(self.manifest_path, self.results_path)
+
+        self.assertIsNone(results[0]['error'])
+        self.assertIn('nope', results[1]['error'])
+        self.assertIsNone(results[1]['record_id'])
+        with open(self.results_path) as results_file:
+            self.assertEqual(len(results_file.readlines()), 2)
+
+    def token_not_written_unit_test(self):
+        """
+        Check if the errors of rejected requests do not contain the access token.
+        """
+
+        with open(self.manifest_path, 'w') as manifest:
+            manifest.write(json.dumps(dict(METADATA, community='nope')) + '\n')
+
+        results = self.ecasb2share.bulk_create_drafts(self.manifest_path, self.results_path)
+
+        token = self.ecasb2share.retrieve_access_token().strip()
+        self.assertIn('400', results[0]['error'])
+        self.assertNotIn(token, results[0]['error'])
+        with open(self.results_path) as results_file:
+            self.assertNotIn(token, results_file.read())
+
+    def bulk_create_strict_unit_test(self):
+
+        with self.assertRaises(MetadataException):
+            self.ecasb2share.bulk_create_drafts(self.manifest_path, self.results_path, strict=True)
+
+        self.assertEqual(self.server.count_requests(), 0)
+
+    def bulk_create_cli_unit_test(self):
+
+        result = CliRunner().invoke(main, ['--url', self.server.url, '--token-file', 'test_files/token.txt',
+                                           'bulk-create', self.manifest_path, '--results', self.results_path])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('5 drafts created, 3 failed', result.output)
@@ -0,0 +1,104 @@
+import time
+import unittest
+
+from ecasb2share.cache import RecordCache
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+from unittest.mock import patch
+
+
+class RecordCacheTestCase(unittest.TestCase):
+
+    def lru_eviction_unit_test(self):
+
+        cache = RecordCache(maxsize=2, ttl=60)
+        cache.put('a', '{}')
+        cache.put('b', '{}')
+        cache.get('a')
+        cache.put('c', '{}')
+
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+    def ttl_expiry_unit_test(self):
+
+        cache = RecordCache(ttl=0.05)
+        cache.put('a', '{}', '"1"')
+        self.assertTrue(cache.is_fresh(cache.get('a')))
+
+        time.sleep(0.06)
+        self.assertFalse(cache.is_fresh(cache.get('a')))
+
+        cache.touch('a')
+        self.assertTrue(cache.is_fresh(cache.get('a')))
+
+    def disabled_cache_unit_test(self):
+
+        cache = RecordCache(maxsize=0)
+        cache.put('a', '{}')
+
+        self.assertIsNone(cache.get('a'))
+
+    def invalidate_containing_unit_test(self):
+
+        cache = RecordCache(ttl=60)
+        cache.put(('r1', True), '{"links": {"files": "/api/files/bucket-1"}}')
+        cache.put(('r2', True), '{"links": {"files": "/api/files/bucket-2"}}')
+
+        cache.invalidate(containing='bucket-1')
+
+        self.assertIsNone(cache.get(('r1', True)))
+        self.assertIsNotNone(cache.get(('r2', True)))
+
+
+class RecordCacheEndToEndTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = FakeB2Share().start()
+
+    def tearDown(self):
+
+        self.server.stop()
+
+    def repeated_reads_served_from_cache_unit_test(self):
+        """
+        Check if reading the pid and the filebucket id only fetches the record once.
+        """
+
+        with EcasShare(url=self.server.url, token_file='test_files/token.txt') as client:
+            record_id, _ = client.create_draft_record(FakeB2Share.EUDAT_COMMUNITY_ID, 'cached')
+            gets = self.server.count_requests('GET', '/draft$')
+
+            client.get_filebucketid_from_record(record_id)
+            client.get_specific_record(record_id)
+
+            self.assertEqual(self.server.count_requests('GET', '/draft$'), gets)
+
+    def etag_revalidation_unit_test(self):
+        """
+        Check if stale entries are revalidated and 304 answers served from memory.
+        """
+
+        with EcasShare(url=self.server.url, token_file='test_files/token.txt',
+                       record_cache_ttl=0) as client:
+            record_id, _ = client.create_draft_record(FakeB2Share.EUDAT_COMMUNITY_ID, 'revalidated')
+
+            record = client.get_specific_record(record_id)
+            self.assertEqual(record['metadata']['titles'][0]['title'], 'revalidated')
+            self.assertEqual(self.server.requests[-1][0], 'GET')
+
+            with patch.object(client.record_cache, 'touch', wraps=client.record_cache.touch) as mock_touch:
+                self.assertEqual(client.get_specific_record(record_id), record)
+                mock_touch.assert_called_once_with((record_id, True))
+            self.assertEqual(self.server.count_requests('GET', '/draft$'), 2)
+
+    def invalidated_on_publication_unit_test(self):
+
+        with EcasShare(url=self.server.url, token_file='test_files/token.txt') as client:
+            record_id, _ = client.create_draft_record(FakeB2Share.EUDAT_COMMUNITY_ID, 'published')
+            client.submit_draft_for_publication(record_id)
+
+            record = client.get_specific_record(record_id)
+            self.assertEqual(record['metadata']['publication_state'], 'published')
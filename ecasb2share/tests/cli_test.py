@@ -0,0 +1,150 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share_cli import main
+
+
+def documents(output):
+
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{')]
+
+
+class CliTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = FakeB2Share().start()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.options = ['--url', self.server.url, '--token-file', 'test_files/token.txt']
+
+    def tearDown(self):
+
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def invoke(self, *args, **kwargs):
+
+        return CliRunner().invoke(main, self.options + list(args), **kwargs)
+
+    def create_drafts(self, *titles):
+
+        result = self.invoke('drafts', 'create', '--community',
+                             FakeB2Share.ECAS_COMMUNITY_ID, *titles)
+        self.assertEqual(result.exit_code, 0, result.output)
+        return documents(result.stdout)
+
+    def draft_lifecycle_unit_test(self):
+        """
+        Check if drafts are created, published and read as JSON Lines.
+        """
+
+        created = self.create_drafts('cube 1', 'cube 2')
+
+        self.assertEqual([draft['id'] for draft in created], ['cube 1', 'cube 2'])
+        record_ids = '\n'.join(draft['record_id'] for draft in created) + '\n'
+
+        result = self.invoke('drafts', 'publish', input=record_ids)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual([line['status'] for line in documents(result.stdout)], [200, 200])
+
+        result = self.invoke('records', 'get', '--published', input=record_ids)
+        self.assertEqual(result.exit_code, 0, result.output)
+        records = documents(result.stdout)
+        self.assertEqual([record['metadata']['titles'][0]['title'] for record in records],
+                         ['cube 1', 'cube 2'])
+
+        result = self.invoke('records', 'list', '--community',
+                             FakeB2Share.ECAS_COMMUNITY_ID, '--page-size', '1')
+        self.assertEqual(len(documents(result.stdout)), 2)
+
+    def list_drafts_filtered_unit_test(self):
+        """
+        Check if --community and --query also select the drafts listed.
+        """
+
+        self.create_drafts('cube 1', 'cube 2')
+        result = self.invoke('drafts', 'create', '--community',
+                             FakeB2Share.EUDAT_COMMUNITY_ID, 'other cube')
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        result = self.invoke('records', 'list', '--drafts', '--community',
+                             FakeB2Share.ECAS_COMMUNITY_ID, '--query', 'cube 2')
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual([draft['metadata']['titles'][0]['title']
+                          for draft in documents(result.stdout)], ['cube 2'])
+
+    def batch_errors_unit_test(self):
+        """
+        Check if a failed item is reported without stopping the batch.
+        """
+
+        created = self.create_drafts('cube')
+
+        result = self.invoke('drafts', 'delete', 'missing', created[0]['record_id'])
+
+        self.assertEqual(result.exit_code, 1)
+        lines = documents(result.stdout)
+        self.assertEqual(lines[0]['id'], 'missing')
+        self.assertIn('error', lines[0])
+        self.assertEqual(lines[1], {'id': created[0]['record_id'], 'status': 204})
+
+    def command_error_reported_unit_test(self):
+        """
+        Check if an error ending a command is an error line without the token.
+        """
+
+        result = self.invoke('records', 'list', '--query', 'unknown_field:value')
+
+        self.assertEqual(result.exit_code, 1)
+        lines = documents(result.stdout)
+        self.assertEqual(len(lines), 1)
+        self.assertIsNone(lines[0]['id'])
+        self.assertIn('400', lines[0]['error'])
+        with open('test_files/token.txt') as token_file:
+            self.assertNotIn(token_file.read().strip(), result.stdout)
+
+    def files_unit_test(self):
+
+        draft = self.create_drafts('cube')[0]
+        file_path = os.path.join(self.tmp_dir, 'cube.nc')
+        with open(file_path, 'wb') as data_file:
+            data_file.write(b'0' * 100)
+
+        result = self.invoke('files', 'upload', draft['filebucket_id'], file_path)
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        result = self.invoke('files', 'list', draft['filebucket_id'])
+        self.assertEqual([obj['key'] for obj in documents(result.stdout)], ['cube.nc'])
+
+        result = self.invoke('files', 'delete', draft['filebucket_id'], 'cube.nc')
+        self.assertEqual(documents(result.stdout), [{'id': 'cube.nc', 'status': 204}])
+
+    def help_does_not_import_client_unit_test(self):
+        """
+        Check if --help starts without importing the client and requests.
+        """
+
+        code = ('import sys, ecasb2share_cli\n'
+                'try:\n'
+                '    ecasb2share_cli.main(["drafts", "--help"])\n'
+                'except SystemExit:\n'
+                '    pass\n'
+                'print("ecasb2share.ecasb2shareclient" in sys.modules, "requests" in sys.modules)')
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+        output = subprocess.check_output([sys.executable, '-c', code], cwd=root)
+
+        self.assertEqual(output.decode().splitlines()[-1], 'False False')
+
+
+if __name__ == '__main__':
+    unittest.main()
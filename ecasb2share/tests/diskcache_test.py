@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from ecasb2share.diskcache import DiskCache
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+
+
+class DiskCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.cache_dir)
+
+    def shared_between_instances_unit_test(self):
+        """
+        Check if an entry written by one cache is read by another one.
+        """
+
+        DiskCache(self.cache_dir).put('communities', {'hits': {'total': 2}})
+
+        self.assertEqual(DiskCache(self.cache_dir).get('communities'), {'hits': {'total': 2}})
+
+    def ttl_expiry_unit_test(self):
+
+        cache = DiskCache(self.cache_dir, ttl=0.05)
+        cache.put('schema', {'version': 1})
+        time.sleep(0.06)
+
+        self.assertIsNone(cache.get('schema'))
+
+    def size_bounds_unit_test(self):
+
+        cache = DiskCache(self.cache_dir, max_entries=3)
+        for i in range(5):
+            cache.put('key {}'.format(i), i)
+            time.sleep(0.01)
+
+        self.assertEqual(len(os.listdir(self.cache_dir)), 3)
+        self.assertIsNone(cache.get('key 0'))
+        self.assertEqual(cache.get('key 4'), 4)
+
+    def corrupted_entry_unit_test(self):
+
+        cache = DiskCache(self.cache_dir)
+        cache.put('schema', {'version': 1})
+        with open(cache._path('schema'), 'w') as entry_file:
+            entry_file.write('{truncated')
+
+        self.assertIsNone(cache.get('schema'))
+
+    def invalidate_unit_test(self):
+
+        cache = DiskCache(self.cache_dir)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.invalidate('a')
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+
+        cache.invalidate()
+        self.assertIsNone(cache.get('b'))
+
+
+class CommunityCacheEndToEndTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.server = FakeB2Share().start()
+
+    def tearDown(self):
+
+        self.server.stop()
+        shutil.rmtree(self.cache_dir)
+
+    def schema_fetched_once_across_clients_unit_test(self):
+        """
+        Check if a fresh client reuses the schema downloaded by another one.
+        """
+
+        for _ in range(2):
+            with EcasShare(url=self.server.url, token_file='test_files/token.txt',
+                           cache_dir=self.cache_dir) as client:
+                schema = client.get_community_schema(FakeB2Share.ECAS_COMMUNITY_ID)
+                communities = client.list_communities()
+
+        self.assertIn('json_schema', schema)
+        self.assertEqual(communities['hits']['total'], 2)
+        self.assertEqual(self.server.count_requests('GET', '/schemas/last$'), 1)
+        self.assertEqual(self.server.count_requests('GET', '^/api/communities$'), 1)
+
+        client.invalidate_community_cache(FakeB2Share.ECAS_COMMUNITY_ID)
+        client.get_community_schema(FakeB2Share.ECAS_COMMUNITY_ID)
+        self.assertEqual(self.server.count_requests('GET', '/schemas/last$'), 2)
+
+    def authenticated_listing_not_cached_unit_test(self):
+        """
+        Check if the communities listed with a token are not shared through the cache.
+        """
+
+        with EcasShare(url=self.server.url, token_file='test_files/token.txt',
+                       cache_dir=self.cache_dir) as client:
+            client.list_communities(token='token of user A')
+            client.list_communities(token='token of user B')
+            client.list_communities()
+
+        self.assertEqual(self.server.count_requests('GET', '^/api/communities$'), 3)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
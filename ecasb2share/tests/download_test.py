@@ -0,0 +1,159 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from ecasb2share import exceptions
+from ecasb2share.download import FileDownload
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+
+
+class DownloadTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.upload_dir = os.path.join(self.tmp_dir, 'upload')
+        self.local_dir = os.path.join(self.tmp_dir, 'download')
+        os.makedirs(self.upload_dir)
+
+        self.contents = {}
+        for name, size in (('cube_1.nc', 10000), ('cube_2.nc', 2500), ('README.txt', 10)):
+            self.contents[name] = os.urandom(size)
+            with open(os.path.join(self.upload_dir, name), 'wb') as upload_file:
+                upload_file.write(self.contents[name])
+
+        self.server = FakeB2Share().start()
+        self.ecasb2share = EcasShare(url=self.server.url,
+                                     token_file='test_files/token.txt',
+                                     community_cache_ttl=0)
+        self.record_id, filebucket_id = self.ecasb2share.create_draft_record(
+            FakeB2Share.EUDAT_COMMUNITY_ID, 'download')
+        for name in sorted(self.contents):
+            self.ecasb2share.add_file_to_draft_record(
+                os.path.join(self.upload_dir, name), filebucket_id, stream=True)
+        self.ecasb2share.submit_draft_for_publication(self.record_id)
+
+        self.file_url = '{}/api/files/{}/cube_1.nc'.format(self.server.url, filebucket_id)
+        self.checksum = 'md5:' + hashlib.md5(self.contents['cube_1.nc']).hexdigest()
+        self.range_headers = []
+
+    def tearDown(self):
+
+        self.ecasb2share.close()
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def read(self, name):
+
+        with open(os.path.join(self.local_dir, name), 'rb') as local_file:
+            return local_file.read()
+
+    def send(self, method, url, headers=None, **kwargs):
+
+        self.range_headers.append((headers or {}).get('Range'))
+        return self.ecasb2share.transport.send(method, url, headers=headers, **kwargs)
+
+    def download_all_files_unit_test(self):
+
+        results = self.ecasb2share.download_record_files(self.record_id, self.local_dir)
+
+        self.assertEqual([result.error for result in results], [None] * 3)
+        for name, content in self.contents.items():
+            self.assertEqual(self.read(name), content)
+        self.assertFalse([name for name in os.listdir(self.local_dir) if '.part' in name])
+
+    def completed_files_skipped_unit_test(self):
+        """
+        Check if a second download does not fetch the files already on disk.
+        """
+
+        self.ecasb2share.download_record_files(self.record_id, self.local_dir)
+        gets = self.server.count_requests('GET', r'/api/files/')
+
+        self.ecasb2share.download_record_files(self.record_id, self.local_dir)
+
+        self.assertEqual(self.server.count_requests('GET', r'/api/files/'), gets)
+
+    def pattern_unit_test(self):
+
+        results = self.ecasb2share.download_record_files(self.record_id, self.local_dir,
+                                                         pattern='*.nc')
+
+        self.assertEqual(sorted(result.key for result in results), ['cube_1.nc', 'cube_2.nc'])
+
+    def segmented_download_unit_test(self):
+        """
+        Check if large files are fetched in parallel Range segments.
+        """
+
+        self.ecasb2share.download_record_files(self.record_id, self.local_dir,
+                                               pattern='cube_1.nc', segment_size=1000)
+
+        self.assertEqual(self.read('cube_1.nc'), self.contents['cube_1.nc'])
+        self.assertEqual(self.server.count_requests('GET', r'cube_1\.nc$'), 10)
+
+    def resume_partial_file_unit_test(self):
+
+        file_path = os.path.join(self.tmp_dir, 'cube_1.nc')
+        with open(file_path + '.part', 'wb') as part_file:
+            part_file.write(self.contents['cube_1.nc'][:4000])
+
+        FileDownload(self.send, self.file_url, file_path, size=10000,
+                     checksum=self.checksum, segment_size=20000).run()
+
+        self.assertEqual(self.range_headers, ['bytes=4000-'])
+        with open(file_path, 'rb') as local_file:
+            self.assertEqual(local_file.read(), self.contents['cube_1.nc'])
+
+    def resume_missing_segments_unit_test(self):
+        """
+        Check if an interrupted segmented download only fetches the missing segments.
+        """
+
+        file_path = os.path.join(self.tmp_dir, 'cube_1.nc')
+
+        def failing_send(method, url, headers=None, **kwargs):
+            if headers['Range'].startswith('bytes=3000-'):
+                raise IOError('disk full')
+            return self.send(method, url, headers=headers, **kwargs)
+
+        download = FileDownload(failing_send, self.file_url, file_path, size=10000,
+                                checksum=self.checksum, segment_size=1000, max_segments=1)
+        self.assertRaises(IOError, download.run)
+        self.assertFalse(os.path.exists(file_path))
+
+        self.range_headers = []
+        FileDownload(self.send, self.file_url, file_path, size=10000,
+                     checksum=self.checksum, segment_size=1000, max_segments=1).run()
+
+        self.assertEqual(self.range_headers[0], 'bytes=3000-3999')
+        self.assertNotIn('bytes=0-999', self.range_headers)
+        self.assertNotIn('bytes=2000-2999', self.range_headers)
+        with open(file_path, 'rb') as local_file:
+            self.assertEqual(local_file.read(), self.contents['cube_1.nc'])
+
+    def range_not_supported_unit_test(self):
+
+        file_path = os.path.join(self.tmp_dir, 'cube_1.nc')
+
+        def send_without_range(method, url, headers=None, **kwargs):
+            return self.ecasb2share.transport.send(method, url, **kwargs)
+
+        FileDownload(send_without_range, self.file_url, file_path, size=10000,
+                     checksum=self.checksum, segment_size=1000).run()
+
+        with open(file_path, 'rb') as local_file:
+            self.assertEqual(local_file.read(), self.contents['cube_1.nc'])
+
+    def checksum_mismatch_unit_test(self):
+
+        file_path = os.path.join(self.tmp_dir, 'cube_1.nc')
+        download = FileDownload(self.send, self.file_url, file_path, size=10000,
+                                checksum='md5:00000000000000000000000000000000')
+
+        self.assertRaises(exceptions.ChecksumMismatchException, download.run)
+        self.assertFalse(os.path.exists(file_path))
+        self.assertFalse(os.path.exists(file_path + '.part'))
@@ -0,0 +1,114 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from click.testing import CliRunner
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.export import export_jsonl
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share_cli import main
+
+
+class ExportTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.server = FakeB2Share().start()
+        client = EcasShare(url=cls.server.url, token_file='test_files/token.txt',
+                           community_cache_ttl=0)
+        for index in range(25):
+            community_id = FakeB2Share.ECAS_COMMUNITY_ID if index % 5 else \
+                FakeB2Share.EUDAT_COMMUNITY_ID
+            record_id, _ = client.create_draft_record(community_id, 'cube {}'.format(index))
+            client.submit_draft_for_publication(record_id)
+        client.close()
+
+    @classmethod
+    def tearDownClass(cls):
+
+        cls.server.stop()
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ecasb2share = EcasShare(url=self.server.url,
+                                     token_file='test_files/token.txt',
+                                     community_cache_ttl=0)
+
+    def tearDown(self):
+
+        self.ecasb2share.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def export_community_unit_test(self):
+        """
+        Check if every page of a community is exported, one record per line.
+        """
+
+        output_path = os.path.join(self.tmp_dir, 'ecas.jsonl')
+
+        count = self.ecasb2share.export_records(
+            output_path, community_id=FakeB2Share.ECAS_COMMUNITY_ID, size=7)
+
+        with open(output_path, 'r') as output_file:
+            records = [json.loads(line) for line in output_file]
+        self.assertEqual(count, 20)
+        self.assertEqual(len(set(record['id'] for record in records)), 20)
+        self.assertTrue(all(record['metadata']['community'] == FakeB2Share.ECAS_COMMUNITY_ID
+                            for record in records))
+
+    def export_gzip_unit_test(self):
+
+        output_path = os.path.join(self.tmp_dir, 'all.jsonl.gz')
+
+        count = self.ecasb2share.export_records(output_path, size=10)
+
+        with gzip.open(output_path, 'rt') as output_file:
+            self.assertEqual(len(output_file.readlines()), count)
+        self.assertEqual(count, 25)
+
+    def export_file_mode_unit_test(self):
+        """
+        Check if the export gets the mode of a file created with the umask.
+        """
+
+        output_path = os.path.join(self.tmp_dir, 'records.jsonl')
+
+        umask = os.umask(0o027)
+        try:
+            export_jsonl([{'id': 1}], output_path)
+        finally:
+            os.umask(umask)
+
+        self.assertEqual(os.stat(output_path).st_mode & 0o777, 0o640)
+
+    def interrupted_export_keeps_previous_file_unit_test(self):
+
+        output_path = os.path.join(self.tmp_dir, 'records.jsonl')
+        with open(output_path, 'w') as output_file:
+            output_file.write('previous\n')
+
+        def records():
+            yield {'id': 1}
+            raise IOError('connection lost')
+
+        self.assertRaises(IOError, export_jsonl, records(), output_path)
+
+        with open(output_path, 'r') as output_file:
+            self.assertEqual(output_file.read(), 'previous\n')
+        self.assertEqual(os.listdir(self.tmp_dir), ['records.jsonl'])
+
+    def export_cli_unit_test(self):
+
+        result = CliRunner().invoke(main, ['--url', self.server.url,
+                                           '--token-file', 'test_files/token.txt',
+                                           'export', '--community', FakeB2Share.EUDAT_COMMUNITY_ID])
+
+        self.assertEqual(result.exit_code, 0, result.output)
+        lines = [line for line in result.output.splitlines() if line.startswith('{')]
+        self.assertEqual(len(lines), 5)
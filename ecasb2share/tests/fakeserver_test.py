@@ -0,0 +1,138 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import unittest
+
+from ecasb2share.asyncclient import AsyncEcasShare
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share, apply_json_patch
+
+
+class JsonPatchTestCase(unittest.TestCase):
+
+    def apply_json_patch_unit_test(self):
+
+        document = {'titles': [{'title': 'a'}], 'publication_state': 'draft'}
+        apply_json_patch(document, [
+            {'op': 'add', 'path': '/titles/-', 'value': {'title': 'b'}},
+            {'op': 'replace', 'path': '/publication_state', 'value': 'submitted'},
+            {'op': 'remove', 'path': '/titles/0'}])
+
+        self.assertEqual(document, {'titles': [{'title': 'b'}], 'publication_state': 'submitted'})
+
+
+class FakeB2ShareEndToEndTestCase(unittest.TestCase):
+    """
+    Exercise the clients over real HTTP against the local stand-in server.
+    """
+
+    def setUp(self):
+
+        self.server = FakeB2Share().start()
+        self.ecasb2share = EcasShare(url=self.server.url, token_file='test_files/token.txt')
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        self.ecasb2share.close()
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def write_file(self, name, size):
+
+        file_path = os.path.join(self.tmp_dir, name)
+        with open(file_path, 'wb') as data_file:
+            data_file.write(os.urandom(size))
+        return file_path
+
+    def publish_workflow_unit_test(self):
+        """
+        Create a draft, upload files, submit it and find the published record.
+        """
+
+        record_id, filebucket_id = self.ecasb2share.create_draft_record_with_pid(
+            title='ECAS output', original_pid='00.00000/xxxx-yyyy-zzzz')
+
+        file_path = self.write_file('cube.nc', 5000)
+        self.ecasb2share.add_file_to_draft_record(file_path, filebucket_id, stream=True)
+        self.ecasb2share.add_file_to_draft_record_resumable(
+            self.write_file('big_cube.nc', 10000), filebucket_id, part_size=3000)
+
+        files = self.ecasb2share.list_files_in_bucket(filebucket_id)
+        self.assertEqual(sorted(obj['key'] for obj in files['contents']), ['big_cube.nc', 'cube.nc'])
+
+        self.assertEqual(self.ecasb2share.submit_draft_for_publication(record_id), 200)
+
+        record = self.ecasb2share.get_specific_record(record_id, draft=False)
+        self.assertEqual(record['metadata']['publication_state'], 'published')
+        self.assertEqual(self.ecasb2share.get_record_pid(record_id), 'http://hdl.handle.net/0000/' + record_id)
+
+        records = list(self.ecasb2share.iter_community_records(FakeB2Share.ECAS_COMMUNITY_ID))
+        self.assertEqual([hit['id'] for hit in records], [record_id])
+
+    def pagination_unit_test(self):
+
+        for i in range(7):
+            record_id, _ = self.ecasb2share.create_draft_record(FakeB2Share.EUDAT_COMMUNITY_ID, 'draft {}'.format(i))
+            self.ecasb2share.submit_draft_for_publication(record_id)
+
+        records = list(self.ecasb2share.iter_records(size=3))
+
+        self.assertEqual(len(records), 7)
+        self.assertFalse(any('bucket_id' in record or 'revision' in record for record in records))
+        self.assertEqual(self.server.count_requests('GET', r'^/api/records/?$'), 3)
+
+    def search_rejects_unknown_fields_and_sorts_unit_test(self):
+        """
+        Check if the search answers 400 to fields and sorts B2SHARE does not know.
+        """
+
+        from requests.exceptions import HTTPError
+
+        with self.assertRaises(HTTPError):
+            list(self.ecasb2share.iter_search('updated:["2000-01-01T00:00:00+00:00" TO *]'))
+
+        record_id, _ = self.ecasb2share.create_draft_record(FakeB2Share.EUDAT_COMMUNITY_ID, 'indexed')
+        self.ecasb2share.submit_draft_for_publication(record_id)
+
+        records = list(self.ecasb2share.iter_search(
+            '_updated:["2000-01-01T00:00:00+00:00" TO *]', sort='-_updated'))
+        self.assertEqual([record['id'] for record in records], [record_id])
+
+        for query, sort in (('updated:["2000-01-01T00:00:00+00:00" TO *]', '_updated'),
+                            ('indexed', 'updated')):
+            with self.assertRaises(HTTPError) as context:
+                list(self.ecasb2share.iter_search(query, sort=sort))
+            self.assertEqual(context.exception.response.status_code, 400)
+
+    def list_missing_bucket_unit_test(self):
+
+        from requests.exceptions import HTTPError
+
+        with self.assertRaises(HTTPError) as context:
+            self.ecasb2share.list_files_in_bucket('00000000-0000-0000-0000-000000000000')
+
+        self.assertEqual(context.exception.response.status_code, 404)
+
+    def delete_draft_unit_test(self):
+
+        record_id, _ = self.ecasb2share.create_draft_record(FakeB2Share.EUDAT_COMMUNITY_ID, 'to delete')
+
+        self.assertEqual(self.ecasb2share.delete_draft_record(record_id), 204)
+        self.assertEqual(self.ecasb2share.delete_draft_record(record_id), 404)
+
+    def async_client_unit_test(self):
+
+        async def workflow():
+            async with AsyncEcasShare(client=self.ecasb2share, max_workers=8) as client:
+                drafts = await asyncio.gather(*[
+                    client.create_draft_record(FakeB2Share.EUDAT_COMMUNITY_ID, 'async {}'.format(i))
+                    for i in range(10)])
+                return await asyncio.gather(*[client.get_specific_record(record_id)
+                                              for record_id, _ in drafts])
+
+        records = asyncio.run(workflow())
+
+        self.assertEqual(sorted(record['metadata']['titles'][0]['title'] for record in records),
+                         sorted('async {}'.format(i) for i in range(10)))
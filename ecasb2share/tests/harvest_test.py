@@ -0,0 +1,98 @@
+import unittest
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share.harvest import shift_timestamp
+from ecasb2share.index import RecordIndex
+
+
+class HarvestTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = FakeB2Share().start()
+        self.ecasb2share = EcasShare(url=self.server.url,
+                                     token_file='test_files/token.txt',
+                                     community_cache_ttl=0)
+        self.record_ids = []
+        for index in range(12):
+            community_id = FakeB2Share.ECAS_COMMUNITY_ID if index % 3 else \
+                FakeB2Share.EUDAT_COMMUNITY_ID
+            record_id, _ = self.ecasb2share.create_draft_record(community_id,
+                                                                'cube {}'.format(index))
+            self.ecasb2share.submit_draft_for_publication(record_id)
+            self.record_ids.append(record_id)
+        self.index = RecordIndex(':memory:')
+
+    def tearDown(self):
+
+        self.index.close()
+        self.ecasb2share.close()
+        self.server.stop()
+
+    def update(self, record_id, title, updated='2999-01-01T00:00:00+00:00'):
+
+        record = self.server.records[record_id]
+        record['metadata']['titles'] = [{'title': title}]
+        record['updated'] = updated
+
+    def harvest(self, **kwargs):
+
+        return self.ecasb2share.harvest_records(self.index, overlap=0, size=5, **kwargs)
+
+    def incremental_harvest_unit_test(self):
+        """
+        Check if only the records updated since the high-water mark are fetched.
+        """
+
+        report = self.harvest()
+        self.assertEqual(report.fetched, 12)
+        self.assertEqual(len(self.index), 12)
+
+        # Only the record at the mark itself
+        self.assertEqual(self.harvest().fetched, 1)
+
+        self.update(self.record_ids[4], 'renamed cube')
+        report = self.harvest()
+
+        # The updated record, and again the one at the previous mark
+        self.assertEqual(report.fetched, 2)
+        self.assertEqual(report.high_water_mark, '2999-01-01T00:00:00+00:00')
+        self.assertEqual(self.index.search('renamed')[0]['id'], self.record_ids[4])
+
+    def full_harvest_removes_deleted_unit_test(self):
+
+        self.harvest()
+        del self.server.records[self.record_ids[0]]
+
+        self.assertEqual(self.harvest().removed, 0)
+        report = self.harvest(full=True)
+
+        self.assertEqual(report.removed, 1)
+        self.assertIsNone(self.index.get(self.record_ids[0]))
+        self.assertEqual(len(self.index), 11)
+
+    def community_scope_unit_test(self):
+
+        report = self.harvest(community_id=FakeB2Share.EUDAT_COMMUNITY_ID)
+        self.assertEqual(report.fetched, 4)
+
+        self.update(self.record_ids[1], 'ecas update')
+        report = self.harvest(community_id=FakeB2Share.EUDAT_COMMUNITY_ID)
+        self.assertEqual(report.fetched, 1)
+
+        # First harvest of the other scope fetches everything
+        self.assertEqual(self.harvest().fetched, 12)
+
+    def high_water_mark_persisted_unit_test(self):
+
+        self.harvest()
+        mark = self.index.get_property('harvest:*')
+
+        self.assertEqual(mark, max(record['updated'] for record in self.server.records.values()))
+
+    def shift_timestamp_unit_test(self):
+
+        self.assertEqual(shift_timestamp('2019-02-14T10:00:30.123456+00:00', 60),
+                         '2019-02-14T09:59:30.123456+00:00')
+        self.assertEqual(shift_timestamp('yesterday', 60), 'yesterday')
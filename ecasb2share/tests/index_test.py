@@ -0,0 +1,107 @@
+import time
+import unittest
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share.index import RecordIndex
+
+
+def record(record_id, title, community='c1', related=None, description='', pid=None):
+
+    metadata = {'titles': [{'title': title}], 'community': community,
+                'descriptions': [{'description': description, 'description_type': 'Abstract'}],
+                'keywords': ['climate'], 'creators': [{'creator_name': 'ECAS user'}],
+                'publication_state': 'published'}
+    if related is not None:
+        metadata['related_identifiers'] = [{'related_identifier': related,
+                                            'related_identifier_type': 'Handle',
+                                            'relation_type': 'IsDerivedFrom'}]
+    if pid is not None:
+        metadata['ePIC_PID'] = pid
+    return {'id': record_id, 'created': '2019-02-14T10:00:00', 'updated': '2019-02-14T10:00:00',
+            'metadata': metadata}
+
+
+class RecordIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.index = RecordIndex(':memory:')
+        self.index.add_many([
+            record('r1', 'Monthly precipitation maxima', description='CMIP5 daily precipitation',
+                   related='21.T12995/cmip5-pr', pid='http://hdl.handle.net/0000/r1'),
+            record('r2', 'Surface temperature anomalies', community='c2',
+                   related='21.T12995/cmip5-tas'),
+            record('r3', 'Precipitation indices', related='21.T12995/cmip5-pr'),
+        ])
+
+    def tearDown(self):
+
+        self.index.close()
+
+    def full_text_search_unit_test(self):
+
+        results = self.index.search('precipitation')
+
+        self.assertEqual(sorted(result['id'] for result in results), ['r1', 'r3'])
+        self.assertEqual(self.index.search('temperat*')[0]['title'],
+                         'Surface temperature anomalies')
+        self.assertEqual(self.index.search('precipitation', community='c2'), [])
+
+    def pid_lookups_unit_test(self):
+
+        self.assertEqual([r['id'] for r in self.index.find_by_pid('http://hdl.handle.net/0000/r1')],
+                         ['r1'])
+        self.assertEqual(sorted(r['id'] for r in self.index.derived_from('21.T12995/cmip5-pr')),
+                         ['r1', 'r3'])
+        self.assertEqual(self.index.related_to('21.T12995/cmip5-pr', relation_type='IsPartOf'), [])
+
+    def replace_and_remove_unit_test(self):
+        """
+        Check if re-adding a record replaces its indexed fields and relations.
+        """
+
+        self.index.add(record('r3', 'Wind speed', related='21.T12995/cmip5-ws'))
+
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual([r['id'] for r in self.index.search('precipitation')], ['r1'])
+        self.assertEqual([r['id'] for r in self.index.derived_from('21.T12995/cmip5-pr')], ['r1'])
+        self.assertEqual(self.index.get('r3')['metadata']['titles'][0]['title'], 'Wind speed')
+
+        self.index.remove('r3')
+        self.assertIsNone(self.index.get('r3'))
+        self.assertEqual(self.index.search('wind'), [])
+
+    def lookups_fast_unit_test(self):
+        """
+        Check if thousands of PID lookups run well under a second.
+        """
+
+        self.index.add_many(record('x{}'.format(i), 'Dataset {}'.format(i),
+                                   related='21.T12995/{}'.format(i)) for i in range(2000))
+
+        start = time.monotonic()
+        for i in range(2000):
+            self.index.derived_from('21.T12995/{}'.format(i))
+        self.assertLess(time.monotonic() - start, 1.0)
+
+
+class BuildIndexTestCase(unittest.TestCase):
+
+    def build_from_server_unit_test(self):
+
+        with FakeB2Share() as server:
+            client = EcasShare(url=server.url, token_file='test_files/token.txt',
+                               community_cache_ttl=0)
+            for index in range(12):
+                record_id, _ = client.create_draft_record(FakeB2Share.ECAS_COMMUNITY_ID,
+                                                          'cube {}'.format(index))
+                client.submit_draft_for_publication(record_id)
+
+            index = client.build_record_index(':memory:', size=5)
+            client.close()
+
+        self.assertEqual(len(index), 12)
+        self.assertEqual(len(index.search('cube')), 12)
+        self.assertEqual(len(index.in_community(FakeB2Share.ECAS_COMMUNITY_ID, limit=3)), 3)
+        index.close()
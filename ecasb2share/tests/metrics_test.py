@@ -0,0 +1,205 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share.metrics import Metrics, RequestEvent, endpoint_of
+from ecasb2share.retry import RetryPolicy
+from ecasb2share.transport import Transport
+from requests.exceptions import ConnectionError
+from unittest.mock import Mock, patch
+
+
+def event(method='GET', endpoint='/api/records', status_code=200, elapsed=0.02,
+          bytes_sent=0, bytes_received=100, attempt=1, error=None):
+
+    return RequestEvent(method, 'https://b2share.eudat.eu' + endpoint, endpoint,
+                        status_code, elapsed, bytes_sent, bytes_received,
+                        attempt, error)
+
+
+class MetricsTestCase(unittest.TestCase):
+
+    def endpoint_of_unit_test(self):
+        """
+        Check if ids and file keys are replaced so endpoints do not grow with records.
+        """
+
+        record_id = 'b43a0e6914e34de8bd19613bcdc0d364'
+        self.assertEqual(endpoint_of('https://b2share.eudat.eu/api/records/?q=x'),
+                         '/api/records')
+        self.assertEqual(endpoint_of('https://b2share.eudat.eu/api/records/' +
+                                     record_id + '/draft'),
+                         '/api/records/{id}/draft')
+        self.assertEqual(endpoint_of('https://b2share.eudat.eu/api/communities/'
+                                     'e9b9792e-79fb-4b07-b6b4-b9c2bd06d095/schemas/last'),
+                         '/api/communities/{id}/schemas/last')
+        self.assertEqual(endpoint_of('https://b2share.eudat.eu/api/files/' + record_id +
+                                     '/dir/cube.nc'),
+                         '/api/files/{id}/{key}')
+
+    def summary_unit_test(self):
+        """
+        Check if events are aggregated per method and endpoint.
+        """
+
+        metrics = Metrics(buckets=(0.01, 0.1, 1))
+        metrics(event(elapsed=0.05))
+        metrics(event(elapsed=0.5, status_code=503))
+        metrics(event(elapsed=0.05, attempt=2))
+        metrics(event(method='PUT', endpoint='/api/files/{id}/{key}', elapsed=2,
+                      bytes_sent=4096, bytes_received=0))
+        metrics(event(status_code=None, elapsed=0.2, bytes_received=0,
+                      error=ConnectionError('reset')))
+
+        summary = metrics.summary()
+
+        self.assertEqual([(row['method'], row['endpoint']) for row in summary],
+                         [('PUT', '/api/files/{id}/{key}'), ('GET', '/api/records')])
+        get = summary[1]
+        self.assertEqual(get['count'], 4)
+        self.assertAlmostEqual(get['total_seconds'], 0.8)
+        self.assertEqual(get['status_codes'], {'200': 2, '503': 1, 'error': 1})
+        self.assertEqual(get['retries'], 1)
+        self.assertEqual(get['errors'], 1)
+        self.assertEqual(get['bytes_received'], 300)
+        self.assertTrue(0.01 <= get['p50_seconds'] <= 0.1)
+        self.assertTrue(0.1 <= get['p99_seconds'] <= 1)
+        self.assertEqual(summary[0]['bytes_sent'], 4096)
+
+    def to_prometheus_unit_test(self):
+        """
+        Check if the export follows the Prometheus text format, with cumulative buckets.
+        """
+
+        metrics = Metrics(buckets=(0.1, 1))
+        metrics(event(elapsed=0.05))
+        metrics(event(elapsed=0.5))
+        metrics(event(elapsed=5))
+
+        text = metrics.to_prometheus()
+
+        labels = 'method="GET",endpoint="/api/records"'
+        self.assertIn('# TYPE ecasb2share_request_duration_seconds histogram', text)
+        self.assertIn('ecasb2share_request_duration_seconds_bucket{' + labels +
+                      ',le="0.1"} 1\n', text)
+        self.assertIn('ecasb2share_request_duration_seconds_bucket{' + labels +
+                      ',le="1.0"} 2\n', text)
+        self.assertIn('ecasb2share_request_duration_seconds_bucket{' + labels +
+                      ',le="+Inf"} 3\n', text)
+        self.assertIn('ecasb2share_request_duration_seconds_count{' + labels + '} 3\n', text)
+        self.assertIn('ecasb2share_requests_total{' + labels + ',status="200"} 3\n', text)
+        self.assertIn('ecasb2share_response_bytes_received_total{' + labels + '} 300\n',
+                      text)
+
+    def write_prometheus_unit_test(self):
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            metrics = Metrics()
+            metrics(event())
+            path = os.path.join(tmp_dir, 'ecasb2share.prom')
+            metrics.write_prometheus(path)
+            with open(path, 'r') as prom_file:
+                self.assertEqual(prom_file.read(), metrics.to_prometheus())
+            self.assertEqual(os.listdir(tmp_dir), ['ecasb2share.prom'])
+
+            umask = os.umask(0o022)
+            try:
+                metrics.write_prometheus(path)
+            finally:
+                os.umask(umask)
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o644)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class TransportHooksTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.events = []
+        self.transport = Transport(retry_policy=RetryPolicy(total=2, sleep=lambda delay: None),
+                                   hooks=[self.events.append])
+
+    def tearDown(self):
+
+        self.transport.close()
+
+    def hook_called_per_attempt_unit_test(self):
+        """
+        Check if every attempt, retries and connection errors included, is reported.
+        """
+
+        responses = [ConnectionError('reset'), Mock(status_code=502, headers={}),
+                     Mock(status_code=200, _content=b'{"hits": {}}', headers={})]
+
+        with patch.object(self.transport.session, 'send', side_effect=responses):
+            self.transport.send('PUT', 'https://b2share.eudat.eu/api/files/1234/a.nc',
+                                data=b'x' * 10)
+
+        self.assertEqual([e.attempt for e in self.events], [1, 2, 3])
+        self.assertEqual([e.status_code for e in self.events], [None, 502, 200])
+        self.assertIsInstance(self.events[0].error, ConnectionError)
+        self.assertEqual(self.events[2].bytes_sent, 10)
+        self.assertEqual(self.events[2].bytes_received, 12)
+        self.assertEqual(self.events[2].endpoint, '/api/files/{id}/{key}')
+
+    def failing_hook_ignored_unit_test(self):
+
+        self.transport.add_hook(Mock(side_effect=ValueError('bug')))
+
+        with patch.object(self.transport.session, 'send',
+                          return_value=Mock(status_code=200, headers={})):
+            result = self.transport.send('GET', 'https://b2share.eudat.eu/api/records')
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(len(self.events), 1)
+
+
+class ClientMetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = FakeB2Share().start()
+        self.ecasb2share = EcasShare(url=self.server.url,
+                                     token_file='test_files/token.txt',
+                                     community_cache_ttl=0, metrics=True)
+
+    def tearDown(self):
+
+        self.ecasb2share.close()
+        self.server.stop()
+
+    def client_metrics_unit_test(self):
+        """
+        Check if the requests of a publication are recorded per endpoint.
+        """
+
+        record_id, filebucket_id = self.ecasb2share.create_draft_record(
+            FakeB2Share.ECAS_COMMUNITY_ID, 'cube')
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(tmp_dir, 'cube.nc')
+            with open(file_path, 'wb') as data_file:
+                data_file.write(b'0' * 1000)
+            self.ecasb2share.add_file_to_draft_record(file_path, filebucket_id)
+        finally:
+            shutil.rmtree(tmp_dir)
+        self.ecasb2share.submit_draft_for_publication(record_id)
+
+        rows = dict(((row['method'], row['endpoint']), row)
+                    for row in self.ecasb2share.metrics.summary())
+
+        self.assertEqual(rows[('POST', '/api/records')]['status_codes'], {'201': 1})
+        # multipart body: the file and its form-data headers
+        self.assertGreater(rows[('PUT', '/api/files/{id}/{key}')]['bytes_sent'], 1000)
+        self.assertEqual(rows[('PATCH', '/api/records/{id}/draft')]['count'], 1)
+        self.assertIn('ecasb2share_requests_total{method="POST",endpoint="/api/records",'
+                      'status="201"} 1', self.ecasb2share.metrics.to_prometheus())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import json
+import threading
+import unittest
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.pagination import iter_hits, iter_pages
+from unittest.mock import Mock, patch
+
+BASE_URL = 'https://b2share.eudat.eu/api/records/'
+
+
+def make_pages(number_of_pages, page_size=2):
+
+    pages = {}
+    for page in range(1, number_of_pages + 1):
+        url = BASE_URL + '?page={}'.format(page)
+        hits = [{'id': '{}-{}'.format(page, i)} for i in range(page_size)]
+        links = {'self': url}
+        if page < number_of_pages:
+            links['next'] = BASE_URL + '?page={}'.format(page + 1)
+        pages[url] = {'hits': {'hits': hits, 'total': number_of_pages * page_size},
+                      'links': links}
+    return pages
+
+
+class PaginationTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.pages = make_pages(3)
+        self.fetched = []
+
+    def fetch_page(self, url, params=None):
+
+        self.fetched.append(url)
+        return self.pages[url]
+
+    def iter_hits_all_pages_unit_test(self):
+
+        for prefetch in (True, False):
+            hits = list(iter_hits(self.fetch_page, BASE_URL + '?page=1', prefetch=prefetch))
+
+            self.assertEqual([hit['id'] for hit in hits],
+                             ['1-0', '1-1', '2-0', '2-1', '3-0', '3-1'])
+
+    def iter_pages_lazy_unit_test(self):
+        """
+        Check if pages are only fetched when needed.
+        """
+
+        pages = iter_pages(self.fetch_page, BASE_URL + '?page=1', prefetch=False)
+        next(pages)
+
+        self.assertEqual(self.fetched, [BASE_URL + '?page=1'])
+
+    def iter_pages_prefetch_unit_test(self):
+        """
+        Check if the next page is requested while the current one is consumed.
+        """
+
+        second_page_requested = threading.Event()
+
+        def fetch_page(url, params=None):
+            if url.endswith('page=2'):
+                second_page_requested.set()
+            return self.pages[url]
+
+        pages = iter_pages(fetch_page, BASE_URL + '?page=1')
+        next(pages)
+
+        self.assertTrue(second_page_requested.wait(5))
+        pages.close()
+
+
+class EcasShareIteratorsTestCase(unittest.TestCase):
+
+    def client_iter_community_records_unit_test(self):
+
+        client = EcasShare(url='https://b2share.eudat.eu', token_file='test_files/token.txt')
+        pages = make_pages(2)
+        pages[BASE_URL] = pages.pop(BASE_URL + '?page=1')
+        requests_sent = []
+
+        def send(prepared_request, **kwargs):
+            requests_sent.append(prepared_request.url)
+            url = prepared_request.url.split('&access_token')[0].split('?q=')[0]
+            response = Mock(status_code=200)
+            response.json.return_value = json.loads(json.dumps(pages[url]))
+            return response
+
+        with patch.object(client.transport.session, 'send', side_effect=send):
+            records = list(client.iter_community_records('d2c6e694-0c0a-4884-ad15-ddf498008320', prefetch=False))
+
+        self.assertEqual(len(records), 4)
+        self.assertIn('q=community%3Ad2c6e694-0c0a-4884-ad15-ddf498008320', requests_sent[0])
+        self.assertTrue(all('access_token=' in url for url in requests_sent))
@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share.ratelimit import RateLimiter, SharedTokenBucket, TokenBucket
+from ecasb2share.upload import FileStream
+
+
+class TokenBucketTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.now = [0.0]
+        self.delays = []
+        self.bucket = TokenBucket(2, capacity=2, clock=lambda: self.now[0],
+                                  sleep=self.delays.append)
+
+    def burst_then_paced_unit_test(self):
+        """
+        Check if a full bucket allows a burst, then one token every 1/rate s.
+        """
+
+        for _ in range(4):
+            self.bucket.acquire()
+
+        self.assertEqual(self.delays, [0.5, 1.0])
+
+    def refill_unit_test(self):
+
+        self.bucket.acquire(2)
+        self.now[0] = 10
+        self.bucket.acquire(2)
+
+        self.assertEqual(self.delays, [])
+
+    def large_amount_unit_test(self):
+        """
+        Check if more tokens than the capacity can be taken, at the rate.
+        """
+
+        self.bucket.acquire(6)
+
+        self.assertEqual(self.delays, [2.0])
+
+
+class SharedTokenBucketTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self.lock_file = os.path.join(self.directory, 'rate.lock')
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    def buckets_share_state_unit_test(self):
+        """
+        Check if two buckets on the same file, as in two processes, share one budget.
+        """
+
+        delays = []
+        first = SharedTokenBucket(self.lock_file, 'requests', 1, capacity=2,
+                                  sleep=delays.append)
+        second = SharedTokenBucket(self.lock_file, 'requests', 1, capacity=2,
+                                   sleep=delays.append)
+
+        first.acquire()
+        second.acquire()
+        second.acquire()
+
+        self.assertEqual(len(delays), 1)
+        self.assertAlmostEqual(delays[0], 1.0, places=1)
+
+    def buckets_are_independent_unit_test(self):
+
+        delays = []
+        limiter = RateLimiter(requests_per_second=1, bytes_per_second=10,
+                              burst=1, lock_file=self.lock_file,
+                              sleep=delays.append)
+
+        limiter.acquire_request()
+        limiter.throttle_body(b'0123456789')
+
+        self.assertEqual(delays, [])
+
+
+class RateLimiterTestCase(unittest.TestCase):
+
+    def throttle_streamed_body_unit_test(self):
+        """
+        Check if streamed bodies are paced chunk by chunk and stay sized and re-iterable.
+        """
+
+        delays = []
+        limiter = RateLimiter(bytes_per_second=20, sleep=delays.append)
+        stream = FileStream('test_files/token.txt', chunk_size=10)
+
+        body = limiter.throttle_body(stream)
+
+        self.assertEqual(len(body), len(stream))
+        self.assertEqual(b''.join(body), b''.join(body))
+        self.assertEqual(len(delays), 10)
+
+    def unlimited_unit_test(self):
+
+        limiter = RateLimiter()
+        body = FileStream('test_files/token.txt')
+
+        self.assertIs(limiter.throttle_body(body), body)
+        limiter.acquire_request()
+
+    def client_requests_paced_unit_test(self):
+        """
+        Check if all the requests of a client are paced by its limiter.
+        """
+
+        with FakeB2Share() as server:
+            client = EcasShare(url=server.url, token_file='test_files/token.txt',
+                               rate_limiter=RateLimiter(requests_per_second=50, burst=1),
+                               community_cache_ttl=0)
+            start = time.monotonic()
+            for _ in range(6):
+                client.list_all_records()
+            elapsed = time.monotonic() - start
+            client.close()
+
+        self.assertGreaterEqual(elapsed, 0.09)
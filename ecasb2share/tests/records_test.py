@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share.records import DraftRecord
+from unittest.mock import Mock
+
+RECORD = json.load(open('test_files/record.json'))
+
+
+class DraftRecordTestCase(unittest.TestCase):
+
+    def draft_record_from_json_unit_test(self):
+
+        draft = DraftRecord(RECORD, revision='3')
+
+        self.assertEqual(draft.record_id, 'b4da58206da24b1aacf3b35c66024ea8')
+        self.assertEqual(draft.filebucket_id, 'da7ddd6c-5d14-4986-91aa-d9a46b4138d8')
+        self.assertEqual(draft.metadata['ePIC_PID'], RECORD['metadata']['ePIC_PID'])
+        self.assertEqual(draft.revision, '3')
+
+    def draft_record_unpacks_unit_test(self):
+        """
+        Check if the handle still unpacks as (record_id, filebucket_id).
+        """
+
+        record_id, filebucket_id = DraftRecord(RECORD)
+
+        self.assertEqual(record_id, 'b4da58206da24b1aacf3b35c66024ea8')
+        self.assertEqual(filebucket_id, 'da7ddd6c-5d14-4986-91aa-d9a46b4138d8')
+
+    def draft_record_is_tuple_unit_test(self):
+        """
+        Check if the handle can be indexed and compared as the tuple it replaces.
+        """
+
+        draft = DraftRecord(RECORD)
+
+        self.assertEqual(draft[0], 'b4da58206da24b1aacf3b35c66024ea8')
+        self.assertEqual(draft[1], 'da7ddd6c-5d14-4986-91aa-d9a46b4138d8')
+        self.assertEqual(len(draft), 2)
+        self.assertEqual(draft, ('b4da58206da24b1aacf3b35c66024ea8',
+                                 'da7ddd6c-5d14-4986-91aa-d9a46b4138d8'))
+
+    def revision_from_weak_etag_unit_test(self):
+
+        response = Mock(headers={'ETag': 'W/"7"'}, json=Mock(return_value=RECORD))
+        self.assertEqual(DraftRecord.from_response(response).revision, '7')
+
+        response = Mock(headers={'ETag': '"W3"'}, json=Mock(return_value=RECORD))
+        self.assertEqual(DraftRecord.from_response(response).revision, 'W3')
+
+
+class DraftCreationTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = FakeB2Share().start()
+        self.ecasb2share = EcasShare(url=self.server.url, token_file='test_files/token.txt')
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        self.ecasb2share.close()
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def single_request_creation_unit_test(self):
+        """
+        Check if creating a draft only sends the POST request.
+        """
+
+        draft = self.ecasb2share.create_draft_record_with_pid(
+            title='one round trip', original_pid='00.00000/xxxx-yyyy-zzzz')
+
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(self.server.requests[0][0], 'POST')
+        self.assertEqual(draft.metadata['titles'][0]['title'], 'one round trip')
+        self.assertEqual(draft.revision, '0')
+
+    def handle_accepted_by_file_and_publication_methods_unit_test(self):
+
+        draft = self.ecasb2share.create_draft_record(FakeB2Share.EUDAT_COMMUNITY_ID, 'handle')
+
+        file_path = os.path.join(self.tmp_dir, 'cube.nc')
+        with open(file_path, 'wb') as cube:
+            cube.write(b'data')
+
+        self.ecasb2share.add_file_to_draft_record(file_path, draft, stream=True)
+        files = self.ecasb2share.list_files_in_bucket(draft)
+
+        self.assertEqual([obj['key'] for obj in files['contents']], ['cube.nc'])
+        self.assertEqual(self.ecasb2share.get_filebucketid_from_record(draft), draft.filebucket_id)
+        self.assertEqual(self.ecasb2share.submit_draft_for_publication(draft), 200)
+
+    def creation_error_raised_unit_test(self):
+        """
+        Check if a rejected draft creation raises the HTTP error.
+        """
+
+        from requests.exceptions import HTTPError
+
+        with self.assertRaises(HTTPError) as context:
+            self.ecasb2share.create_draft_record('unknown-community', 'rejected')
+
+        self.assertEqual(context.exception.response.status_code, 400)
+
+    def file_changes_invalidate_cached_draft_unit_test(self):
+        """
+        Check if uploading or deleting a file drops the cached draft.
+        """
+
+        draft = self.ecasb2share.create_draft_record(FakeB2Share.EUDAT_COMMUNITY_ID, 'files')
+        file_path = os.path.join(self.tmp_dir, 'cube.nc')
+        with open(file_path, 'wb') as cube:
+            cube.write(b'data')
+
+        self.ecasb2share.add_file_to_draft_record(file_path, draft)
+        files = self.ecasb2share.get_specific_record(draft.record_id)['files']
+        self.assertEqual([obj['key'] for obj in files], ['cube.nc'])
+
+        self.ecasb2share.delete_file_from_draft_record(draft, 'cube.nc')
+        self.assertEqual(self.ecasb2share.get_specific_record(draft.record_id)['files'], [])
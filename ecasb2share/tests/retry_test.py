@@ -0,0 +1,205 @@
+import unittest
+
+from ecasb2share import exceptions
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share.retry import CircuitBreaker, RetryPolicy, parse_retry_after
+from ecasb2share.transport import Transport
+from requests.exceptions import ChunkedEncodingError, ConnectionError
+from unittest.mock import Mock, patch
+
+
+def response(status_code, headers=None):
+
+    return Mock(status_code=status_code, headers=headers or {})
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.delays = []
+        self.policy = RetryPolicy(total=3, backoff_factor=1, jitter=False,
+                                  sleep=self.delays.append)
+        self.transport = Transport(retry_policy=self.policy)
+
+    def tearDown(self):
+
+        self.transport.close()
+
+    def retries_idempotent_request_unit_test(self):
+        """
+        Check if a GET failing with 503 is retried with exponential backoff.
+        """
+
+        responses = [response(502), response(504), response(200)]
+
+        with patch.object(self.transport.session, 'send', side_effect=responses) as mock_send:
+            result = self.transport.send('GET', 'https://b2share.eudat.eu/api/records')
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(mock_send.call_count, 3)
+        self.assertEqual(self.delays, [1, 2])
+
+    def returns_last_response_when_exhausted_unit_test(self):
+
+        with patch.object(self.transport.session, 'send',
+                          return_value=response(500)) as mock_send:
+            result = self.transport.send('PUT', 'https://b2share.eudat.eu/api/files/x/a')
+
+        self.assertEqual(result.status_code, 500)
+        self.assertEqual(mock_send.call_count, 4)
+
+    def post_not_retried_on_server_error_unit_test(self):
+        """
+        Check if a POST is not sent twice when the server may have processed it.
+        """
+
+        with patch.object(self.transport.session, 'send',
+                          return_value=response(502)) as mock_send:
+            result = self.transport.send('POST', 'https://b2share.eudat.eu/api/records/')
+
+        self.assertEqual(result.status_code, 502)
+        self.assertEqual(mock_send.call_count, 1)
+
+        with patch.object(self.transport.session, 'send',
+                          side_effect=ConnectionError('reset')) as mock_send:
+            self.assertRaises(ConnectionError, self.transport.send,
+                              'POST', 'https://b2share.eudat.eu/api/records/')
+        self.assertEqual(mock_send.call_count, 1)
+
+    def post_retried_on_retry_after_unit_test(self):
+        """
+        Check if Retry-After is honored, also for requests that are not idempotent.
+        """
+
+        responses = [response(429, {'Retry-After': '7'}), response(201)]
+
+        with patch.object(self.transport.session, 'send', side_effect=responses):
+            result = self.transport.send('POST', 'https://b2share.eudat.eu/api/records/')
+
+        self.assertEqual(result.status_code, 201)
+        self.assertEqual(self.delays, [7])
+
+    def parse_retry_after_unit_test(self):
+
+        self.assertEqual(parse_retry_after('3'), 3)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+        self.assertIsNone(parse_retry_after('soon'))
+        self.assertIsNone(parse_retry_after(None))
+
+    def jitter_unit_test(self):
+
+        policy = RetryPolicy(backoff_factor=1, max_backoff=3)
+
+        for retry_number in range(1, 6):
+            self.assertTrue(0 <= policy.backoff(retry_number) <= 3)
+
+
+class CircuitBreakerTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.now = [0.0]
+        self.breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10,
+                                      clock=lambda: self.now[0])
+        self.transport = Transport(retry_policy=RetryPolicy(total=0),
+                                   circuit_breaker=self.breaker)
+
+    def tearDown(self):
+
+        self.transport.close()
+
+    def opens_after_failures_unit_test(self):
+        """
+        Check if requests fail fast once the circuit is open.
+        """
+
+        url = 'https://b2share.eudat.eu/api/records'
+
+        with patch.object(self.transport.session, 'send',
+                          side_effect=ConnectionError('refused')) as mock_send:
+            for _ in range(2):
+                self.assertRaises(ConnectionError, self.transport.send, 'GET', url)
+            self.assertRaises(exceptions.CircuitOpenException,
+                              self.transport.send, 'GET', url)
+
+        self.assertEqual(mock_send.call_count, 2)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def closes_after_successful_trial_unit_test(self):
+
+        url = 'https://b2share.eudat.eu/api/records'
+
+        with patch.object(self.transport.session, 'send', return_value=response(503)):
+            self.transport.send('GET', url)
+            self.transport.send('GET', url)
+
+        self.now[0] = 11
+        with patch.object(self.transport.session, 'send', return_value=response(200)):
+            self.transport.send('GET', url)
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def reopens_after_failed_trial_unit_test(self):
+
+        url = 'https://b2share.eudat.eu/api/records'
+
+        with patch.object(self.transport.session, 'send', return_value=response(500)):
+            self.transport.send('GET', url)
+            self.transport.send('GET', url)
+            self.now[0] = 11
+            self.transport.send('GET', url)
+
+        self.assertRaises(exceptions.CircuitOpenException,
+                          self.transport.send, 'GET', url)
+
+    def trial_ended_by_other_errors_unit_test(self):
+        """
+        Check if an unexpected error of the half-open trial does not keep the circuit open.
+        """
+
+        url = 'https://b2share.eudat.eu/api/records'
+
+        with patch.object(self.transport.session, 'send', return_value=response(500)):
+            self.transport.send('GET', url)
+            self.transport.send('GET', url)
+
+        self.now[0] = 11
+        with patch.object(self.transport.session, 'send',
+                          side_effect=ChunkedEncodingError('truncated')):
+            self.assertRaises(ChunkedEncodingError, self.transport.send, 'GET', url)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+        self.now[0] = 22
+        with patch.object(self.transport.session, 'send', return_value=response(200)):
+            self.transport.send('GET', url)
+
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+class FakeServerRetryTestCase(unittest.TestCase):
+
+    def flaky_server_unit_test(self):
+        """
+        Check if reads and uploads succeed against a server failing 30% of the requests.
+        """
+
+        with FakeB2Share(error_rate=0.3, seed=1) as server:
+            policy = RetryPolicy(total=10, backoff_factor=0.001)
+            client = EcasShare(url=server.url, token_file='test_files/token.txt',
+                               retry_policy=policy,
+                               circuit_breaker=CircuitBreaker(failure_threshold=0),
+                               community_cache_ttl=0)
+            server.error_rate = 0
+            draft = client.create_draft_record(FakeB2Share.EUDAT_COMMUNITY_ID, 'flaky')
+            server.error_rate = 0.3
+
+            for _ in range(10):
+                self.assertIsNotNone(client.list_all_records())
+            response = client.add_file_to_draft_record(
+                'test_files/token.txt', draft.filebucket_id, stream=True)
+            client.close()
+
+        self.assertEqual(response['key'], 'token.txt')
+        self.assertGreater(server.count_requests(), 12)
@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# Cumulative import time of the client allowed by the benchmark, in
+# milliseconds. The default leaves room for slow CI machines.
+IMPORT_BUDGET_MS = float(os.environ.get('ECASB2SHARE_IMPORT_BUDGET_MS', 100))
+
+# Imported on first use only
+DEFERRED_MODULES = ('requests', 'urllib3', 'jsonschema', 'sqlite3')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def import_times(module, code=''):
+    """
+    Import a module in a new interpreter with -X importtime.
+
+    :return: dict of imported module to cumulative import time in microseconds.
+    """
+
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             'import ' + module + '\n' + code],
+                            cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            check=True).stderr.decode()
+
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class StartupTestCase(unittest.TestCase):
+
+    def deferred_imports_unit_test(self):
+        """
+        Check if importing the client does not import requests, jsonschema or sqlite3.
+        """
+
+        imported = import_times('ecasb2share.ecasb2shareclient')
+
+        self.assertIn('ecasb2share.ecasb2shareclient', imported)
+        self.assertEqual([module for module in DEFERRED_MODULES if module in imported], [])
+
+    def client_creation_deferred_unit_test(self):
+        """
+        Check if requests is only imported by the first request of a client.
+        """
+
+        imported = import_times('ecasb2share.ecasb2shareclient', code=(
+            'ecasb2share.ecasb2shareclient.EcasShare(url="https://b2share.eudat.eu",'
+            ' token_file="token.txt")'))
+
+        self.assertNotIn('requests', imported)
+
+    def import_time_unit_test(self):
+        """
+        Check if the import time of the client stays within the budget.
+        """
+
+        # Best of a few runs, the first ones may compile the modules
+        elapsed = min(import_times('ecasb2share.ecasb2shareclient')
+                      ['ecasb2share.ecasb2shareclient'] for _ in range(3)) / 1000.0
+
+        self.assertLess(elapsed, IMPORT_BUDGET_MS,
+                        'importing the client took {:.1f} ms'.format(elapsed))
+
+    def logging_not_configured_unit_test(self):
+        """
+        Check if importing the client leaves the logging of the host untouched.
+        """
+
+        code = ('import logging\n'
+                'assert not logging.getLogger().handlers\n'
+                'assert logging.getLogger().level == logging.WARNING\n')
+
+        subprocess.run([sys.executable, '-c', 'import ecasb2share.ecasb2shareclient\n' + code],
+                       cwd=ROOT, check=True)
+
+    def requests_patchable_unit_test(self):
+        """
+        Check if requests can still be patched through the client module.
+        """
+
+        from unittest.mock import patch
+        import ecasb2share.ecasb2shareclient as client_module
+
+        with patch('ecasb2share.ecasb2shareclient.requests.get') as mock_get:
+            self.assertIs(client_module.requests.get, mock_get)
+        self.assertIsNot(client_module.requests.get, mock_get)
+        self.assertTrue(issubclass(client_module.HTTPError, IOError))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share.sync import STATE_FILE_NAME, file_checksum
+from unittest.mock import patch
+
+
+class SyncDirectoryTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.local_dir = tempfile.mkdtemp()
+        for index in range(5):
+            self.write('cube_{}.nc'.format(index), os.urandom(1000 + index))
+
+        self.server = FakeB2Share().start()
+        self.ecasb2share = EcasShare(url=self.server.url,
+                                     token_file='test_files/token.txt',
+                                     community_cache_ttl=0)
+        _, self.filebucket_id = self.ecasb2share.create_draft_record(
+            FakeB2Share.EUDAT_COMMUNITY_ID, 'sync')
+
+    def tearDown(self):
+
+        self.ecasb2share.close()
+        self.server.stop()
+        shutil.rmtree(self.local_dir)
+
+    def write(self, name, content):
+
+        with open(os.path.join(self.local_dir, name), 'wb') as local_file:
+            local_file.write(content)
+
+    def remote_keys(self):
+
+        bucket = self.ecasb2share.list_files_in_bucket(self.filebucket_id)
+        return sorted(obj['key'] for obj in bucket['contents'])
+
+    def first_sync_uploads_all_unit_test(self):
+
+        report = self.ecasb2share.sync_directory_to_bucket(self.local_dir, self.filebucket_id)
+
+        self.assertEqual(len(report.uploaded), 5)
+        self.assertEqual(report.errors, [])
+        self.assertEqual(self.remote_keys(), ['cube_{}.nc'.format(i) for i in range(5)])
+        self.assertTrue(os.path.exists(os.path.join(self.local_dir, STATE_FILE_NAME)))
+
+    def only_changed_files_uploaded_unit_test(self):
+        """
+        Check if a second run uploads only the new and modified files, without re-reading the others.
+        """
+
+        self.ecasb2share.sync_directory_to_bucket(self.local_dir, self.filebucket_id)
+
+        # Same size, different content
+        self.write('cube_1.nc', os.urandom(1001))
+        self.write('cube_9.nc', b'new')
+
+        with patch('ecasb2share.sync.file_checksum', side_effect=file_checksum) as mock_checksum:
+            report = self.ecasb2share.sync_directory_to_bucket(self.local_dir, self.filebucket_id)
+
+        self.assertEqual(report.uploaded, ['cube_1.nc', 'cube_9.nc'])
+        self.assertEqual(len(report.unchanged), 4)
+        self.assertEqual(mock_checksum.call_count, 1)
+        self.assertEqual(self.server.count_requests('PUT'), 7)
+
+    def delete_remote_extras_unit_test(self):
+
+        self.ecasb2share.sync_directory_to_bucket(self.local_dir, self.filebucket_id)
+        os.remove(os.path.join(self.local_dir, 'cube_4.nc'))
+
+        report = self.ecasb2share.sync_directory_to_bucket(self.local_dir, self.filebucket_id)
+        self.assertEqual(report.deleted, [])
+        self.assertIn('cube_4.nc', self.remote_keys())
+
+        report = self.ecasb2share.sync_directory_to_bucket(
+            self.local_dir, self.filebucket_id, delete=True)
+        self.assertEqual(report.deleted, ['cube_4.nc'])
+        self.assertNotIn('cube_4.nc', self.remote_keys())
+
+    def dry_run_unit_test(self):
+
+        report = self.ecasb2share.sync_directory_to_bucket(
+            self.local_dir, self.filebucket_id, dry_run=True)
+
+        self.assertEqual(len(report.uploaded), 5)
+        self.assertEqual(self.remote_keys(), [])
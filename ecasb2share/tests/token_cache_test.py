@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.token_cache import TokenCache
+from unittest.mock import patch
+
+
+class TokenCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.token_path = os.path.join(self.tmp_dir, 'token.txt')
+        with open(self.token_path, 'w') as token_file:
+            token_file.write('first-token\n')
+
+        self.cache = TokenCache()
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp_dir)
+
+    def token_read_once_unit_test(self):
+        """
+        Check if the token file is opened only once when unchanged.
+        """
+
+        self.assertEqual(self.cache.get(self.token_path), 'first-token')
+
+        with patch('builtins.open') as mock_open:
+            self.assertEqual(self.cache.get(self.token_path), 'first-token')
+            mock_open.assert_not_called()
+
+    def token_reloaded_on_change_unit_test(self):
+        """
+        Check if the token is read again when the file is replaced.
+        """
+
+        self.cache.get(self.token_path)
+
+        new_path = os.path.join(self.tmp_dir, 'new_token.txt')
+        with open(new_path, 'w') as token_file:
+            token_file.write('second-token')
+        os.replace(new_path, self.token_path)
+
+        self.assertEqual(self.cache.get(self.token_path), 'second-token')
+
+    def token_invalidate_unit_test(self):
+
+        self.cache.get(self.token_path)
+        self.cache.invalidate(self.token_path)
+
+        with patch('builtins.open', wraps=open) as mock_open:
+            self.cache.get(self.token_path)
+            self.assertEqual(mock_open.call_count, 1)
+
+    def client_uses_shared_cache_unit_test(self):
+
+        client = EcasShare(token_file=self.token_path)
+        other_client = EcasShare(token_file=self.token_path)
+
+        self.assertEqual(client.retrieve_access_token(), 'first-token')
+
+        with patch('builtins.open') as mock_open:
+            self.assertEqual(other_client.retrieve_access_token(), 'first-token')
+            mock_open.assert_not_called()
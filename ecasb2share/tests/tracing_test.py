@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share.tracing import TRACE_ENV_VARIABLE, Tracer, tracer_from
+from unittest.mock import patch
+
+
+class TracerTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.time = [0.0]
+        self.tracer = Tracer(os.path.join(self.tmp_dir, 'run.trace.json'),
+                             clock=lambda: self.time[0])
+
+    def tearDown(self):
+
+        self.tracer.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def nested_spans_unit_test(self):
+        """
+        Check if spans are recorded as complete events in microseconds.
+        """
+
+        with self.tracer.span('create_draft_record', 'api'):
+            self.time[0] = 0.001
+            with self.tracer.span('HTTP POST /api/records', 'http', {'status': 201}):
+                self.time[0] = 0.004
+            self.time[0] = 0.005
+
+        self.tracer.close()
+        with open(self.tracer.path, 'r') as trace_file:
+            events = json.load(trace_file)['traceEvents']
+
+        spans = [event for event in events if event['ph'] == 'X']
+        self.assertEqual([span['name'] for span in spans],
+                         ['HTTP POST /api/records', 'create_draft_record'])
+        self.assertAlmostEqual(spans[0]['ts'], 1000)
+        self.assertAlmostEqual(spans[0]['dur'], 3000)
+        self.assertEqual(spans[0]['args'], {'status': 201})
+        self.assertAlmostEqual(spans[1]['dur'], 5000)
+        self.assertEqual([event['name'] for event in events if event['ph'] == 'M'],
+                         ['thread_name'])
+
+    def failed_span_unit_test(self):
+
+        with self.assertRaises(ValueError):
+            with self.tracer.span('validate_metadata', 'api'):
+                raise ValueError('invalid')
+
+        self.assertEqual(self.tracer.events[-1]['args'], {'error': 'ValueError'})
+
+    def tracer_from_environment_unit_test(self):
+        """
+        Check if tracing is only enabled on request.
+        """
+
+        path = os.path.join(self.tmp_dir, 'env.trace.json')
+
+        with patch.dict(os.environ, {TRACE_ENV_VARIABLE: ''}):
+            self.assertIsNone(tracer_from(None))
+        with patch.dict(os.environ, {TRACE_ENV_VARIABLE: path}):
+            tracer = tracer_from(None)
+            self.assertEqual(tracer.path, path)
+            self.assertIsNone(tracer_from(False))
+            tracer.close()
+        self.assertIs(tracer_from(self.tracer), self.tracer)
+
+
+class ClientTracingTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.server = FakeB2Share().start()
+        self.tmp_dir = tempfile.mkdtemp()
+        self.trace_path = os.path.join(self.tmp_dir, 'run.trace.json')
+
+    def tearDown(self):
+
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def client_trace_unit_test(self):
+        """
+        Check if client methods and the HTTP phases of their requests are traced.
+        """
+
+        with EcasShare(url=self.server.url, token_file='test_files/token.txt',
+                       community_cache_ttl=0, trace=self.trace_path) as client:
+            record_id, filebucket_id = client.create_draft_record(
+                FakeB2Share.ECAS_COMMUNITY_ID, 'cube')
+            client.submit_draft_for_publication(record_id)
+
+        with open(self.trace_path, 'r') as trace_file:
+            spans = [event for event in json.load(trace_file)['traceEvents']
+                     if event['ph'] == 'X']
+        names = [span['name'] for span in spans]
+
+        for name in ('create_draft_record', 'submit_draft_for_publication',
+                     'HTTP POST /api/records', 'HTTP PATCH /api/records/{id}/draft',
+                     'connect', 'send', 'wait', 'receive', 'json'):
+            self.assertIn(name, names)
+
+        # The HTTP phases nest within the span of the method
+        create = spans[names.index('create_draft_record')]
+        post = spans[names.index('HTTP POST /api/records')]
+        self.assertTrue(create['ts'] <= post['ts'] and
+                        post['ts'] + post['dur'] <= create['ts'] + create['dur'])
+        self.assertEqual(post['args']['status'], 201)
+
+    def tracing_disabled_by_default_unit_test(self):
+
+        cache_dir = os.path.join(self.tmp_dir, 'cache')
+        with patch.dict(os.environ, {TRACE_ENV_VARIABLE: ''}):
+            client = EcasShare(url=self.server.url, token_file='test_files/token.txt',
+                               cache_dir=cache_dir)
+        self.assertIsNone(client.tracer)
+        client.list_communities()
+        client.close()
+
+        # Only the community cache is written
+        self.assertEqual(os.listdir(self.tmp_dir), ['cache'])
+        self.assertEqual([name for name in os.listdir('.') if name.endswith('.trace.json')], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.transport import Transport
+from unittest.mock import Mock, patch
+
+
+class TransportTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.transport = Transport(pool_connections=2, pool_maxsize=4)
+
+    def tearDown(self):
+
+        self.transport.close()
+
+    def pool_configuration_unit_test(self):
+        """
+        Check if the pool settings are applied to the mounted adapters.
+        """
+
+        adapter = self.transport.session.get_adapter('https://b2share.eudat.eu')
+
+        self.assertEqual(adapter._pool_connections, 2)
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+    def keep_alive_disabled_unit_test(self):
+        """
+        Check if connections are closed after each request when keep-alive is off.
+        """
+
+        transport = Transport(keep_alive=False)
+
+        self.assertEqual(transport.session.headers['Connection'], 'close')
+        transport.close()
+
+    def send_uses_default_timeout_unit_test(self):
+
+        with patch.object(self.transport.session, 'send',
+                          return_value=Mock(status_code=200)) as mock_send:
+            self.transport.send('GET', 'https://b2share.eudat.eu/api/records')
+
+            self.assertEqual(mock_send.call_args[1]['timeout'], self.transport.timeout)
+
+
+class EcasShareSessionTestCase(unittest.TestCase):
+
+    def client_reuses_session_unit_test(self):
+        """
+        Check if every request helper goes through the same pooled session.
+        """
+
+        client = EcasShare(token_file='test_files/token.txt')
+        response = Mock(status_code=204)
+
+        with patch.object(client.transport.session, 'send', return_value=response) as mock_send:
+            client.list_all_records()
+            client.delete_draft_record('b4da58206da24b1aacf3b35c66024ea8')
+            client.submit_draft_for_publication('b4da58206da24b1aacf3b35c66024ea8')
+
+            self.assertEqual(mock_send.call_count, 3)
+            methods = [call[0][0].method for call in mock_send.call_args_list]
+            self.assertEqual(methods, ['GET', 'DELETE', 'PATCH'])
+
+    def client_context_manager_unit_test(self):
+
+        with patch('requests.Session.close') as mock_close:
+            with EcasShare(token_file='test_files/token.txt') as client:
+                self.assertIsNotNone(client.transport.session)
+
+            mock_close.assert_called_once_with()
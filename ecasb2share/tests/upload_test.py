@@ -0,0 +1,268 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from ecasb2share import exceptions
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.fakeserver import FakeB2Share
+from ecasb2share.upload import FileStream, ResumableUpload, verify_checksum
+from unittest.mock import Mock, PropertyMock, patch
+
+FILEBUCKET_ID = 'da7ddd6c-5d14-4986-91aa-d9a46b4138d8'
+
+
+class FileStreamTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmp_dir, 'cube.nc')
+        with open(self.file_path, 'wb') as cube:
+            cube.write(os.urandom(10000))
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp_dir)
+
+    def chunks_bounded_unit_test(self):
+        """
+        Check if the file is read in chunks no larger than chunk_size.
+        """
+
+        stream = FileStream(self.file_path, chunk_size=4096)
+        chunks = list(stream)
+
+        self.assertEqual(len(stream), 10000)
+        self.assertEqual([len(chunk) for chunk in chunks], [4096, 4096, 1808])
+        with open(self.file_path, 'rb') as cube:
+            self.assertEqual(b''.join(chunks), cube.read())
+
+    def offset_length_unit_test(self):
+
+        stream = FileStream(self.file_path, chunk_size=4096, offset=9000, length=4096)
+
+        self.assertEqual(len(stream), 1000)
+        with open(self.file_path, 'rb') as cube:
+            self.assertEqual(b''.join(stream), cube.read()[9000:])
+
+    def progress_callback_unit_test(self):
+
+        progress = []
+        stream = FileStream(self.file_path, chunk_size=4096,
+                            progress_callback=lambda sent, total, rate: progress.append((sent, total)))
+        list(stream)
+
+        self.assertEqual(progress, [(4096, 10000), (8192, 10000), (10000, 10000)])
+        self.assertEqual(stream.bytes_sent, 10000)
+        self.assertGreater(stream.throughput, 0)
+
+    def checksum_unit_test(self):
+        """
+        Check if the checksum is computed from the chunks sent, once per pass.
+        """
+
+        stream = FileStream(self.file_path, chunk_size=4096)
+        list(stream)
+        list(stream)
+
+        with open(self.file_path, 'rb') as cube:
+            expected = 'md5:' + hashlib.md5(cube.read()).hexdigest()
+        self.assertEqual(stream.checksum, expected)
+
+    def client_stream_upload_unit_test(self):
+        """
+        Check if stream mode sends the file as a raw body with a Content-Length.
+        """
+
+        client = EcasShare(token_file='test_files/token.txt')
+        with open(self.file_path, 'rb') as cube:
+            checksum = 'md5:' + hashlib.md5(cube.read()).hexdigest()
+        response = Mock(status_code=200)
+        response.json.return_value = {'key': 'cube.nc', 'size': 10000,
+                                      'checksum': checksum}
+
+        def send(prepared_request, **kwargs):
+            b''.join(prepared_request.body)
+            return response
+
+        with patch.object(client.transport.session, 'send', side_effect=send) as mock_send:
+            result = client.add_file_to_draft_record(self.file_path, FILEBUCKET_ID, stream=True)
+
+            prepared_request = mock_send.call_args[0][0]
+            self.assertEqual(prepared_request.method, 'PUT')
+            self.assertTrue(prepared_request.path_url.startswith('/api/files/' + FILEBUCKET_ID + '/cube.nc'))
+            self.assertEqual(prepared_request.headers['Content-Length'], '10000')
+            self.assertIsInstance(prepared_request.body, FileStream)
+            self.assertEqual(result['size'], 10000)
+
+
+class ChecksumVerificationTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmp_dir, 'cube.nc')
+        with open(self.file_path, 'wb') as cube:
+            cube.write(os.urandom(10000))
+
+        self.server = FakeB2Share().start()
+        self.ecasb2share = EcasShare(url=self.server.url,
+                                     token_file='test_files/token.txt',
+                                     community_cache_ttl=0)
+        _, self.filebucket_id = self.ecasb2share.create_draft_record(
+            FakeB2Share.EUDAT_COMMUNITY_ID, 'checksum')
+
+    def tearDown(self):
+
+        self.ecasb2share.close()
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def verified_upload_unit_test(self):
+
+        result = self.ecasb2share.add_file_to_draft_record(
+            self.file_path, self.filebucket_id, stream=True, chunk_size=4096)
+
+        with open(self.file_path, 'rb') as cube:
+            self.assertEqual(result['checksum'], 'md5:' + hashlib.md5(cube.read()).hexdigest())
+
+    def mismatch_raises_unit_test(self):
+        """
+        Check if an upload whose stored object differs from the bytes sent raises.
+        """
+
+        with patch.object(FileStream, 'checksum', new_callable=PropertyMock,
+                          return_value='md5:00000000000000000000000000000000'):
+            self.assertRaises(exceptions.ChecksumMismatchException,
+                              self.ecasb2share.add_file_to_draft_record,
+                              self.file_path, self.filebucket_id, stream=True)
+
+            self.ecasb2share.add_file_to_draft_record(
+                self.file_path, self.filebucket_id, stream=True, verify_checksum=False)
+
+    def verify_checksum_unit_test(self):
+
+        self.assertTrue(verify_checksum('cube.nc', 'md5:ab', 'MD5:AB'))
+        self.assertFalse(verify_checksum('cube.nc', 'md5:ab', None))
+        self.assertFalse(verify_checksum('cube.nc', 'md5:ab', 'adler32:01'))
+        self.assertRaises(exceptions.ChecksumMismatchException,
+                          verify_checksum, 'cube.nc', 'md5:ab', 'md5:cd')
+
+
+class ConcurrentUploadTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.ecasb2share = EcasShare(token_file='test_files/token.txt')
+
+    def add_files_keeps_order_unit_test(self):
+        """
+        Check if results follow the order of the input paths, errors included.
+        """
+
+        file_paths = ['cube_{}.nc'.format(i) for i in range(10)]
+
+        def fake_upload(file_path, filebucket_id, **kwargs):
+            if file_path == 'cube_3.nc':
+                raise IOError('disk error for url: https://b2share.eudat.eu/api/files/'
+                              + FILEBUCKET_ID + '?access_token=secret')
+            return {'key': file_path}
+
+        with patch.object(self.ecasb2share, 'add_file_to_draft_record', side_effect=fake_upload):
+            results = self.ecasb2share.add_files_to_draft_record(file_paths, FILEBUCKET_ID, max_workers=4)
+
+        self.assertEqual([result.file_path for result in results], file_paths)
+        self.assertIsInstance(results[3].error, IOError)
+        self.assertNotIn('secret', str(results[3].error))
+        self.assertIsNone(results[3].response)
+        self.assertEqual(results[9].response, {'key': 'cube_9.nc'})
+        self.assertIsNone(results[9].error)
+
+
+class FakeMultipartServer(object):
+    """
+    Emulates the multipart endpoints of the Invenio files REST API.
+    """
+
+    def __init__(self, fail_on_part=None):
+
+        self.parts = {}
+        self.part_requests = []
+        self.fail_on_part = fail_on_part
+        self.uploads = 0
+
+    def send(self, method, url, params=None, data=None, headers=None):
+
+        params = params or {}
+        response = Mock(status_code=200)
+
+        if method == 'POST' and 'uploads' in params:
+            self.uploads += 1
+            response.json.return_value = {'id': 'upload-{}'.format(self.uploads)}
+        elif method == 'PUT':
+            part_number = params['partNumber']
+            self.part_requests.append(part_number)
+            if part_number == self.fail_on_part:
+                self.fail_on_part = None
+                raise ConnectionError('network blip')
+            self.parts[part_number] = b''.join(data)
+        elif method == 'POST':
+            body = b''.join(self.parts[number] for number in sorted(self.parts))
+            response.json.return_value = {'key': 'cube.nc', 'size': len(body), 'body': body}
+
+        return response
+
+
+class ResumableUploadTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.tmp_dir, 'cube.nc')
+        with open(self.file_path, 'wb') as cube:
+            cube.write(os.urandom(10000))
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp_dir)
+
+    def resume_missing_parts_unit_test(self):
+        """
+        Check if a failed upload resumes from the first missing part.
+        """
+
+        server = FakeMultipartServer(fail_on_part=2)
+        file_url = 'https://b2share.eudat.eu/api/files/' + FILEBUCKET_ID + '/cube.nc'
+
+        upload = ResumableUpload(server.send, file_url, self.file_path, part_size=3000)
+        with self.assertRaises(ConnectionError):
+            upload.run()
+
+        self.assertTrue(os.path.exists(upload.checkpoint_path))
+        self.assertEqual(upload.load_checkpoint()['completed_parts'], [0, 1])
+
+        upload = ResumableUpload(server.send, file_url, self.file_path, part_size=3000)
+        result = upload.run()
+
+        self.assertEqual(server.uploads, 1)
+        self.assertEqual(server.part_requests, [0, 1, 2, 2, 3])
+        with open(self.file_path, 'rb') as cube:
+            self.assertEqual(result['body'], cube.read())
+        self.assertFalse(os.path.exists(upload.checkpoint_path))
+
+    def checkpoint_ignored_when_file_changes_unit_test(self):
+
+        server = FakeMultipartServer(fail_on_part=1)
+        file_url = 'https://b2share.eudat.eu/api/files/' + FILEBUCKET_ID + '/cube.nc'
+
+        upload = ResumableUpload(server.send, file_url, self.file_path, part_size=3000)
+        with self.assertRaises(ConnectionError):
+            upload.run()
+
+        with open(self.file_path, 'ab') as cube:
+            cube.write(b'more data')
+
+        upload = ResumableUpload(server.send, file_url, self.file_path, part_size=3000)
+        self.assertIsNone(upload.load_checkpoint())
@@ -0,0 +1,117 @@
+import json
+import shutil
+import tempfile
+import unittest
+
+from ecasb2share.ecasb2shareclient import EcasShare
+from ecasb2share.exceptions import MetadataSchemaException
+from ecasb2share.fakeserver import FakeB2Share, ROOT_SCHEMA
+from ecasb2share.validation import SchemaValidators
+from unittest.mock import Mock
+
+METADATA = json.load(open('test_files/fake_metadata.json'))
+COMMUNITY_ID = METADATA['community']
+
+
+class SchemaValidatorsTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.get_schema = Mock(return_value={'json_schema': ROOT_SCHEMA})
+        self.validators = SchemaValidators(self.get_schema)
+
+    def schema_compiled_once_unit_test(self):
+        """
+        Check if the community schema is fetched and compiled only once.
+        """
+
+        errors = self.validators.validate_many([METADATA] * 1000)
+
+        self.assertEqual(errors, [[]] * 1000)
+        self.get_schema.assert_called_once_with(COMMUNITY_ID)
+
+    def all_errors_reported_unit_test(self):
+
+        metadata = json.loads(json.dumps(METADATA))
+        metadata.update(titles=[{'title': ''}], open_access='yes')
+        del metadata['related_identifiers'][0]['related_identifier']
+
+        errors = self.validators.errors(metadata)
+
+        self.assertEqual(len(errors), 3)
+        self.assertTrue(any(error.startswith('titles/0/title:') for error in errors))
+        self.assertTrue(any(error.startswith('open_access:') for error in errors))
+        self.assertTrue(any(error.startswith('related_identifiers/0:') for error in errors))
+
+    def draft_schema_used_unit_test(self):
+        """
+        Check if drafts are validated against draft_json_schema, not json_schema.
+        """
+
+        draft_schema = dict(ROOT_SCHEMA, required=['community'])
+        get_schema = Mock(return_value={'json_schema': ROOT_SCHEMA,
+                                        'draft_json_schema': draft_schema})
+        metadata = {'community': COMMUNITY_ID, 'titles': [{'title': 'untitled yet'}]}
+
+        self.assertEqual(SchemaValidators(get_schema).errors(metadata), [])
+        self.assertEqual(len(SchemaValidators(get_schema, draft=False).errors(metadata)), 1)
+
+    def remote_reference_unit_test(self):
+        """
+        Check if $ref to other documents are retrieved through the given callable.
+        """
+
+        schema = {'$schema': 'http://json-schema.org/draft-04/schema#',
+                  'allOf': [{'$ref': 'https://b2share.eudat.eu/api/schemas/root#/json_schema'}]}
+        retrieve = Mock(return_value={'json_schema': ROOT_SCHEMA})
+        validators = SchemaValidators(Mock(return_value={'json_schema': schema}), retrieve=retrieve)
+
+        errors = validators.validate_many([METADATA, {'community': COMMUNITY_ID}])
+
+        self.assertEqual(errors[0], [])
+        self.assertEqual(len(errors[1]), 2)
+        retrieve.assert_called_once_with('https://b2share.eudat.eu/api/schemas/root')
+
+
+class SchemaValidationEndToEndTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.server = FakeB2Share().start()
+        self.ecasb2share = EcasShare(url=self.server.url, token_file='test_files/token.txt',
+                                     cache_dir=self.cache_dir, schema_validation=True)
+
+    def tearDown(self):
+
+        self.ecasb2share.close()
+        self.server.stop()
+        shutil.rmtree(self.cache_dir)
+
+    def invalid_metadata_not_sent_unit_test(self):
+
+        metadata = dict(METADATA, titles=[{'title': ''}])
+
+        with self.assertRaises(MetadataSchemaException) as context:
+            self.ecasb2share.create_draft_record_with_pid(metadata=metadata)
+
+        self.assertEqual(len(context.exception.errors), 1)
+        self.assertEqual(self.server.count_requests('POST'), 0)
+
+    def validate_many_unit_test(self):
+
+        documents = [METADATA, dict(METADATA, open_access='no'), dict(METADATA, community='nope')]
+
+        errors = self.ecasb2share.validate_many(documents)
+
+        self.assertEqual(errors[0], [])
+        self.assertEqual(len(errors[1]), 1)
+        self.assertEqual(len(errors[2]), 1)
+        self.assertTrue(errors[2][0].startswith('community: no usable schema for nope'))
+
+    def unknown_community_rejected_unit_test(self):
+
+        with self.assertRaises(MetadataSchemaException) as context:
+            self.ecasb2share.validate_metadata(dict(METADATA, community='nope'))
+
+        self.assertIn('404', context.exception.errors[0])
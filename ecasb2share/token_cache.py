@@ -0,0 +1,82 @@
+""" In-memory cache of the B2SHARE access tokens read from disk.
+
+The token file is read once and kept in memory. It is read again only when
+its inode, size or modification time change, which is checked with a single
+``stat`` call. The cache is shared by all the clients and threads of the
+process.
+
+"""
+
+import os
+import threading
+import time
+
+
+class TokenCache(object):
+
+    """ Thread-safe cache of token files, invalidated on file change """
+
+    def __init__(self, check_interval=0):
+        """
+        Initialize the cache.
+
+        :param check_interval: Optional: minimum number of seconds between
+               two checks of the same token file. Default: 0, the file is
+               checked on every access.
+        """
+
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._tokens = {}
+
+    @staticmethod
+    def _file_signature(path):
+
+        stat = os.stat(path)
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def get(self, token_path):
+        """
+        Return the token stored in a file, reading it only if it changed.
+
+        :param token_path: path to the token file.
+        :return: the token, without surrounding whitespace.
+        """
+
+        path = os.path.abspath(token_path)
+        now = time.monotonic()
+
+        with self._lock:
+            cached = self._tokens.get(path)
+
+            if cached is not None and now - cached[2] < self.check_interval:
+                return cached[1]
+
+            signature = self._file_signature(path)
+
+            if cached is not None and cached[0] == signature:
+                self._tokens[path] = (signature, cached[1], now)
+                return cached[1]
+
+            with open(path, 'r') as token_file:
+                token = token_file.read().strip()
+
+            self._tokens[path] = (signature, token, now)
+            return token
+
+    def invalidate(self, token_path=None):
+        """
+        Drop a cached token, or all of them.
+
+        :param token_path: Optional: path to the token file to forget.
+        """
+
+        with self._lock:
+            if token_path is None:
+                self._tokens.clear()
+            else:
+                self._tokens.pop(os.path.abspath(token_path), None)
+
+
+# Shared by all the EcasShare instances of the process
+TOKEN_CACHE = TokenCache()
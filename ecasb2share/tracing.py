@@ -0,0 +1,268 @@
+""" Opt-in tracing of client calls to a Chrome trace-event file.
+
+When tracing is enabled, with ``EcasShare(trace='run.trace.json')`` or the
+``ECASB2SHARE_TRACE`` environment variable, every public method of the
+client records a span, and so does each HTTP phase of the requests it sends:
+
+* ``HTTP <method> <endpoint>``: one attempt of a request,
+* ``connect``: opening of a new pooled connection (TCP and TLS),
+* ``send``: sending of the request line, headers and body,
+* ``wait``: time until the response headers are received,
+* ``receive``: reading of the response body (not streamed responses),
+* ``json``: decoding of the response body,
+* ``rate limit``: wait for the rate limiter,
+* ``backoff``: sleep before a retry.
+
+The spans nest per thread, so parallel uploads and downloads show as
+separate tracks. The file is written by ``client.close()`` and at interpreter
+exit, in the trace-event format read by chrome://tracing, Perfetto or
+speedscope.
+
+"""
+
+import atexit
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+TRACE_ENV_VARIABLE = 'ECASB2SHARE_TRACE'
+
+
+class _NullSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+
+    def __init__(self, tracer, name, category, args):
+
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+
+        self.start = self.tracer.now()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=exc_type.__name__)
+        self.tracer.add_span(self.name, self.start, self.tracer.now(),
+                             self.category, self.args)
+        return False
+
+
+class Tracer(object):
+
+    """ Recorder of spans in the Chrome trace-event format """
+
+    def __init__(self, path=None, clock=time.perf_counter):
+        """
+        Initialize the tracer.
+
+        :param path: Optional: trace file written by :meth:`close` and at
+               interpreter exit. Default: only written by :meth:`write`.
+        :param clock: Optional: monotonic clock in seconds.
+        """
+
+        self.path = path
+        self.clock = clock
+        self.events = []
+        self.pid = os.getpid()
+        self._origin = clock()
+        self._lock = threading.Lock()
+        self._threads = set()
+        # End of the wait phase of the last request of each thread
+        self.headers_received = threading.local()
+
+        if path is not None:
+            atexit.register(self.write)
+
+    def now(self):
+        """ Microseconds since the creation of the tracer """
+
+        return (self.clock() - self._origin) * 1e6
+
+    def span(self, name, category='ecasb2share', args=None):
+        """
+        Context manager recording a span around its block.
+
+        :param name: name of the span.
+        :param category: Optional: category of the span, e.g. 'http'.
+        :param args: Optional: dict of details shown with the span.
+        """
+
+        return _Span(self, name, category, args)
+
+    def add_span(self, name, start, end, category='ecasb2share', args=None):
+        """
+        Record a span of the current thread.
+
+        :param start: start time, as returned by :meth:`now`.
+        :param end: end time, as returned by :meth:`now`.
+        """
+
+        thread = threading.current_thread()
+        event = {'name': name, 'cat': category, 'ph': 'X', 'ts': start,
+                 'dur': max(end - start, 0), 'pid': self.pid, 'tid': thread.ident}
+        if args:
+            event['args'] = args
+
+        with self._lock:
+            if thread.ident not in self._threads:
+                self._threads.add(thread.ident)
+                self.events.append({'name': 'thread_name', 'ph': 'M', 'pid': self.pid,
+                                    'tid': thread.ident, 'args': {'name': thread.name}})
+            self.events.append(event)
+
+    def write(self, path=None):
+        """
+        Atomically write the spans recorded so far.
+
+        :param path: Optional: trace file. Default: the path of the tracer.
+        """
+
+        path = path or self.path
+        if path is None:
+            raise ValueError('no trace file to write')
+
+        with self._lock:
+            trace = {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as trace_file:
+            json.dump(trace, trace_file)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        """ Write the trace file, if any """
+
+        if self.path is not None:
+            atexit.unregister(self.write)
+            self.write()
+
+
+def tracer_from(trace):
+    """
+    Tracer of a client.
+
+    :param trace: None (use the ECASB2SHARE_TRACE environment variable),
+           False, True (ecasb2share-<pid>.trace.json in the working
+           directory), a path to the trace file, or a :class:`Tracer`.
+    :return: :class:`Tracer`, or None when tracing is disabled.
+    """
+
+    if trace is None:
+        trace = os.environ.get(TRACE_ENV_VARIABLE) or None
+    if trace is None or trace is False:
+        return None
+    if trace is True:
+        trace = 'ecasb2share-{}.trace.json'.format(os.getpid())
+    if isinstance(trace, Tracer):
+        return trace
+    return Tracer(trace)
+
+
+def span(tracer, name, category='ecasb2share', args=None):
+    """ :meth:`Tracer.span`, or a no-op when tracer is None """
+
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, category, args)
+
+
+def traced(method):
+    """
+    Record a span for each call of a client method, when the tracer of the
+    client (its ``tracer`` attribute) is set.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        tracer = self.tracer
+        if tracer is None:
+            return method(self, *args, **kwargs)
+        with tracer.span(method.__name__, 'api'):
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+# HTTP phases
+
+def _traced_connection_class(connection_class, tracer):
+
+    class TracedConnection(connection_class):
+
+        def connect(self):
+            with tracer.span('connect', 'http', {'host': self.host}):
+                return super(TracedConnection, self).connect()
+
+        def request(self, *args, **kwargs):
+            with tracer.span('send', 'http'):
+                return super(TracedConnection, self).request(*args, **kwargs)
+
+        def getresponse(self, *args, **kwargs):
+            with tracer.span('wait', 'http'):
+                response = super(TracedConnection, self).getresponse(*args, **kwargs)
+            tracer.headers_received.at = tracer.now()
+            return response
+
+    TracedConnection.__name__ = 'Traced' + connection_class.__name__
+    return TracedConnection
+
+
+def instrument_adapter(adapter, tracer):
+    """
+    Record the connect, send and wait phases of the requests sent through a
+    `requests` HTTPAdapter, with urllib3 connection classes reporting to
+    tracer.
+    """
+
+    pool_manager = adapter.poolmanager
+    pool_classes = {}
+    for scheme, pool_class in pool_manager.pool_classes_by_scheme.items():
+        pool_classes[scheme] = type('Traced' + pool_class.__name__, (pool_class,), {
+            'ConnectionCls': _traced_connection_class(pool_class.ConnectionCls, tracer)})
+    pool_manager.pool_classes_by_scheme = pool_classes
+
+
+def instrument_response(response, tracer):
+    """ Record the decoding of the JSON body of a response """
+
+    decode = response.json
+
+    @functools.wraps(decode)
+    def json_with_span(*args, **kwargs):
+        with tracer.span('json', 'http', {'bytes': len(response.content)}):
+            return decode(*args, **kwargs)
+
+    response.json = json_with_span
+    return response
+
+
+def receive_started(tracer):
+    """
+    Time at which the response headers of the last request of the current
+    thread were received, or None.
+    """
+
+    at = getattr(tracer.headers_received, 'at', None)
+    tracer.headers_received.at = None
+    return at
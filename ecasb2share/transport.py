@@ -0,0 +1,283 @@
+""" Pooled HTTP transport used by the ECAS B2SHARE client.
+
+All the requests sent by :class:`~ecasb2share.ecasb2shareclient.EcasShare`
+go through a single :class:`Transport`, which owns a `requests` session and
+its connection pool, so TCP/TLS connections to the B2SHARE instance are
+reused between API calls.
+
+Every request is sent under the same :class:`~ecasb2share.retry.RetryPolicy`
+and :class:`~ecasb2share.retry.CircuitBreaker`: transient failures (connection
+errors, 429, 5xx) are retried with backoff, and requests fail fast while the
+B2SHARE instance is down. An optional
+:class:`~ecasb2share.ratelimit.RateLimiter` paces every attempt.
+
+Each attempt is reported to the request hooks of the transport as a
+:class:`~ecasb2share.metrics.RequestEvent`, e.g. to a
+:class:`~ecasb2share.metrics.Metrics` aggregating latencies per endpoint.
+With a :class:`~ecasb2share.tracing.Tracer`, the attempts and their HTTP
+phases are also recorded as trace spans.
+
+`requests` is imported when the session is first used, so creating a client
+does not pay for its import.
+
+"""
+
+import logging
+import threading
+import time
+
+from .metrics import RequestEvent, endpoint_of
+from .retry import CircuitBreaker, RetryPolicy
+from .tracing import instrument_adapter, instrument_response, receive_started, span
+
+
+# (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (10, 300)
+
+
+class Transport(object):
+
+    """ Connection pool shared by all the request helpers of a client """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 keep_alive=True, timeout=DEFAULT_TIMEOUT, retry_policy=None,
+                 circuit_breaker=None, rate_limiter=None, hooks=None,
+                 tracer=None):
+        """
+        Initialize the transport.
+
+        :param pool_connections: number of per-host connection pools to keep.
+        :param pool_maxsize: maximum number of connections kept open
+               to a single host.
+        :param pool_block: if True, wait for a free connection when the
+               pool of a host is exhausted instead of opening a new one.
+        :param keep_alive: if False, ask the server to close the
+               connection after each request.
+        :param timeout: default timeout in seconds, either a single value or
+               a (connect, read) tuple. None waits forever.
+        :param retry_policy: Optional: :class:`~ecasb2share.retry.RetryPolicy`.
+               Default: 3 retries of idempotent requests.
+        :param circuit_breaker: Optional:
+               :class:`~ecasb2share.retry.CircuitBreaker`. Default: open
+               after 5 consecutive failures, for 30 seconds.
+        :param rate_limiter: Optional:
+               :class:`~ecasb2share.ratelimit.RateLimiter`. Default: no limit.
+        :param hooks: Optional: list of callables receiving a
+               :class:`~ecasb2share.metrics.RequestEvent` after each attempt.
+        :param tracer: Optional: :class:`~ecasb2share.tracing.Tracer`
+               recording the phases of the requests. Default: no tracing.
+        """
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.circuit_breaker = circuit_breaker if circuit_breaker is not None \
+            else CircuitBreaker()
+        self.rate_limiter = rate_limiter
+        self.hooks = list(hooks or [])
+        self.tracer = tracer
+
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """ The pooled `requests` session, created on first use """
+
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+
+        from requests import Session
+        from requests.adapters import HTTPAdapter
+
+        session = Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if self.tracer is not None:
+            instrument_adapter(adapter, self.tracer)
+
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def add_hook(self, hook):
+        """
+        Register a request hook.
+
+        :param hook: callable receiving a
+               :class:`~ecasb2share.metrics.RequestEvent` after each attempt,
+               in the thread that sent the request.
+        """
+
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+
+        self.hooks.remove(hook)
+
+    def _emit(self, method, url, started, body, response, attempt, error):
+
+        if not self.hooks:
+            return
+
+        event = RequestEvent(method, url, endpoint_of(url),
+                             response.status_code if response is not None else None,
+                             time.monotonic() - started, _body_size(body),
+                             _response_size(response), attempt, error)
+        for hook in self.hooks:
+            try:
+                hook(event)
+            except Exception:
+                logging.exception('Request hook %r failed', hook)
+
+    def _send_attempt(self, method, url, prepared_request, timeout, stream):
+
+        tracer = self.tracer
+        if tracer is None:
+            return self.session.send(prepared_request, timeout=timeout, stream=stream)
+
+        name = 'HTTP {} {}'.format(method, endpoint_of(url))
+        with tracer.span(name, 'http', {'url': url}) as attempt:
+            response = self.session.send(prepared_request, timeout=timeout,
+                                         stream=stream)
+            # Bodies of streamed responses are read later by the caller
+            received = receive_started(tracer)
+            if not stream and received is not None:
+                tracer.add_span('receive', received, tracer.now(), 'http',
+                                {'bytes': len(response.content)})
+            attempt.args['status'] = response.status_code
+        return instrument_response(response, tracer)
+
+    def send(self, method, url, params=None, headers=None, data=None,
+             files=None, stream=False, timeout=None):
+        """
+        Build and send a request over the pooled session, retrying
+        transient failures.
+
+        The body is prepared once and sent again as is on retries, so
+        streamed bodies must be iterable more than once
+        (see :class:`~ecasb2share.upload.FileStream`).
+
+        :param method: HTTP method (GET, PUT, POST, PATCH, DELETE).
+        :param url: absolute URL of the resource.
+        :param timeout: Optional: overrides the default timeout.
+        :raise: :exc:`~ecasb2share.exceptions.CircuitOpenException` when the
+                circuit breaker is open, or the connection error of the
+                last attempt.
+        :return: the HTTP response. Failed responses are returned once the
+                 retries are exhausted.
+        """
+
+        from requests import Request
+        from requests.exceptions import ConnectionError, Timeout
+
+        _request = Request(method, url, params=params, headers=headers,
+                           data=data, files=files)
+        prepared_request = self.session.prepare_request(_request)
+
+        if timeout is None:
+            timeout = self.timeout
+
+        policy = self.retry_policy
+        retry_number = 0
+        body = prepared_request.body
+
+        while True:
+            self.circuit_breaker.before_request(url)
+
+            recorded = False
+            try:
+                if self.rate_limiter is not None:
+                    with span(self.tracer, 'rate limit', 'http'):
+                        self.rate_limiter.acquire_request()
+                    prepared_request.body = self.rate_limiter.throttle_body(body)
+
+                started = time.monotonic()
+                try:
+                    response = self._send_attempt(method, url, prepared_request,
+                                                  timeout, stream)
+                except (ConnectionError, Timeout) as err:
+                    self.circuit_breaker.record_failure()
+                    recorded = True
+                    self._emit(method, url, started, body, None, retry_number + 1, err)
+                    if retry_number >= policy.total or \
+                            not policy.is_retryable_error(method, err):
+                        raise
+                    retry_number += 1
+                    delay = policy.backoff(retry_number)
+                    logging.warning('%s %s failed (%s), retry %d/%d in %.2fs',
+                                    method, url, err, retry_number, policy.total, delay)
+                    with span(self.tracer, 'backoff', 'http', {'seconds': delay}):
+                        policy.sleep(delay)
+                    continue
+
+                if response.status_code >= 500:
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success()
+                recorded = True
+            finally:
+                # Any other error of the attempt (ChunkedEncodingError,
+                # TooManyRedirects, failing tracer...) is a failure too, so
+                # that a half-open trial always ends
+                if not recorded:
+                    self.circuit_breaker.record_failure()
+
+            self._emit(method, url, started, body, response, retry_number + 1, None)
+
+            if retry_number >= policy.total or \
+                    not policy.is_retryable_status(method, response.status_code):
+                return response
+
+            retry_number += 1
+            delay = policy.backoff(retry_number, response)
+            logging.warning('%s %s returned %d, retry %d/%d in %.2fs', method,
+                            url, response.status_code, retry_number,
+                            policy.total, delay)
+            response.close()
+            with span(self.tracer, 'backoff', 'http', {'seconds': delay}):
+                policy.sleep(delay)
+
+    def close(self):
+        """ Close all the pooled connections """
+
+        if self._session is not None:
+            self._session.close()
+
+
+def _body_size(body):
+    """ Bytes of a request body, 0 when unknown (generators) """
+
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    try:
+        return len(body)
+    except TypeError:
+        return 0
+
+
+def _response_size(response):
+    """ Bytes of a response body, Content-Length for unread streamed bodies """
+
+    if response is None:
+        return 0
+
+    content = getattr(response, '_content', None)
+    if isinstance(content, bytes):
+        return len(content)
+
+    try:
+        return int(response.headers.get('Content-Length', 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0
@@ -0,0 +1,330 @@
+""" Streaming upload helpers for large files.
+
+:class:`FileStream` is handed to `requests` as the raw request body: the file
+is read and sent in fixed-size chunks, so the memory used by an upload does
+not depend on the size of the file. The MD5 checksum of the file is computed
+from the same chunks while they are sent, so the upload can be verified
+against the checksum reported by B2SHARE without reading the file twice.
+
+Files can also be sent in parts with :class:`ResumableUpload`, which uses the
+multipart endpoints of the Invenio files REST API and records the completed
+parts in a checkpoint file, so an interrupted upload restarts from the first
+missing part.
+
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+
+from collections import namedtuple
+
+from . import exceptions
+
+
+# Size of the buffer read from disk and sent at once
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Size of the parts of a resumable upload
+DEFAULT_PART_SIZE = 64 * 1024 * 1024
+
+# Outcome of the upload of one file: the server response or the error raised
+UploadResult = namedtuple('UploadResult', ['file_path', 'response', 'error'])
+
+
+class FileStream(object):
+
+    """ Iterable over the content of a file, read in fixed-size chunks """
+
+    def __init__(self, file_path, chunk_size=DEFAULT_CHUNK_SIZE,
+                 progress_callback=None, offset=0, length=None):
+        """
+        Initialize the stream.
+
+        :param file_path: path to the file to be sent.
+        :param chunk_size: Optional: number of bytes read and sent at once.
+        :param progress_callback: Optional: called after each chunk as
+               progress_callback(bytes_sent, total_bytes, throughput), with
+               the throughput in bytes per second.
+        :param offset: Optional: position of the first byte to send.
+        :param length: Optional: number of bytes to send. Default: up to the
+               end of the file.
+        """
+
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        self.offset = offset
+
+        remaining = max(os.path.getsize(file_path) - offset, 0)
+        if length is None or length > remaining:
+            length = remaining
+        self.total_bytes = length
+        self.bytes_sent = 0
+        self.start_time = None
+        self.end_time = None
+        self._md5 = hashlib.md5()
+
+    def __len__(self):
+        # Lets requests send a Content-Length header instead of chunked encoding
+        return self.total_bytes
+
+    def __iter__(self):
+
+        self.bytes_sent = 0
+        self.start_time = time.monotonic()
+        self.end_time = None
+        self._md5 = hashlib.md5()
+
+        with open(self.file_path, 'rb') as upload_file:
+            upload_file.seek(self.offset)
+
+            while self.bytes_sent < self.total_bytes:
+                size = min(self.chunk_size, self.total_bytes - self.bytes_sent)
+                chunk = upload_file.read(size)
+                if not chunk:
+                    break
+
+                self._md5.update(chunk)
+                yield chunk
+
+                self.bytes_sent += len(chunk)
+                if self.progress_callback is not None:
+                    self.progress_callback(self.bytes_sent, self.total_bytes,
+                                           self.throughput)
+
+        self.end_time = time.monotonic()
+
+    @property
+    def checksum(self):
+        """ Checksum of the bytes sent so far, as 'md5:<hex digest>' """
+
+        return 'md5:' + self._md5.hexdigest()
+
+    @property
+    def elapsed(self):
+        """ Seconds spent sending the file so far """
+
+        if self.start_time is None:
+            return 0.0
+        end_time = self.end_time if self.end_time is not None else time.monotonic()
+        return end_time - self.start_time
+
+    @property
+    def throughput(self):
+        """ Average upload rate in bytes per second """
+
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0.0
+        return self.bytes_sent / elapsed
+
+    def log_summary(self):
+        """ Log the size, duration and throughput of the upload """
+
+        logging.info('Uploaded %s: %d bytes in %.2fs (%.2f MB/s)',
+                     os.path.basename(self.file_path), self.bytes_sent,
+                     self.elapsed, self.throughput / (1024 * 1024))
+
+
+def verify_checksum(file_path, local, stored):
+    """
+    Compare the checksum of a local file with the one of the stored object.
+
+    :param file_path: path to the local file.
+    :param local: checksum of the bytes sent or received, as
+           'md5:<hex digest>'.
+    :param stored: checksum reported by B2SHARE, as '<algorithm>:<digest>'.
+    :raise: :exc:`~ecasb2share.exceptions.ChecksumMismatchException` when
+            they differ.
+    :return: True if the checksums were compared, False if B2SHARE reported
+             none or used another algorithm.
+    """
+
+    if not stored:
+        logging.warning('No checksum reported for %s, not verified', file_path)
+        return False
+
+    if stored.split(':', 1)[0].lower() != local.split(':', 1)[0]:
+        logging.warning('Checksum of %s computed with %s, not verified',
+                        file_path, stored.split(':', 1)[0])
+        return False
+
+    if stored.lower() != local:
+        raise exceptions.ChecksumMismatchException(
+            msg=None, file_path=file_path, local=local, stored=stored)
+
+    return True
+
+
+class ResumableUpload(object):
+
+    """ Multipart upload of a file, checkpointed on disk after each part """
+
+    def __init__(self, send, file_url, file_path, part_size=DEFAULT_PART_SIZE,
+                 checkpoint_path=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 progress_callback=None):
+        """
+        Initialize the upload.
+
+        :param send: callable send(method, url, **kwargs) returning a response.
+        :param file_url: URL of the object in the file bucket
+               (/api/files/<filebucket_id>/<key>).
+        :param file_path: path to the file to be uploaded.
+        :param part_size: Optional: size of each part in bytes.
+        :param checkpoint_path: Optional: file recording the progress of the
+               upload. Default: file_path + '.upload.json'.
+        :param chunk_size: Optional: size of the chunks sent within a part.
+        :param progress_callback: Optional: called as
+               progress_callback(bytes_sent, total_bytes, throughput) for
+               the whole file.
+        """
+
+        self.send = send
+        self.file_url = file_url
+        self.file_path = file_path
+        self.part_size = part_size
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+
+        if checkpoint_path is None:
+            checkpoint_path = file_path + '.upload.json'
+        self.checkpoint_path = checkpoint_path
+
+        stat = os.stat(file_path)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime_ns
+        self.number_of_parts = max(int(math.ceil(self.size / float(part_size))), 1)
+
+    # checkpoint
+
+    def load_checkpoint(self):
+        """
+        Read the checkpoint left by a previous attempt.
+
+        :return: the checkpoint, or None when missing or made for another
+                 file, file version or part size.
+        """
+
+        try:
+            with open(self.checkpoint_path, 'r') as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (IOError, ValueError):
+            return None
+
+        expected = {'file_url': self.file_url, 'size': self.size,
+                    'mtime': self.mtime, 'part_size': self.part_size}
+        for key, value in expected.items():
+            if checkpoint.get(key) != value:
+                return None
+
+        return checkpoint
+
+    def save_checkpoint(self, checkpoint):
+        """ Atomically write the checkpoint file """
+
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def remove_checkpoint(self):
+
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    # multipart endpoints
+
+    def _initiate(self):
+
+        response = self.send('POST', self.file_url,
+                             params={'uploads': '', 'size': self.size,
+                                     'partSize': self.part_size})
+        response.raise_for_status()
+
+        return {'file_url': self.file_url, 'size': self.size,
+                'mtime': self.mtime, 'part_size': self.part_size,
+                'upload_id': response.json()['id'], 'completed_parts': []}
+
+    def _upload_exists(self, upload_id):
+
+        response = self.send('GET', self.file_url, params={'uploadId': upload_id})
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    def _upload_part(self, upload_id, part_number, bytes_done):
+
+        def part_progress(sent, total, throughput):
+            # Progress of the part, reported as progress of the whole file
+            self.progress_callback(bytes_done + sent, self.size, throughput)
+
+        if self.progress_callback is not None:
+            progress_callback = part_progress
+        else:
+            progress_callback = None
+
+        part_stream = FileStream(self.file_path, chunk_size=self.chunk_size,
+                                 progress_callback=progress_callback,
+                                 offset=part_number * self.part_size,
+                                 length=self.part_size)
+
+        response = self.send('PUT', self.file_url, data=part_stream,
+                             params={'uploadId': upload_id,
+                                     'partNumber': part_number},
+                             headers={'Content-Type': 'application/octet-stream'})
+        response.raise_for_status()
+
+        return len(part_stream)
+
+    def _complete(self, upload_id):
+
+        response = self.send('POST', self.file_url, params={'uploadId': upload_id})
+        response.raise_for_status()
+        return response.json()
+
+    def run(self):
+        """
+        Upload the parts missing from the checkpoint and complete the upload.
+
+        :return: the file object created in the bucket (in JSON format).
+        """
+
+        checkpoint = self.load_checkpoint()
+
+        if checkpoint is not None and not self._upload_exists(checkpoint['upload_id']):
+            logging.info('Multipart upload %s expired, starting over',
+                         checkpoint['upload_id'])
+            checkpoint = None
+
+        if checkpoint is None:
+            checkpoint = self._initiate()
+            self.save_checkpoint(checkpoint)
+        else:
+            logging.info('Resuming upload of %s: %d/%d parts already sent',
+                         self.file_path, len(checkpoint['completed_parts']),
+                         self.number_of_parts)
+
+        upload_id = checkpoint['upload_id']
+        completed_parts = set(checkpoint['completed_parts'])
+        bytes_done = sum(min(self.part_size, self.size - part * self.part_size)
+                         for part in completed_parts)
+
+        for part_number in range(self.number_of_parts):
+            if part_number in completed_parts:
+                continue
+
+            bytes_done += self._upload_part(upload_id, part_number, bytes_done)
+
+            completed_parts.add(part_number)
+            checkpoint['completed_parts'] = sorted(completed_parts)
+            self.save_checkpoint(checkpoint)
+
+        result = self._complete(upload_id)
+        self.remove_checkpoint()
+
+        return result
@@ -0,0 +1,156 @@
+""" Validation of record metadata against community JSON schemas.
+
+The schema of each community (see
+:exc:`~ecasb2share.ecasb2shareclient.EcasShare.get_community_schema`) is
+compiled into a `jsonschema` validator the first time it is needed and reused
+for every following document, so large batches of metadata are validated
+locally instead of being rejected one by one by the server.
+
+`jsonschema` is imported on first use only.
+
+"""
+
+import threading
+
+
+def _format_error(error):
+
+    path = '/'.join(str(item) for item in error.absolute_path)
+    return '{}: {}'.format(path or '<root>', error.message)
+
+
+def compile_schema(schema, retrieve=None):
+    """
+    Build a reusable validator for a JSON schema.
+
+    :param schema: JSON schema.
+    :param retrieve: Optional: callable retrieve(uri) returning the JSON
+           document referenced by a remote $ref.
+    :return: jsonschema validator.
+    """
+
+    from jsonschema.validators import validator_for
+
+    validator_class = validator_for(schema, default=None)
+    if validator_class is None:
+        from jsonschema import Draft4Validator
+        validator_class = Draft4Validator
+    validator_class.check_schema(schema)
+
+    if retrieve is None:
+        return validator_class(schema)
+
+    try:
+        from referencing import Registry, Resource
+        from referencing.jsonschema import DRAFT4
+    except ImportError:
+        # jsonschema < 4.18
+        from jsonschema import RefResolver
+
+        handlers = {'http': retrieve, 'https': retrieve}
+        resolver = RefResolver.from_schema(schema, handlers=handlers)
+        return validator_class(schema, resolver=resolver)
+
+    # The registry does not keep what it retrieves between validations
+    resources = {}
+
+    def retrieve_resource(uri):
+        if uri not in resources:
+            resources[uri] = Resource.from_contents(
+                retrieve(uri), default_specification=DRAFT4)
+        return resources[uri]
+
+    return validator_class(schema, registry=Registry(retrieve=retrieve_resource))
+
+
+class SchemaValidators(object):
+
+    """ Compiled validators of the community schemas, built on demand """
+
+    def __init__(self, get_schema, retrieve=None, draft=True):
+        """
+        Initialize the validators.
+
+        :param get_schema: callable get_schema(community_id) returning the
+               schemas of a community, as returned by B2SHARE.
+        :param retrieve: Optional: callable retrieve(uri) returning the
+               documents referenced by the schemas.
+        :param draft: Optional: validate against the schema of drafts
+               (draft_json_schema), which is what B2SHARE checks when a draft
+               is created, rather than the schema of published records
+               (json_schema). Default: True.
+        """
+
+        self.get_schema = get_schema
+        self.retrieve = retrieve
+        self.draft = draft
+        self._lock = threading.Lock()
+        self._validators = {}
+
+    def validator_for(self, community_id):
+        """
+        Return the compiled validator of a community.
+
+        :param community_id: community id.
+        :return: jsonschema validator.
+        """
+
+        with self._lock:
+            validator = self._validators.get(community_id)
+            if validator is not None:
+                return validator
+
+            community_schema = self.get_schema(community_id)
+            if community_schema is None:
+                raise ValueError('No schema found for community ' + community_id)
+
+            keys = ('draft_json_schema', 'json_schema') if self.draft else ('json_schema',)
+            schema = next((community_schema[key] for key in keys if key in community_schema),
+                          community_schema)
+
+            validator = compile_schema(schema, retrieve=self.retrieve)
+            self._validators[community_id] = validator
+            return validator
+
+    def clear(self):
+        """ Forget the compiled validators """
+
+        with self._lock:
+            self._validators.clear()
+
+    def errors(self, metadata, community_id=None):
+        """
+        List all the validation errors of a metadata document.
+
+        :param metadata: metadata as dict.
+        :param community_id: Optional: community whose schema is used.
+               Default: the community of the metadata.
+        :return: list of error messages, empty when the document is valid.
+               A schema that cannot be retrieved or compiled is reported as
+               an error of the document.
+        """
+
+        if community_id is None:
+            community_id = metadata.get('community') if isinstance(metadata, dict) else None
+        if not community_id:
+            return ['community: no community to validate against']
+
+        try:
+            validator = self.validator_for(community_id)
+            return sorted(_format_error(error) for error in validator.iter_errors(metadata))
+        except Exception as err:
+            # Unknown community, unreachable server or invalid schema: the
+            # other documents of a batch are still validated
+            return ['community: no usable schema for {}: {}'.format(community_id, err)]
+
+    def validate_many(self, documents, community_id=None):
+        """
+        Validate a batch of metadata documents.
+
+        :param documents: iterable of metadata dicts.
+        :param community_id: Optional: community whose schema is used for
+               all the documents. Default: the community of each document.
+        :return: list with the errors of each document, in order.
+        """
+
+        return [self.errors(metadata, community_id) for metadata in documents]
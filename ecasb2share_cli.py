@@ -1,12 +1,129 @@
+""" Command-line interface of the ECAS B2SHARE client.
+
+Commands follow the groups of the API: ``communities``, ``records``,
+``drafts`` and ``files``. Results are written to the standard output as JSON
+Lines, one document per record, draft or file, so they can be piped to jq or
+to another command; messages go to the standard error. Commands acting on
+several records read their ids from the arguments, or from the standard input
+(one per line) when no id or '-' is given::
+
+    ecasb2share_cli records list --community $ECAS --query cmip6 \\
+        | jq -r .id | ecasb2share_cli records get --published
+
+A failed item is reported as {"id": ..., "error": ...} without stopping the
+batch, and the exit status is 1 if any item failed.
+
+The client (and with it requests and jsonschema) is imported by the commands
+that use it only, so --help and the commands working offline start fast.
+
+"""
+
+import contextlib
+import json
+import logging
+import sys
+
 import click
-from ecasb2share.ecasb2shareclient import EcasShare
+
+
+# Client and output
+
+def _client(ctx, **kwargs):
+    """ EcasShare of the command, imported on first use """
+
+    from ecasb2share.ecasb2shareclient import EcasShare
+
+    options = ctx.find_root().obj or {}
+    return EcasShare(url=options.get('url'), token_file=options.get('token_file'), **kwargs)
+
+
+class _Output(object):
+
+    """ JSON Lines writer counting the failed items of a command """
+
+    def __init__(self, stream):
+
+        self.stream = stream
+        self.failed = 0
+
+    def emit(self, document):
+
+        self.stream.write(json.dumps(document, default=str) + '\n')
+        self.stream.flush()
+
+    def error(self, item, err):
+
+        from ecasb2share.exceptions import error_message
+
+        self.failed += 1
+        self.emit({'id': item, 'error': error_message(err)})
+
+
+@contextlib.contextmanager
+def _session(ctx, **kwargs):
+    """
+    Client and JSON Lines output of a command. What the client prints is
+    redirected to the standard error, to keep the output parseable, and
+    errors ending the command are reported as an error line.
+    """
+
+    output = _Output(click.get_text_stream('stdout'))
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            with _client(ctx, **kwargs) as client:
+                yield client, output
+        except (click.ClickException, click.exceptions.Exit, click.Abort):
+            raise
+        except Exception as err:
+            output.error(None, err)
+    if output.failed:
+        ctx.exit(1)
+
+
+def _items(values):
+    """ Arguments of a command, or the lines of the standard input """
+
+    if not values or tuple(values) == ('-',):
+        stdin = click.get_text_stream('stdin')
+        return (line.strip() for line in stdin if line.strip())
+    return values
+
+
+def _for_each(output, items, action):
+    """ Emit action(item) for every item, reporting failures as errors """
+
+    for item in items:
+        try:
+            result = action(item)
+        except Exception as err:
+            output.error(item, err)
+            continue
+        if result is None:
+            output.error(item, 'request failed')
+        else:
+            output.emit(result)
+
+
+def _status(item, status_code, expected):
+
+    if status_code not in expected:
+        raise click.ClickException('HTTP status {}'.format(status_code))
+    return {'id': item, 'status': status_code}
+
 
 @click.group()
-def main():
+@click.option('--url', envvar='ECASB2SHARE_URL', default=None,
+              help='URL of the B2SHARE instance.')
+@click.option('--token-file', envvar='ECASB2SHARE_TOKEN_FILE', default=None,
+              help='File with the API access token.')
+@click.option('--verbose', '-v', is_flag=True, help='Log the progress of the requests.')
+@click.pass_context
+def main(ctx, url, token_file, verbose):
     """
     Simple CLI for ecasb2share
     """
-    pass
+    logging.basicConfig(level=logging.INFO if verbose else logging.WARNING)
+    ctx.obj = {'url': url, 'token_file': token_file}
 
 @main.command()
 def cli():
@@ -17,7 +134,316 @@ def cli():
 def load_metadata(metadata_json_file):
     """This loads and returns metadata from json file"""
 
-    client = EcasShare()
-    click.echo(client.load_metadata_from_json(metadata_json_file))
+    from ecasb2share.ecasb2shareclient import EcasShare
+
+    click.echo(EcasShare.load_metadata_from_json(metadata_json_file))
+
+
+@main.command()
+@click.argument('manifest')
+@click.option('--results', default='results.jsonl', show_default=True,
+              help='JSON Lines file receiving one result per entry.')
+@click.option('--workers', default=8, show_default=True,
+              help='Number of drafts created at the same time.')
+@click.option('--strict', is_flag=True,
+              help='Create nothing if an entry is invalid.')
+@click.pass_context
+def bulk_create(ctx, manifest, results, workers, strict):
+    """Create drafts from a directory of metadata JSON files or a JSON Lines file"""
+
+    with _client(ctx, pool_maxsize=workers) as client:
+        outcome = client.bulk_create_drafts(manifest, results,
+                                            max_workers=workers, strict=strict)
+
+    failed = sum(1 for result in outcome if result['error'] is not None)
+    click.echo('{} drafts created, {} failed. Results in {}'.format(
+        len(outcome) - failed, failed, results))
+
+
+@main.command()
+@click.option('--community', default=None, help='Export the records of this community.')
+@click.option('--query', default=None, help='Export the records matching this query.')
+@click.option('--output', '-o', default='-', show_default=True,
+              help='JSON Lines output file, - for the standard output.')
+@click.option('--gzip', 'compress', is_flag=True, default=None,
+              help='Compress the output (default for .gz files).')
+@click.option('--page-size', default=100, show_default=True,
+              help='Number of records fetched per request.')
+@click.pass_context
+def export(ctx, community, query, output, compress, page_size):
+    """Export records to JSON Lines, one record per line"""
+
+    with _client(ctx) as client:
+        count = client.export_records(output, community_id=community, query=query,
+                                      size=page_size, compress=compress)
+
+    if output != '-':
+        click.echo('{} records exported to {}'.format(count, output))
+
+
+# communities
+
+@main.group()
+def communities():
+    """List communities and their metadata schemas"""
+
+
+@communities.command('list')
+@click.pass_context
+def list_communities(ctx):
+    """List the communities, one per line"""
+
+    with _session(ctx) as (client, output):
+        result = client.list_communities()
+        if result is None:
+            output.error(None, 'request failed')
+            return
+        for community in result['hits']['hits']:
+            output.emit(community)
+
+
+@communities.command()
+@click.argument('community_ids', nargs=-1)
+@click.pass_context
+def schema(ctx, community_ids):
+    """Print the metadata schema of communities"""
+
+    with _session(ctx) as (client, output):
+        _for_each(output, _items(community_ids), client.get_community_schema)
+
+
+# records
+
+@main.group()
+def records():
+    """Search, read and delete published records"""
+
+
+@records.command('list')
+@click.option('--community', default=None, help='Only the records of this community.')
+@click.option('--query', default=None, help='Only the records matching this query.')
+@click.option('--drafts', is_flag=True, help='List your drafts instead.')
+@click.option('--page-size', default=100, show_default=True,
+              help='Number of records fetched per request.')
+@click.option('--limit', default=None, type=int, help='Maximum number of records.')
+@click.pass_context
+def list_records(ctx, community, query, drafts, page_size, limit):
+    """Stream the records, one per line"""
+
+    terms = []
+    if community is not None:
+        terms.append('community:' + community)
+    if query is not None:
+        terms.append(query)
+
+    with _session(ctx) as (client, output):
+        if drafts:
+            found = client.iter_drafts(size=page_size,
+                                       search_value=' AND '.join(terms) or None)
+        elif terms:
+            found = client.iter_search(' AND '.join(terms), size=page_size)
+        else:
+            found = client.iter_records(size=page_size)
+        for count, record in enumerate(found, 1):
+            output.emit(record)
+            if limit is not None and count >= limit:
+                break
+
+
+@records.command('get')
+@click.argument('record_ids', nargs=-1)
+@click.option('--published', is_flag=True,
+              help='Read the published records rather than the drafts.')
+@click.pass_context
+def get_records(ctx, record_ids, published):
+    """Print the metadata of records"""
+
+    with _session(ctx) as (client, output):
+        _for_each(output, _items(record_ids),
+                  lambda record_id: client.get_specific_record(record_id,
+                                                               draft=not published))
+
+
+@records.command()
+@click.argument('record_ids', nargs=-1)
+@click.pass_context
+def pid(ctx, record_ids):
+    """Print the ePIC PID of records"""
+
+    with _session(ctx) as (client, output):
+        _for_each(output, _items(record_ids),
+                  lambda record_id: {'id': record_id,
+                                     'pid': client.get_record_pid(record_id)})
+
+
+@records.command('delete')
+@click.argument('record_ids', nargs=-1)
+@click.confirmation_option(prompt='Delete the published records?')
+@click.pass_context
+def delete_records(ctx, record_ids):
+    """Delete published records (site administrators only)"""
+
+    with _session(ctx) as (client, output):
+        _for_each(output, _items(record_ids),
+                  lambda record_id: _status(record_id,
+                                            client.delete_published_record(record_id),
+                                            (204,)))
+
+
+# drafts
+
+@main.group()
+def drafts():
+    """Create, publish and delete draft records"""
+
+
+@drafts.command('create')
+@click.argument('titles', nargs=-1)
+@click.option('--community', default=None,
+              help='Community of the drafts created from titles.')
+@click.option('--metadata', is_flag=True,
+              help='The arguments are metadata JSON files rather than titles.')
+@click.pass_context
+def create_drafts(ctx, titles, community, metadata):
+    """Create drafts from titles or metadata JSON files"""
+
+    if not metadata and community is None:
+        raise click.UsageError('--community is required to create drafts from titles')
+
+    with _session(ctx) as (client, output):
+
+        def create(item):
+            if metadata:
+                draft = client.create_draft_record_with_pid(metadata_json=item)
+            else:
+                draft = client.create_draft_record(community, item)
+            if draft is None:
+                return None
+            return {'id': item, 'record_id': draft.record_id,
+                    'filebucket_id': draft.filebucket_id}
+
+        _for_each(output, _items(titles), create)
+
+
+@drafts.command()
+@click.argument('record_ids', nargs=-1)
+@click.pass_context
+def publish(ctx, record_ids):
+    """Submit drafts for publication"""
+
+    with _session(ctx) as (client, output):
+        _for_each(output, _items(record_ids),
+                  lambda record_id: _status(record_id,
+                                            client.submit_draft_for_publication(record_id),
+                                            (200,)))
+
+
+@drafts.command('delete')
+@click.argument('record_ids', nargs=-1)
+@click.pass_context
+def delete_drafts(ctx, record_ids):
+    """Delete drafts"""
+
+    with _session(ctx) as (client, output):
+        _for_each(output, _items(record_ids),
+                  lambda record_id: _status(record_id,
+                                            client.delete_draft_record(record_id),
+                                            (204,)))
+
+
+# files
+
+@main.group()
+def files():
+    """List, upload, download and delete the files of records"""
+
+
+@files.command('list')
+@click.argument('filebucket_id')
+@click.pass_context
+def list_files(ctx, filebucket_id):
+    """List the files of a file bucket, one per line"""
+
+    with _session(ctx) as (client, output):
+        bucket = client.list_files_in_bucket(filebucket_id)
+        if bucket is None:
+            output.error(filebucket_id, 'request failed')
+            return
+        for obj in bucket.get('contents', []):
+            output.emit(obj)
+
+
+@files.command()
+@click.argument('filebucket_id')
+@click.argument('file_paths', nargs=-1)
+@click.option('--workers', default=4, show_default=True,
+              help='Number of files uploaded at the same time.')
+@click.option('--stream', is_flag=True,
+              help='Stream the files and verify their checksum.')
+@click.pass_context
+def upload(ctx, filebucket_id, file_paths, workers, stream):
+    """Upload files into the file bucket of a draft"""
+
+    with _session(ctx, pool_maxsize=workers) as (client, output):
+        results = client.add_files_to_draft_record(list(_items(file_paths)),
+                                                   filebucket_id,
+                                                   max_workers=workers, stream=stream)
+        for result in results:
+            if result.error is not None or result.response is None:
+                output.error(result.file_path, result.error or 'request failed')
+            else:
+                output.emit(dict(result.response, id=result.file_path))
+
+
+@files.command('delete')
+@click.argument('filebucket_id')
+@click.argument('keys', nargs=-1)
+@click.pass_context
+def delete_files(ctx, filebucket_id, keys):
+    """Delete files from the file bucket of a draft"""
+
+    with _session(ctx) as (client, output):
+        _for_each(output, _items(keys),
+                  lambda key: _status(key,
+                                      client.delete_file_from_draft_record(filebucket_id, key),
+                                      (204,)))
+
+
+@files.command()
+@click.argument('record_id')
+@click.argument('local_dir')
+@click.option('--pattern', default=None, help="Only the files matching, e.g. '*.nc'.")
+@click.option('--draft', is_flag=True, help='Download the files of a draft.')
+@click.option('--workers', default=4, show_default=True,
+              help='Number of files downloaded at the same time.')
+@click.pass_context
+def download(ctx, record_id, local_dir, pattern, draft, workers):
+    """Download the files of a record, resuming partial downloads"""
+
+    with _session(ctx, pool_maxsize=workers) as (client, output):
+        for result in client.download_record_files(record_id, local_dir, pattern=pattern,
+                                                   draft=draft, max_workers=workers):
+            if result.error is not None:
+                output.error(result.key, result.error)
+            else:
+                output.emit({'id': result.key, 'file_path': result.file_path})
+
 
+@files.command()
+@click.argument('local_dir')
+@click.argument('filebucket_id')
+@click.option('--delete', is_flag=True,
+              help='Delete the files of the bucket missing from the directory.')
+@click.option('--dry-run', is_flag=True, help='Only print what would change.')
+@click.pass_context
+def sync(ctx, local_dir, filebucket_id, delete, dry_run):
+    """Upload the new and changed files of a directory"""
 
+    with _session(ctx) as (client, output):
+        report = client.sync_directory_to_bucket(local_dir, filebucket_id,
+                                                 delete=delete, dry_run=dry_run)
+        for action in ('uploaded', 'unchanged', 'deleted'):
+            for key in getattr(report, action):
+                output.emit({'id': key, 'action': action})
+        for key, err in report.errors:
+            output.error(key, err)
@@ -52,8 +52,6 @@ setup(name='ecasb2share',
       classifiers=[
           'Development Status :: 5 - Production/Stable',
           'Operating System :: OS Independent',
-          'Programming Language :: Python :: 3.5',
-          'Programming Language :: Python :: 3.6',
           'Programming Language :: Python :: 3.7',
           'Topic :: Scientific/Engineering :: Information Analysis',
           'Topic :: Software Development :: Python modules',
@@ -67,6 +65,7 @@ setup(name='ecasb2share',
       packages=find_packages(),
       include_package_data=True,
       install_requires=reqs,
+      python_requires='>=3.7',
       test_suite='nose.collector',
       py_modules=['ecasb2share_cli'],
       entry_points='''